@@ -1,7 +1,27 @@
 # app/analisis_errores.py
+import os
+import csv
+import time
 import pandas as pd
 from typing import List, Dict, Any
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from matrices import (obtener_matriz_estado, ancho_examen, ESTADO_ACIERTO, ESTADO_ERROR,
+                      ESTADO_SIN_RESPONDER, ESTADO_NO_CALIFICADA)
+from similitud import generar_reporte_similitud_csv
+from duplicados import generar_reporte_duplicados_csv
+
+# Texto del CSV de errores para cada estado de pregunta
+_ETIQUETAS_ESTADO_CSV = np.empty(4, dtype='<U1')
+_ETIQUETAS_ESTADO_CSV[ESTADO_ACIERTO] = '0'
+_ETIQUETAS_ESTADO_CSV[ESTADO_ERROR] = '1'
+_ETIQUETAS_ESTADO_CSV[ESTADO_SIN_RESPONDER] = ''
+_ETIQUETAS_ESTADO_CSV[ESTADO_NO_CALIFICADA] = ''
+
+# Alumnos que se escriben por bloque en el CSV de errores
+_FILAS_POR_BLOQUE_CSV = 2000
 
 
 def generar_reporte_errores_csv(resultados: List[Dict[str, Any]], ruta_salida: str):
@@ -17,39 +37,24 @@ def generar_reporte_errores_csv(resultados: List[Dict[str, Any]], ruta_salida: s
     # Obtener el total de preguntas
     total_preguntas = resultados[0]['total_preguntas'] if resultados else 110
 
-    datos_errores = []
+    encabezados = (['Nombre', 'Email', 'Grupo', 'Total_Aciertos', 'Total_Errores', 'Total_Sin_Responder'] +
+                   [f'P{p}' for p in range(1, total_preguntas + 1)])
+    datos_info = [[r['nombre'], r.get('email', ''), r.get('grupo', ''), r['total_aciertos'],
+                   r.get('total_errores', 0), r.get('total_sin_responder', 0)] for r in resultados]
 
-    for reporte in resultados:
-        fila = {
-            'Nombre': reporte['nombre'],
-            'Email': reporte.get('email', ''),
-            'Grupo': reporte.get('grupo', ''),
-            'Total_Aciertos': reporte['total_aciertos'],
-            'Total_Errores': reporte.get('total_errores', 0),
-            'Total_Sin_Responder': reporte.get('total_sin_responder', 0)
-        }
-
-        # Obtener listas de preguntas
-        aciertos = set(reporte['estadisticas']['aciertos'])
-        errores = set(reporte['estadisticas']['errores'])
-        sin_responder = set(reporte['estadisticas']['sin_responder'])
-
-        # Para cada pregunta, marcar su estado
-        for num_pregunta in range(1, total_preguntas + 1):
-            if num_pregunta in aciertos:
-                fila[f'P{num_pregunta}'] = 0  # Correcta
-            elif num_pregunta in errores:
-                fila[f'P{num_pregunta}'] = 1  # Incorrecta
-            elif num_pregunta in sin_responder:
-                fila[f'P{num_pregunta}'] = ''  # Sin responder
-            else:
-                fila[f'P{num_pregunta}'] = ''  # Por defecto
-
-        datos_errores.append(fila)
+    # Estado por pregunta -> texto del CSV (una sola operación vectorizada)
+    matriz = obtener_matriz_estado(resultados, total_preguntas)
 
     try:
-        df = pd.DataFrame(datos_errores)
-        df.to_csv(ruta_salida, index=False, encoding='utf-8-sig')
+        # Escritura por bloques con el módulo csv (mismo formato que DataFrame.to_csv)
+        with open(ruta_salida, 'w', encoding='utf-8-sig', newline='') as archivo:
+            escritor = csv.writer(archivo, lineterminator=os.linesep)
+            escritor.writerow(encabezados)
+            for inicio in range(0, len(resultados), _FILAS_POR_BLOQUE_CSV):
+                fin = inicio + _FILAS_POR_BLOQUE_CSV
+                valores = _ETIQUETAS_ESTADO_CSV[matriz[inicio:fin]].tolist()
+                escritor.writerows(info + fila for info, fila in zip(datos_info[inicio:fin], valores))
+
         print(f"\nReporte de errores exportado: {ruta_salida}")
         print(f"  Formato: 0=Correcta, 1=Incorrecta, vacio=Sin responder")
     except Exception as e:
@@ -109,17 +114,14 @@ def generar_analisis_preguntas_dificiles(resultados: List[Dict[str, Any]], ruta_
         print("No hay resultados")
         return
 
-    # Contar errores por pregunta
-    errores_por_pregunta = {}
+    # Contar errores por pregunta (columna a columna sobre la matriz de estados)
     total_alumnos = len(resultados)
-
-    for reporte in resultados:
-        for pregunta_err in reporte['estadisticas']['errores']:
-            errores_por_pregunta[pregunta_err] = errores_por_pregunta.get(pregunta_err, 0) + 1
+    conteo = (obtener_matriz_estado(resultados, ancho_examen(resultados)) == ESTADO_ERROR).sum(axis=0)
+    preguntas_con_error = np.flatnonzero(conteo)
 
     # Crear DataFrame
     datos_analisis = []
-    for pregunta, num_errores in sorted(errores_por_pregunta.items()):
+    for pregunta, num_errores in zip((preguntas_con_error + 1).tolist(), conteo[preguntas_con_error].tolist()):
         porcentaje_error = (num_errores / total_alumnos * 100)
         datos_analisis.append({
             'Pregunta': pregunta,
@@ -185,26 +187,23 @@ def generar_matriz_errores_excel(resultados: List[Dict[str, Any]], ruta_salida:
             ws.column_dimensions[get_column_letter(col)].width = 3
 
         # Datos
-        for row_idx, reporte in enumerate(resultados, 2):
+        estados = obtener_matriz_estado(resultados, total_preguntas)
+        for row_idx, (reporte, fila) in enumerate(zip(resultados, estados.tolist()), 2):
             ws.cell(row_idx, 1, reporte['nombre'])
             ws.cell(row_idx, 2, reporte.get('email', ''))
             ws.cell(row_idx, 3, reporte['total_aciertos'])
 
-            aciertos = set(reporte['estadisticas']['aciertos'])
-            errores = set(reporte['estadisticas']['errores'])
-            sin_responder = set(reporte['estadisticas']['sin_responder'])
-
-            for p in range(1, total_preguntas + 1):
+            for p, estado in enumerate(fila, 1):
                 col = p + 3
                 cell = ws.cell(row_idx, col)
 
-                if p in aciertos:
+                if estado == ESTADO_ACIERTO:
                     cell.value = "✓"
                     cell.fill = color_correcto
-                elif p in errores:
+                elif estado == ESTADO_ERROR:
                     cell.value = "✗"
                     cell.fill = color_error
-                elif p in sin_responder:
+                elif estado == ESTADO_SIN_RESPONDER:
                     cell.value = "-"
                     cell.fill = color_sin_resp
 
@@ -225,12 +224,29 @@ def generar_matriz_errores_excel(resultados: List[Dict[str, Any]], ruta_salida:
         print(f"Error: {e}")
 
 
-def generar_todos_reportes_errores(resultados: List[Dict[str, Any]], carpeta_salida: str = 'data/reportes'):
+def _ejecutar_exportacion(funcion, resultados: List[Dict[str, Any]], ruta_salida: str) -> float:
     """
-    Genera todos los reportes de errores disponibles.
+    Ejecuta un generador de reporte y devuelve su duración en segundos.
+    Los generadores imprimen sus propios errores, así que además se verifica
+    que el archivo exista para detectar fallos silenciosos.
     """
-    import os
+    inicio = time.perf_counter()
+    funcion(resultados, ruta_salida)
+    if not os.path.exists(ruta_salida):
+        raise RuntimeError(f"No se generó el archivo {os.path.basename(ruta_salida)}")
+    return time.perf_counter() - inicio
 
+
+def generar_todos_reportes_errores(resultados: List[Dict[str, Any]], carpeta_salida: str = 'data/reportes',
+                                   max_hilos: int = 3) -> Dict[str, Dict[str, Any]]:
+    """
+    Genera todos los reportes de errores disponibles en paralelo.
+    Los CSV se escriben en un pool de hilos y la matriz visual (openpyxl)
+    en un proceso aparte. Cada reporte falla de forma independiente.
+
+    Returns:
+        Diccionario por reporte con 'ruta', 'segundos' y 'error' (None si tuvo éxito)
+    """
     if not os.path.exists(carpeta_salida):
         os.makedirs(carpeta_salida)
 
@@ -239,25 +255,67 @@ def generar_todos_reportes_errores(resultados: List[Dict[str, Any]], carpeta_sal
     print("\nGenerando reportes de analisis de errores...")
     print("=" * 60)
 
-    # 1. Matriz de errores (0/1 por pregunta)
-    ruta1 = os.path.join(carpeta_salida, f'errores_matriz_{timestamp}.csv')
-    generar_reporte_errores_csv(resultados, ruta1)
-
-    # 2. Errores por materia
-    ruta2 = os.path.join(carpeta_salida, f'errores_por_materia_{timestamp}.csv')
-    generar_reporte_errores_por_materia(resultados, ruta2)
-
-    # 3. Análisis de preguntas difíciles
-    ruta3 = os.path.join(carpeta_salida, f'preguntas_dificiles_{timestamp}.csv')
-    generar_analisis_preguntas_dificiles(resultados, ruta3)
-
-    # 4. Matriz visual en Excel
-    ruta4 = os.path.join(carpeta_salida, f'matriz_visual_{timestamp}.xlsx')
-    generar_matriz_errores_excel(resultados, ruta4)
+    exportaciones_csv = [
+        # 1. Matriz de errores (0/1 por pregunta)
+        ('Matriz de errores', generar_reporte_errores_csv, f'errores_matriz_{timestamp}.csv'),
+        # 2. Errores por materia
+        ('Errores por materia', generar_reporte_errores_por_materia, f'errores_por_materia_{timestamp}.csv'),
+        # 3. Análisis de preguntas difíciles
+        ('Preguntas dificiles', generar_analisis_preguntas_dificiles, f'preguntas_dificiles_{timestamp}.csv'),
+        # 4. Pares de alumnos con respuestas sospechosamente parecidas (dentro de cada grupo)
+        ('Posibles copias', generar_reporte_similitud_csv, f'posibles_copias_{timestamp}.csv'),
+        # 5. Envíos duplicados que se descartaron o marcaron al calificar
+        ('Envios duplicados', generar_reporte_duplicados_csv, f'envios_duplicados_{timestamp}.csv'),
+    ]
+    # 6. Matriz visual en Excel (en su propio proceso)
+    exportacion_excel = ('Matriz visual', generar_matriz_errores_excel, f'matriz_visual_{timestamp}.xlsx')
+
+    inicio_total = time.perf_counter()
+    futuros = {}
+
+    with ThreadPoolExecutor(max_workers=max_hilos) as pool_hilos:
+        pool_proceso = None
+        nombre, funcion_excel, archivo = exportacion_excel
+        ruta = os.path.join(carpeta_salida, archivo)
+        try:
+            pool_proceso = ProcessPoolExecutor(max_workers=1)
+            futuros[nombre] = (pool_proceso.submit(_ejecutar_exportacion, funcion_excel, resultados, ruta), ruta)
+        except (OSError, NotImplementedError, RuntimeError) as e:
+            print(f"No se pudo iniciar un proceso para '{nombre}' ({e}); se usara un hilo")
+            futuros[nombre] = (pool_hilos.submit(_ejecutar_exportacion, funcion_excel, resultados, ruta), ruta)
+
+        for nombre, funcion, archivo in exportaciones_csv:
+            ruta = os.path.join(carpeta_salida, archivo)
+            futuros[nombre] = (pool_hilos.submit(_ejecutar_exportacion, funcion, resultados, ruta), ruta)
+
+        resumen = {}
+        for nombre, (futuro, ruta) in futuros.items():
+            try:
+                try:
+                    segundos = futuro.result()
+                except BrokenProcessPool as e:
+                    # El proceso murió (memoria, señal); se reintenta en un hilo
+                    print(f"El proceso de '{nombre}' terminó inesperadamente ({e}); se reintenta en un hilo")
+                    segundos = pool_hilos.submit(_ejecutar_exportacion, funcion_excel, resultados, ruta).result()
+                resumen[nombre] = {'ruta': ruta, 'segundos': segundos, 'error': None}
+            except Exception as e:
+                resumen[nombre] = {'ruta': ruta, 'segundos': None, 'error': str(e)}
+
+        if pool_proceso is not None:
+            pool_proceso.shutdown()
 
     print("=" * 60)
+    print("Tiempos por reporte:")
+    for nombre, info in resumen.items():
+        if info['error'] is None:
+            print(f"  {nombre:22s} {info['segundos']:8.3f} s")
+        else:
+            print(f"  {nombre:22s}    ERROR: {info['error']}")
+    print(f"  {'Total':22s} {time.perf_counter() - inicio_total:8.3f} s")
     print(f"Todos los reportes generados en: {carpeta_salida}")
 
+    return resumen
+
 
 if __name__ == "__main__":
     print("Modulo de analisis de errores")
\ No newline at end of file
@@ -0,0 +1,116 @@
+# app/analisis_items.py
+"""
+Análisis de ítems: dificultad, discriminación y distractores por pregunta.
+Todo se calcula con operaciones matriciales sobre las respuestas codificadas
+que conserva el calificador (ver matrices.ResultadosCalificacion).
+"""
+
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from matrices import (obtener_matriz_estado, obtener_cache, tiene_respuestas, ancho_examen,
+                      ESTADO_ACIERTO, ESTADO_SIN_RESPONDER, ESTADO_NO_CALIFICADA,
+                      OPCIONES, CODIGO_VACIA, CODIGO_INVALIDA, TOTAL_CODIGOS, letras_mascara)
+
+# Fracción de alumnos en los grupos superior e inferior del índice de discriminación
+FRACCION_GRUPOS_EXTREMOS = 0.27
+
+
+def calcular_analisis_items(resultados: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Calcula el análisis de ítems de todas las preguntas calificadas.
+
+    Columnas:
+        Pregunta, Respuesta_Correcta, Dificultad (proporción de aciertos),
+        Correlacion_Biserial (punto-biserial ítem vs. resto del examen),
+        Indice_Discriminacion (p superior 27% - p inferior 27%),
+        A..E (alumnos que eligieron cada opción), Sin_Responder, Invalidas
+
+    Si los resultados no conservan las respuestas crudas (lista simple),
+    las columnas de opciones quedan vacías.
+    """
+    if not resultados:
+        return pd.DataFrame()
+
+    estado = obtener_matriz_estado(resultados, ancho_examen(resultados))
+    calificadas = np.flatnonzero((estado != ESTADO_NO_CALIFICADA).any(axis=0))
+    estado = estado[:, calificadas]
+
+    aciertos = (estado == ESTADO_ACIERTO).astype(np.float64)
+    num_alumnos = aciertos.shape[0]
+
+    # Dificultad (índice p)
+    dificultad = aciertos.mean(axis=0)
+
+    # Punto-biserial corregida: cada ítem contra el puntaje del resto del examen
+    total = aciertos.sum(axis=1)
+    resto = total[:, None] - aciertos
+    item_c = aciertos - dificultad
+    resto_c = resto - resto.mean(axis=0)
+    covarianza = (item_c * resto_c).mean(axis=0)
+    desviaciones = item_c.std(axis=0) * resto_c.std(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        biserial = np.where(desviaciones > 0, covarianza / desviaciones, np.nan)
+
+    # Índice de discriminación con los grupos extremos (27%)
+    tamanio_grupo = max(1, int(round(num_alumnos * FRACCION_GRUPOS_EXTREMOS)))
+    orden = np.argsort(total, kind='stable')
+    indice_discriminacion = (aciertos[orden[-tamanio_grupo:]].mean(axis=0) -
+                             aciertos[orden[:tamanio_grupo]].mean(axis=0))
+
+    datos = {
+        'Pregunta': calificadas + 1,
+        'Respuesta_Correcta': '',
+        'Dificultad': np.round(dificultad, 4),
+        'Correlacion_Biserial': np.round(biserial, 4),
+        'Indice_Discriminacion': np.round(indice_discriminacion, 4),
+    }
+
+    # Histograma de opciones por pregunta (un solo bincount)
+    if tiene_respuestas(resultados):
+        codigos = resultados.matriz_respuestas[:, calificadas].astype(np.int64)
+        desplazamiento = np.arange(len(calificadas)) * TOTAL_CODIGOS
+        histograma = np.bincount((codigos + desplazamiento).ravel(),
+                                 minlength=len(calificadas) * TOTAL_CODIGOS)
+        histograma = histograma.reshape(len(calificadas), TOTAL_CODIGOS)
+
+        datos['Respuesta_Correcta'] = [letras_mascara(m) for m in resultados.mascaras[calificadas].tolist()]
+        for codigo, opcion in enumerate(OPCIONES):
+            datos[opcion] = histograma[:, codigo]
+        datos['Sin_Responder'] = histograma[:, CODIGO_VACIA]
+        datos['Invalidas'] = histograma[:, CODIGO_INVALIDA]
+    else:
+        for opcion in OPCIONES:
+            datos[opcion] = np.nan
+        datos['Sin_Responder'] = (estado == ESTADO_SIN_RESPONDER).sum(axis=0)
+        datos['Invalidas'] = np.nan
+
+    return pd.DataFrame(datos)
+
+
+def obtener_analisis_items(resultados: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Devuelve el análisis de ítems, reutilizando el guardado en la caché de resultados."""
+    cache = obtener_cache(resultados)
+    if cache is None:
+        return calcular_analisis_items(resultados)
+
+    if 'analisis_items' not in cache:
+        cache['analisis_items'] = calcular_analisis_items(resultados)
+    return cache['analisis_items']
+
+
+def clasificar_discriminacion(indice: float) -> str:
+    """Clasificación habitual (Ebel) del índice de discriminación."""
+    if pd.isna(indice):
+        return "Sin datos"
+    if indice >= 0.40:
+        return "Excelente"
+    elif indice >= 0.30:
+        return "Buena"
+    elif indice >= 0.20:
+        return "Regular"
+    else:
+        return "Revisar"
+
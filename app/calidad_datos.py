@@ -0,0 +1,263 @@
+# app/calidad_datos.py
+"""
+Perfil de calidad de un archivo de respuestas (o de clave) antes de calificar.
+
+Cada columna de respuestas se factoriza una sola vez: los valores crudos
+distintos se clasifican con las mismas reglas del calificador
+(limpiar_respuesta + codificar_respuesta) y el bloque queda como una matriz
+de códigos alumnos x preguntas. Los conteos por pregunta y por alumno salen
+de dos np.bincount sobre esa matriz, sin recorrer celdas en Python.
+"""
+
+import os
+import sys
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import COLUMNA_NOMBRE, COLUMNA_EMAIL
+from data_loader import (cargar_datos, extraer_columnas_respuestas, obtener_columna_flexible,
+                         limpiar_respuesta, limpiar_respuesta_clave, codificar_columna)
+from matrices import (OPCIONES, CODIGO_VACIA, CODIGO_INVALIDA, TOTAL_CODIGOS, codificar_respuesta,
+                      mascara_respuesta, codigos_principales)
+
+# Alertas por alumno
+UMBRAL_CASI_VACIO = 0.9  # Proporción de preguntas en blanco para 'Casi vacío'
+UMBRAL_MISMA_LETRA = 0.9  # Proporción de respuestas con la misma letra para 'Misma letra'
+MIN_RESPONDIDAS_PATRON = 10  # Respuestas mínimas para juzgar el patrón de letras
+UMBRAL_INVALIDAS = 0.1  # Proporción de respuestas inválidas para 'Inválidas'
+MIN_VACIAS_ATIPICO = 0.2  # Proporción mínima de blancos para 'Muchas vacías' (además del IQR)
+
+# Valores crudos que se muestran por pregunta
+MAX_VALORES_MOSTRADOS = 6
+
+ALERTA_CASI_VACIO = 'Casi vacío'
+ALERTA_MISMA_LETRA = 'Misma letra'
+ALERTA_INVALIDAS = 'Inválidas'
+ALERTA_MUCHAS_VACIAS = 'Muchas vacías'
+
+
+def _codigo_celda(valor, es_clave: bool) -> int:
+    """Código de un valor crudo; en la clave, 'B/D' vale por su opción más baja."""
+    limpio = limpiar_respuesta(valor)
+    codigo = codificar_respuesta(limpio)
+    if es_clave and codigo == CODIGO_INVALIDA:
+        mascara = mascara_respuesta(limpiar_respuesta_clave(valor))
+        if mascara:
+            codigo = int(codigos_principales(np.array([mascara]))[0])
+    return codigo
+
+
+def _texto_valores(unicos: pd.Index, conteos: np.ndarray, seleccion: Optional[np.ndarray] = None) -> str:
+    """'A (120); b (3); ...' con los valores más frecuentes primero."""
+    indices = np.arange(len(unicos)) if seleccion is None else np.flatnonzero(seleccion)
+    indices = indices[np.argsort(-conteos[indices], kind='stable')]
+    texto = '; '.join(f"{unicos[i]} ({conteos[i]})" for i in indices[:MAX_VALORES_MOSTRADOS])
+    if len(indices) > MAX_VALORES_MOSTRADOS:
+        texto += f"; ... ({len(indices) - MAX_VALORES_MOSTRADOS} más)"
+    return texto
+
+
+def _alertas_alumnos(pct_vacias: np.ndarray, pct_invalidas: np.ndarray, respondidas: np.ndarray,
+                     pct_dominante: np.ndarray, letra_dominante: np.ndarray) -> np.ndarray:
+    """Texto de alertas de cada alumno ('' si ninguna)."""
+    casi_vacio = pct_vacias >= UMBRAL_CASI_VACIO * 100
+    misma_letra = (respondidas >= MIN_RESPONDIDAS_PATRON) & (pct_dominante >= UMBRAL_MISMA_LETRA * 100)
+    invalidas = pct_invalidas >= UMBRAL_INVALIDAS * 100
+
+    # Blancos atípicos respecto al resto del grupo (regla de Tukey)
+    q1, q3 = np.percentile(pct_vacias, [25, 75]) if len(pct_vacias) else (0, 0)
+    limite = max(q3 + 1.5 * (q3 - q1), MIN_VACIAS_ATIPICO * 100)
+    muchas_vacias = (pct_vacias > limite) & ~casi_vacio
+
+    alertas = np.full(len(pct_vacias), '', dtype=object)
+    for mascara, texto in ((casi_vacio, ALERTA_CASI_VACIO),
+                           (muchas_vacias, ALERTA_MUCHAS_VACIAS),
+                           (misma_letra, ALERTA_MISMA_LETRA + ' (' + letra_dominante.astype(object) + ')'),
+                           (invalidas, ALERTA_INVALIDAS)):
+        texto = np.broadcast_to(np.asarray(texto, dtype=object), alertas.shape)
+        previas = alertas[mascara]
+        alertas[mascara] = np.where(previas == '', '', previas + ', ') + texto[mascara]
+    return alertas
+
+
+def perfilar_respuestas(df: pd.DataFrame, columnas_respuestas: Optional[Dict[int, str]] = None,
+                        es_clave: bool = False) -> Dict[str, Any]:
+    """
+    Perfil de calidad del bloque de respuestas.
+
+    Returns:
+        {'preguntas': DataFrame con una fila por pregunta (vacías, inválidas,
+                      conteo por opción y valores crudos vistos),
+         'alumnos': DataFrame con una fila por alumno (blancos, inválidas,
+                    letra dominante y alertas),
+         'resumen': totales del archivo}
+    """
+    if columnas_respuestas is None:
+        columnas_respuestas = extraer_columnas_respuestas(df)
+    numeros = sorted(columnas_respuestas)
+    num_alumnos, num_preguntas = len(df), len(numeros)
+
+    # Una factorización por columna; los valores crudos se clasifican una vez para todo el archivo
+    codigos = np.empty((num_alumnos, num_preguntas), dtype=np.uint8)
+    vistos: Dict[Any, int] = {}
+    valores, invalidos, distintos = [], [], []
+    for j, numero in enumerate(numeros):
+        codigos[:, j], indices, unicos = codificar_columna(
+            df[columnas_respuestas[numero]], vistos, lambda valor: _codigo_celda(valor, es_clave),
+            con_valores=True)
+
+        conteos = np.bincount(indices[indices >= 0], minlength=len(unicos))
+        invalido = np.array([vistos[valor] == CODIGO_INVALIDA for valor in unicos], dtype=bool)
+        valores.append(_texto_valores(unicos, conteos))
+        invalidos.append(_texto_valores(unicos, conteos, invalido))
+        distintos.append(len(unicos))
+
+    # Conteo de cada código por pregunta y por alumno
+    por_pregunta = np.bincount((np.arange(num_preguntas, dtype=np.int64) * TOTAL_CODIGOS + codigos).ravel(),
+                               minlength=num_preguntas * TOTAL_CODIGOS).reshape(num_preguntas, TOTAL_CODIGOS)
+    por_alumno = np.bincount((np.arange(num_alumnos, dtype=np.int64)[:, None] * TOTAL_CODIGOS + codigos).ravel(),
+                             minlength=num_alumnos * TOTAL_CODIGOS).reshape(num_alumnos, TOTAL_CODIGOS)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        preguntas = pd.DataFrame({
+            'Pregunta': numeros,
+            'Columna': [columnas_respuestas[n] for n in numeros],
+            'Respondidas': num_alumnos - por_pregunta[:, CODIGO_VACIA],
+            'Vacias': por_pregunta[:, CODIGO_VACIA],
+            'Pct_Vacias': np.round(100.0 * por_pregunta[:, CODIGO_VACIA] / max(num_alumnos, 1), 2),
+            'Invalidas': por_pregunta[:, CODIGO_INVALIDA],
+            **{opcion: por_pregunta[:, codigo] for codigo, opcion in enumerate(OPCIONES)},
+            'Valores_Distintos': distintos,
+            'Valores': valores,
+            'Valores_Invalidos': invalidos,
+        })
+
+        opciones = por_alumno[:, :len(OPCIONES)]
+        respondidas = num_preguntas - por_alumno[:, CODIGO_VACIA]
+        dominante = opciones.argmax(axis=1) if num_preguntas else np.zeros(num_alumnos, dtype=np.int64)
+        pct_vacias = np.round(100.0 * por_alumno[:, CODIGO_VACIA] / max(num_preguntas, 1), 2)
+        pct_invalidas = np.round(np.nan_to_num(100.0 * por_alumno[:, CODIGO_INVALIDA] / respondidas), 2)
+        pct_dominante = np.round(np.nan_to_num(100.0 * opciones.max(axis=1, initial=0) / respondidas), 2)
+    letra_dominante = np.where(respondidas > por_alumno[:, CODIGO_INVALIDA], np.array(OPCIONES)[dominante], '')
+
+    col_nombre = obtener_columna_flexible(df, [COLUMNA_NOMBRE, 'Nombre', 'Alumno'])
+    col_email = obtener_columna_flexible(df, [COLUMNA_EMAIL, 'Email', 'Correo'])
+    alumnos = pd.DataFrame({
+        'Fila': np.arange(num_alumnos) + 2,  # Fila en el CSV (1 = encabezados)
+        'Nombre': df[col_nombre].values if col_nombre else '',
+        'Email': df[col_email].values if col_email else '',
+        'Respondidas': respondidas,
+        'Vacias': por_alumno[:, CODIGO_VACIA],
+        'Pct_Vacias': pct_vacias,
+        'Invalidas': por_alumno[:, CODIGO_INVALIDA],
+        'Letra_Dominante': letra_dominante,
+        'Pct_Letra_Dominante': pct_dominante,
+        'Alertas': _alertas_alumnos(pct_vacias, pct_invalidas, respondidas, pct_dominante, letra_dominante),
+    })
+
+    marcados = alumnos['Alertas'] != ''
+    resumen = {
+        'alumnos': num_alumnos,
+        'preguntas': num_preguntas,
+        'pct_vacias': round(100.0 * float(por_pregunta[:, CODIGO_VACIA].sum()) / max(codigos.size, 1), 2),
+        'invalidas': int(por_pregunta[:, CODIGO_INVALIDA].sum()),
+        'preguntas_con_invalidas': [int(n) for n in preguntas.loc[preguntas['Invalidas'] > 0, 'Pregunta']],
+        'preguntas_sin_respuesta': [int(n) for n in preguntas.loc[preguntas['Respondidas'] == 0, 'Pregunta']],
+        'alumnos_marcados': int(marcados.sum()),
+        'alertas': {alerta: int(alumnos['Alertas'].str.contains(alerta, regex=False).sum())
+                    for alerta in (ALERTA_CASI_VACIO, ALERTA_MUCHAS_VACIAS, ALERTA_MISMA_LETRA, ALERTA_INVALIDAS)},
+    }
+    return {'preguntas': preguntas, 'alumnos': alumnos, 'resumen': resumen}
+
+
+def advertencias_calidad(perfil: Dict[str, Any], es_clave: bool = False) -> List[str]:
+    """Advertencias en texto a partir de un perfil (para la validación, la GUI y la consola)."""
+    resumen = perfil['resumen']
+    preguntas = perfil['preguntas']
+    advertencias = []
+
+    if es_clave:
+        vacias = [int(n) for n in preguntas.loc[preguntas['Vacias'] > 0, 'Pregunta']]
+        if vacias:
+            advertencias.append(f"{len(vacias)} preguntas sin respuesta en la clave (no se calificarán): "
+                                f"{vacias[:10]}{' ...' if len(vacias) > 10 else ''}")
+    elif resumen['preguntas_sin_respuesta']:
+        advertencias.append(f"{len(resumen['preguntas_sin_respuesta'])} preguntas sin ninguna respuesta: "
+                            f"{resumen['preguntas_sin_respuesta'][:10]}")
+
+    if resumen['invalidas']:
+        con_invalidas = preguntas[preguntas['Invalidas'] > 0]
+        ejemplos = '; '.join(f"P{p}: {v}" for p, v in zip(con_invalidas['Pregunta'][:3],
+                                                          con_invalidas['Valores_Invalidos'][:3]))
+        advertencias.append(f"{resumen['invalidas']} respuestas inválidas en {len(con_invalidas)} preguntas "
+                            f"({ejemplos})")
+
+    if not es_clave:
+        for alerta, cantidad in resumen['alertas'].items():
+            if cantidad:
+                advertencias.append(f"{cantidad} alumno(s) con alerta '{alerta}'")
+    return advertencias
+
+
+def imprimir_perfil(perfil: Dict[str, Any], max_filas: int = 10):
+    """Muestra el perfil en consola: resumen, preguntas con problemas y alumnos marcados."""
+    resumen = perfil['resumen']
+    print(f"  Alumnos: {resumen['alumnos']}, preguntas: {resumen['preguntas']}")
+    print(f"  Celdas en blanco: {resumen['pct_vacias']:.2f}%")
+    print(f"  Respuestas inválidas: {resumen['invalidas']}")
+
+    preguntas = perfil['preguntas']
+    problemas = preguntas[(preguntas['Invalidas'] > 0) | (preguntas['Respondidas'] == 0)]
+    if len(problemas):
+        print(f"\n  Preguntas con valores inválidos o sin respuestas ({len(problemas)}):")
+        for _, fila in problemas.head(max_filas).iterrows():
+            print(f"    P{fila['Pregunta']:3d}: {fila['Vacias']} vacías, {fila['Invalidas']} inválidas"
+                  f" -> {fila['Valores_Invalidos'] or 'sin respuestas'}")
+        if len(problemas) > max_filas:
+            print(f"    ... y {len(problemas) - max_filas} más")
+
+    marcados = perfil['alumnos'][perfil['alumnos']['Alertas'] != '']
+    if len(marcados):
+        print(f"\n  Alumnos marcados ({len(marcados)}):")
+        for _, fila in marcados.head(max_filas).iterrows():
+            print(f"    Fila {fila['Fila']}: {fila['Nombre'] or fila['Email']} - {fila['Alertas']}"
+                  f" ({fila['Pct_Vacias']:.0f}% en blanco)")
+        if len(marcados) > max_filas:
+            print(f"    ... y {len(marcados) - max_filas} más")
+
+
+def generar_reporte_calidad_csv(perfil: Dict[str, Any], carpeta_salida: str, prefijo: str = 'calidad'):
+    """Exporta el perfil a dos CSV: <prefijo>_preguntas.csv y <prefijo>_alumnos.csv."""
+    try:
+        os.makedirs(carpeta_salida, exist_ok=True)
+        for parte in ('preguntas', 'alumnos'):
+            ruta = os.path.join(carpeta_salida, f"{prefijo}_{parte}.csv")
+            perfil[parte].to_csv(ruta, index=False, encoding='utf-8-sig')
+            print(f"Reporte de calidad exportado: {ruta}")
+    except Exception as e:
+        print(f"Error al generar reporte de calidad: {e}")
+
+
+if __name__ == "__main__":
+    # python calidad_datos.py <archivo.csv> [carpeta_salida]
+    if len(sys.argv) < 2:
+        print("Uso: python calidad_datos.py <archivo.csv> [carpeta_salida]")
+        sys.exit(1)
+
+    archivo = sys.argv[1]
+    datos = cargar_datos(archivo)
+    if datos is None:
+        sys.exit(1)
+
+    clave_cli = 'clave' in os.path.basename(archivo).lower()
+    perfil_cli = perfilar_respuestas(datos, es_clave=clave_cli)
+    print("\nCALIDAD DE DATOS")
+    print("-" * 70)
+    imprimir_perfil(perfil_cli)
+    for advertencia in advertencias_calidad(perfil_cli, es_clave=clave_cli):
+        print(f"  ADVERTENCIA: {advertencia}")
+    if len(sys.argv) > 2:
+        generar_reporte_calidad_csv(perfil_cli, sys.argv[2],
+                                    os.path.splitext(os.path.basename(archivo))[0] + '_calidad')
@@ -0,0 +1,135 @@
+# app/confiabilidad.py
+"""
+Estadísticas de confiabilidad por materia: KR-20 (alfa de Cronbach para
+reactivos dicotómicos), alfa si se elimina cada pregunta y error estándar
+de medición (SEM). Se calculan para todas las materias a la vez con
+operaciones matriciales sobre la matriz alumno x pregunta.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import MAPEO_MATERIAS
+from matrices import (obtener_matriz_estado, obtener_cache, ancho_examen,
+                      ESTADO_ACIERTO, ESTADO_NO_CALIFICADA)
+
+NOMBRE_EXAMEN_COMPLETO = 'Examen completo'
+
+
+def _alfa(num_items: np.ndarray, suma_varianzas: np.ndarray, varianza_total: np.ndarray) -> np.ndarray:
+    """Fórmula de KR-20 / alfa, con NaN cuando no está definida."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alfa = num_items / (num_items - 1) * (1 - suma_varianzas / varianza_total)
+    return np.where((num_items > 1) & (varianza_total > 0), alfa, np.nan)
+
+
+def calcular_confiabilidad(aciertos: np.ndarray, materia_por_pregunta: np.ndarray,
+                           nombres_materias: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcula la confiabilidad de cada materia.
+
+    Args:
+        aciertos: Matriz alumno x pregunta (1 = correcta, 0 = otro caso)
+        materia_por_pregunta: Índice de materia de cada columna (-1 = sin materia)
+        nombres_materias: Nombre de cada índice de materia
+
+    Returns:
+        (resumen por materia, alfa si se elimina cada pregunta)
+    """
+    aciertos = aciertos.astype(np.float64)
+    num_materias = len(nombres_materias)
+    con_materia = materia_por_pregunta >= 0
+
+    # Matriz pregunta -> materia (one-hot), para sumar por materia en un producto
+    pertenencia = np.zeros((aciertos.shape[1], num_materias))
+    pertenencia[np.flatnonzero(con_materia), materia_por_pregunta[con_materia]] = 1
+
+    num_items = pertenencia.sum(axis=0)
+    totales = aciertos @ pertenencia  # alumnos x materias
+    varianza_items = aciertos.var(axis=0)  # p * q
+    suma_varianzas = varianza_items @ pertenencia
+    varianza_total = totales.var(axis=0)
+
+    kr20 = _alfa(num_items, suma_varianzas, varianza_total)
+    desviacion = np.sqrt(varianza_total)
+    with np.errstate(invalid='ignore'):
+        sem = desviacion * np.sqrt(1 - kr20)
+
+    resumen = pd.DataFrame({
+        'Materia': nombres_materias,
+        'Preguntas': num_items.astype(int),
+        'Alumnos': aciertos.shape[0],
+        'Media': np.round(totales.mean(axis=0), 3),
+        'Desviacion': np.round(desviacion, 3),
+        'KR20': np.round(kr20, 4),
+        'SEM': np.round(sem, 3),
+    })
+
+    # Alfa si se elimina cada pregunta, todas a la vez:
+    # var(T - X_i) = var(T) + var(X_i) - 2 cov(T, X_i)
+    columnas = np.flatnonzero(con_materia)
+    materia_col = materia_por_pregunta[columnas]
+    items_c = aciertos[:, columnas] - aciertos[:, columnas].mean(axis=0)
+    totales_c = (totales - totales.mean(axis=0))[:, materia_col]
+    covarianza = (items_c * totales_c).mean(axis=0)
+
+    varianza_sin_item = (varianza_total[materia_col] + varianza_items[columnas] - 2 * covarianza)
+    alfa_sin_item = _alfa(num_items[materia_col] - 1,
+                          suma_varianzas[materia_col] - varianza_items[columnas],
+                          varianza_sin_item)
+
+    por_pregunta = pd.DataFrame({
+        'Pregunta': columnas + 1,
+        'Materia': [nombres_materias[m] for m in materia_col],
+        'KR20_Materia': np.round(kr20[materia_col], 4),
+        'Alfa_Si_Se_Elimina': np.round(alfa_sin_item, 4),
+    })
+
+    return resumen, por_pregunta
+
+
+def calcular_confiabilidad_resultados(resultados: List[Dict[str, Any]],
+                                      mapeo_materias: Optional[Dict[str, range]] = None
+                                      ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcula la confiabilidad a partir de los resultados del calificador,
+    por materia (según mapeo_materias) y para el examen completo.
+    """
+    if mapeo_materias is None:
+        mapeo_materias = MAPEO_MATERIAS
+
+    if not resultados:
+        return pd.DataFrame(), pd.DataFrame()
+
+    estado = obtener_matriz_estado(resultados, ancho_examen(resultados))
+    aciertos = estado == ESTADO_ACIERTO
+    calificada = (estado != ESTADO_NO_CALIFICADA).any(axis=0)
+
+    nombres = list(mapeo_materias.keys())
+    materia_por_pregunta = np.full(estado.shape[1], -1, dtype=np.int64)
+    for indice, rango in enumerate(mapeo_materias.values()):
+        preguntas = np.array([p - 1 for p in rango if 0 < p <= estado.shape[1]], dtype=np.int64)
+        materia_por_pregunta[preguntas] = indice
+    materia_por_pregunta[~calificada] = -1
+
+    resumen, por_pregunta = calcular_confiabilidad(aciertos, materia_por_pregunta, nombres)
+
+    # Examen completo (todas las preguntas calificadas como una sola escala)
+    global_por_pregunta = np.where(calificada, 0, -1)
+    resumen_global, _ = calcular_confiabilidad(aciertos, global_por_pregunta, [NOMBRE_EXAMEN_COMPLETO])
+    resumen = pd.concat([resumen, resumen_global], ignore_index=True)
+
+    return resumen, por_pregunta
+
+
+def obtener_confiabilidad(resultados: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Confiabilidad con el mapeo de config, reutilizando la caché de los resultados."""
+    cache = obtener_cache(resultados)
+    if cache is None:
+        return calcular_confiabilidad_resultados(resultados)
+
+    if 'confiabilidad' not in cache:
+        cache['confiabilidad'] = calcular_confiabilidad_resultados(resultados)
+    return cache['confiabilidad']
@@ -5,6 +5,7 @@ import os
 # Rutas y configuración de archivos
 RUTA_DATOS = os.path.join(os.path.dirname(__file__), '..', 'data')
 RUTA_EXPORTACION_DEFAULT = os.path.join(RUTA_DATOS, 'resultados')
+RUTA_HISTORIAL = os.path.join(RUTA_DATOS, 'historial_resultados.db')
 
 # Crear carpeta de datos si no existe
 if not os.path.exists(RUTA_DATOS):
@@ -33,6 +34,11 @@ COLUMNA_PUNTUACION_TOTAL = 'Puntuación total'
 # Total de preguntas
 TOTAL_PREGUNTAS = 110
 
+# Envíos duplicados del mismo alumno (ver duplicados.py):
+# 'ultimo' (el más reciente), 'mejor' (el de mayor puntaje), 'marcar' (calificar todos y marcarlos)
+# o None para no buscar duplicados
+POLITICA_DUPLICADOS = 'ultimo'
+
 # Respuestas válidas
 RESPUESTAS_VALIDAS = ['A', 'B', 'C', 'D', 'E']
 
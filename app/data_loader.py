@@ -1,8 +1,21 @@
 # app/data_loader.py
 import pandas as pd
-from typing import Optional, Dict, List, Tuple
+import numpy as np
+from typing import Optional, Dict, List, Tuple, Callable, Any
 import re
 import os
+import io
+import mmap
+from matrices import (OPCIONES, CODIGO_VACIA, CODIGO_INVALIDA, codificar_respuesta,
+                      mascara_respuesta, letras_mascara)
+
+
+# Codificaciones que se prueban al leer un CSV (en este orden)
+ENCODINGS_CSV = ['utf-8', 'utf-8-sig', 'latin-1', 'iso-8859-1', 'cp1252']
+
+# Bytes que se leen por vez al buscar las primeras filas / al contar saltos de línea
+BLOQUE_LECTURA = 64 * 1024
+BLOQUE_CONTEO = 4 * 1024 * 1024
 
 
 def cargar_datos(ruta_completa_archivo: str) -> Optional[pd.DataFrame]:
@@ -12,10 +25,9 @@ def cargar_datos(ruta_completa_archivo: str) -> Optional[pd.DataFrame]:
         return None
 
     try:
-        encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'iso-8859-1', 'cp1252']
         df = None
 
-        for encoding in encodings:
+        for encoding in ENCODINGS_CSV:
             try:
                 df = pd.read_csv(ruta_completa_archivo, encoding=encoding)
                 print(f"Archivo cargado: {os.path.basename(ruta_completa_archivo)}")
@@ -36,6 +48,70 @@ def cargar_datos(ruta_completa_archivo: str) -> Optional[pd.DataFrame]:
         return None
 
 
+def cargar_muestra(ruta_archivo: str, filas: int = 5) -> Optional[pd.DataFrame]:
+    """
+    Encabezados y primeras filas de un CSV sin leer el archivo completo.
+    Se leen bloques desde el inicio hasta tener filas + 1 saltos de línea
+    (más, si alguna celda trae saltos de línea entre comillas).
+    """
+    if not os.path.exists(ruta_archivo):
+        print(f"Error: Archivo no encontrado en '{ruta_archivo}'")
+        return None
+
+    try:
+        with open(ruta_archivo, 'rb') as archivo:
+            contenido = b''
+            fin = False
+            while not fin:
+                bloque = archivo.read(BLOQUE_LECTURA)
+                fin = len(bloque) < BLOQUE_LECTURA
+                contenido += bloque
+                if contenido.count(b'\n') <= filas:
+                    continue
+                # Se corta en el último salto de línea para no dejar una fila a medias
+                completo = contenido if fin else contenido[:contenido.rfind(b'\n') + 1]
+                muestra = _leer_csv_bytes(completo, filas)
+                if muestra is not None and (len(muestra) >= filas or fin):
+                    return muestra
+            return _leer_csv_bytes(contenido, filas)
+    except Exception as e:
+        print(f"Error al leer el archivo: {e}")
+        return None
+
+
+def _leer_csv_bytes(contenido: bytes, filas: int) -> Optional[pd.DataFrame]:
+    for encoding in ENCODINGS_CSV:
+        try:
+            return pd.read_csv(io.BytesIO(contenido), encoding=encoding, nrows=filas)
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+        except pd.errors.ParserError:
+            return None  # Fila cortada a la mitad (celda entre comillas): se lee otro bloque
+    return None
+
+
+def contar_filas(ruta_archivo: str) -> int:
+    """
+    Filas de datos de un CSV contando saltos de línea sobre el archivo mapeado
+    en memoria (sin decodificar ni parsear). Si alguna celda trae saltos de
+    línea entre comillas, el resultado es una cota superior.
+    """
+    with open(ruta_archivo, 'rb') as archivo:
+        tamanio = os.fstat(archivo.fileno()).st_size
+        if tamanio == 0:
+            return 0
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            # Vista de numpy sobre el mapa (sin copiar); se compara por bloques para no crear
+            # un arreglo de booleanos del tamaño del archivo
+            datos = np.frombuffer(mapa, dtype=np.uint8)
+            saltos = sum(int(np.count_nonzero(datos[inicio:inicio + BLOQUE_CONTEO] == ord('\n')))
+                         for inicio in range(0, tamanio, BLOQUE_CONTEO))
+            termina_en_salto = datos[-1] == ord('\n')
+            del datos  # El mapa no se puede cerrar mientras haya vistas sobre él
+    lineas = saltos + (0 if termina_en_salto else 1)
+    return max(lineas - 1, 0)  # Sin la fila de encabezados
+
+
 def extraer_columnas_respuestas(df: pd.DataFrame) -> Dict[int, str]:
     """
     Extrae las columnas de RESPUESTAS (no de puntuación ni comentarios).
@@ -92,6 +168,9 @@ def obtener_respuestas_correctas(df_clave: pd.DataFrame, columnas_respuestas: Di
     """
     Extrae las respuestas correctas de la primera fila del CSV de clave.
     Busca la columna correcta incluso si el formato es diferente.
+    Una celda con varias opciones separadas ("B/D", "B, D", "B D") acepta
+    cualquiera de ellas y se devuelve como 'B/D'. Letras juntas ("BD") o
+    repetidas ("B/B") se reportan como INVALIDA (ver matrices.mascara_respuesta).
     """
     if len(df_clave) == 0:
         print("Error: El archivo de clave esta vacio")
@@ -106,25 +185,26 @@ def obtener_respuestas_correctas(df_clave: pd.DataFrame, columnas_respuestas: Di
     print("\nExtrayendo respuestas correctas...")
     print("-" * 60)
 
-    # Para cada pregunta que queremos calificar
-    for num_pregunta in sorted(columnas_respuestas.keys()):
-        # Buscar la columna correspondiente en la clave
-        if num_pregunta in columnas_clave:
-            nombre_columna_clave = columnas_clave[num_pregunta]
-
-            if nombre_columna_clave in primera_fila.index:
-                valor_raw = primera_fila[nombre_columna_clave]
-                respuesta = str(valor_raw).strip().upper()
-
-                # Limpiar la respuesta
-                respuesta = respuesta.replace('.', '').replace(',', '').replace(';', '')
-
-                if respuesta in ['A', 'B', 'C', 'D', 'E']:
-                    respuestas_correctas[num_pregunta] = respuesta
-                    if num_pregunta <= 5 or num_pregunta % 20 == 0:
-                        print(f"  Pregunta {num_pregunta:3d}: {respuesta}")
-                elif respuesta and respuesta not in ['', 'NAN', 'NONE']:
-                    print(f"  Pregunta {num_pregunta:3d}: '{respuesta}' (INVALIDA - ignorada)")
+    # Se codifica toda la fila de la clave de una vez (mismo normalizador que las respuestas)
+    preguntas = [p for p in sorted(columnas_respuestas.keys())
+                 if p in columnas_clave and columnas_clave[p] in primera_fila.index]
+    codigos = codificar_bloque(df_clave.iloc[:1], {p: columnas_clave[p] for p in preguntas})
+
+    for num_pregunta in preguntas:
+        codigo = codigos[0, num_pregunta - 1]
+        if codigo < len(OPCIONES):
+            respuesta = OPCIONES[codigo]
+            respuestas_correctas[num_pregunta] = respuesta
+            if num_pregunta <= 5 or num_pregunta % 20 == 0:
+                print(f"  Pregunta {num_pregunta:3d}: {respuesta}")
+        elif codigo == CODIGO_INVALIDA:
+            respuesta = limpiar_respuesta_clave(primera_fila[columnas_clave[num_pregunta]])
+            mascara = mascara_respuesta(respuesta)
+            if mascara:
+                respuestas_correctas[num_pregunta] = letras_mascara(mascara)
+                print(f"  Pregunta {num_pregunta:3d}: {respuestas_correctas[num_pregunta]} (varias aceptadas)")
+            elif respuesta not in ['NAN', 'NONE']:
+                print(f"  Pregunta {num_pregunta:3d}: '{respuesta}' (INVALIDA - ignorada)")
 
     print("-" * 60)
     print(f"Total de respuestas correctas cargadas: {len(respuestas_correctas)}\n")
@@ -137,20 +217,27 @@ def obtener_respuestas_correctas(df_clave: pd.DataFrame, columnas_respuestas: Di
 
 
 def validar_estructura_csv(df: pd.DataFrame, es_clave: bool = False) -> Tuple[bool, List[str]]:
-    """Valida la estructura del CSV de Google Forms."""
+    """
+    Valida la estructura del CSV de Google Forms.
+    Las advertencias incluyen las del perfil de calidad (calidad_datos):
+    valores inválidos, preguntas vacías y envíos atípicos.
+    """
+    from calidad_datos import perfilar_respuestas, advertencias_calidad
+
     advertencias = []
     es_valido = True
 
     # Verificar columnas de preguntas (ignorando [Puntuación] y [Comentarios])
-    columnas_pregunta = []
+    columnas_pregunta = {}
     for col in df.columns:
         col_str = str(col).strip()
         if '[Puntuación]' not in col_str and '[Comentarios]' not in col_str and '[Puntuacion]' not in col_str:
             # Detectar los 3 formatos
-            if (re.match(r'^\d+\.?\s*$', col_str) or
-                    re.match(r'^pregunta[_\s]*\d+$', col_str, re.IGNORECASE) or
-                    re.match(r'^P\d+$', col_str, re.IGNORECASE)):
-                columnas_pregunta.append(col)
+            match = (re.match(r'^(\d+)\.?\s*$', col_str) or
+                     re.match(r'^pregunta[_\s]*(\d+)$', col_str, re.IGNORECASE) or
+                     re.match(r'^P(\d+)$', col_str, re.IGNORECASE))
+            if match:
+                columnas_pregunta[int(match.group(1))] = col
 
     if len(columnas_pregunta) == 0:
         print("Error: No se encontraron columnas de preguntas")
@@ -173,6 +260,13 @@ def validar_estructura_csv(df: pd.DataFrame, es_clave: bool = False) -> Tuple[bo
         else:
             print(f"Se encontraron {len(df)} respuestas de alumnos")
 
+    if es_valido:
+        # La clave se califica solo con su primera fila
+        perfil = perfilar_respuestas(df.iloc[:1] if es_clave else df, columnas_pregunta, es_clave)
+        for advertencia in advertencias_calidad(perfil, es_clave):
+            advertencias.append(advertencia)
+            print(f"ADVERTENCIA: {advertencia}")
+
     return es_valido, advertencias
 
 
@@ -214,19 +308,84 @@ def limpiar_respuesta(respuesta: any) -> str:
     return respuesta_str
 
 
-def diagnosticar_csv(ruta_archivo: str):
-    """Función de diagnóstico para entender la estructura del CSV."""
+def limpiar_respuesta_clave(respuesta: any) -> str:
+    """Como limpiar_respuesta, pero las comas y puntos y coma quedan como separador ('B,D' -> 'B D')."""
+    if pd.isna(respuesta):
+        return ''
+    return limpiar_respuesta(str(respuesta).replace(',', ' ').replace(';', ' '))
+
+
+def _codigo_respuesta(valor: Any) -> int:
+    return codificar_respuesta(limpiar_respuesta(valor))
+
+
+def codificar_columna(columna: pd.Series, vistos: Optional[Dict] = None,
+                      codificar: Callable[[Any], int] = _codigo_respuesta, con_valores: bool = False):
+    """
+    Limpia y codifica una columna completa de respuestas (códigos de matrices, uint8).
+    Igual que columna.map(limpiar_respuesta).map(codificar_respuesta), pero cada
+    valor distinto se limpia una sola vez: Google Forms solo produce unos
+    cuantos valores distintos por columna.
+
+    Args:
+        columna: Respuestas crudas
+        vistos: Caché valor crudo -> código, para compartirla entre columnas
+        codificar: Código de un valor crudo (por defecto el de las respuestas de alumnos)
+        con_valores: Devolver también la factorización (códigos, indices, unicos);
+                     indices es -1 en los nulos
+    """
+    if vistos is None:
+        vistos = {}
+
+    indices, unicos = pd.factorize(columna)
+    tabla = np.empty(len(unicos) + 1, dtype=np.uint8)
+    for i, valor in enumerate(unicos):
+        codigo = vistos.get(valor)
+        if codigo is None:
+            codigo = vistos[valor] = codificar(valor)
+        tabla[i] = codigo
+    tabla[-1] = CODIGO_VACIA  # factorize marca los nulos con -1
+
+    if con_valores:
+        return tabla[indices], indices, unicos
+    return tabla[indices]
+
+
+def codificar_bloque(df: pd.DataFrame, columnas_respuestas: Dict[int, str],
+                     total_columnas: Optional[int] = None) -> np.ndarray:
+    """
+    Codifica todas las columnas de respuestas en una matriz alumnos x preguntas
+    (columna j = pregunta j + 1; CODIGO_VACIA donde no hay columna).
+    """
+    if total_columnas is None:
+        total_columnas = max(columnas_respuestas.keys(), default=0)
+
+    matriz = np.full((len(df), total_columnas), CODIGO_VACIA, dtype=np.uint8)
+    vistos: Dict = {}
+    for num_pregunta, nombre_columna in columnas_respuestas.items():
+        if num_pregunta <= total_columnas:
+            matriz[:, num_pregunta - 1] = codificar_columna(df[nombre_columna], vistos)
+    return matriz
+
+
+def diagnosticar_csv(ruta_archivo: str, completo: bool = False, filas: int = 5):
+    """
+    Función de diagnóstico para entender la estructura del CSV.
+    Por defecto solo lee los encabezados y las primeras filas (y cuenta las
+    filas sin parsear); con completo=True carga el archivo y agrega el perfil
+    de calidad de las respuestas.
+    """
     print(f"\n{'=' * 60}")
     print(f"DIAGNOSTICO DEL ARCHIVO")
     print(f"{'=' * 60}")
     print(f"Archivo: {ruta_archivo}\n")
 
-    df = cargar_datos(ruta_archivo)
+    df = cargar_datos(ruta_archivo) if completo else cargar_muestra(ruta_archivo, filas)
     if df is None:
         return
 
     print(f"Informacion general:")
-    print(f"  - Filas: {len(df)}")
+    print(f"  - Filas: {len(df) if completo else contar_filas(ruta_archivo)}")
     print(f"  - Columnas: {len(df.columns)}")
 
     print(f"\nPrimeras 20 columnas:")
@@ -242,6 +401,11 @@ def diagnosticar_csv(ruta_archivo: str):
         print(f"  Primera pregunta: {preguntas[0]}")
         print(f"  Ultima pregunta: {preguntas[-1]}")
 
+        if completo:
+            from calidad_datos import perfilar_respuestas, imprimir_perfil
+            print(f"\nCalidad de datos:")
+            imprimir_perfil(perfilar_respuestas(df, columnas_resp))
+
     print("=" * 60 + "\n")
 
 
@@ -6,24 +6,30 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 
-from data_loader import cargar_datos, extraer_columnas_respuestas
+from data_loader import cargar_datos, cargar_muestra, contar_filas, extraer_columnas_respuestas
+from calidad_datos import perfilar_respuestas, advertencias_calidad, imprimir_perfil
 import pandas as pd
 
 
-def diagnosticar_archivo_clave(ruta_archivo):
-    """Diagnostica el archivo de clave de respuestas."""
+def diagnosticar_archivo_clave(ruta_archivo, completo=False):
+    """
+    Diagnostica el archivo de clave de respuestas.
+    Solo se califica la primera fila, así que por defecto no se carga el resto
+    del archivo (completo=True lo carga entero).
+    """
     print("\n" + "=" * 70)
     print("DIAGNOSTICO DEL ARCHIVO DE CLAVE")
     print("=" * 70)
     print(f"Archivo: {ruta_archivo}\n")
 
-    df = cargar_datos(ruta_archivo)
+    df = cargar_datos(ruta_archivo) if completo else cargar_muestra(ruta_archivo, filas=1)
     if df is None:
         return
+    total_filas = len(df) if completo else contar_filas(ruta_archivo)
 
     print(f"\n1. INFORMACION GENERAL")
     print("-" * 70)
-    print(f"  Filas: {len(df)}")
+    print(f"  Filas: {total_filas}")
     print(f"  Columnas: {len(df.columns)}")
 
     print(f"\n2. PRIMERAS 30 COLUMNAS")
@@ -48,7 +54,7 @@ def diagnosticar_archivo_clave(ruta_archivo):
             valor = df[col_name].iloc[0] if len(df) > 0 else 'N/A'
             print(f"  Pregunta {num_p:3d}: columna='{col_name}' valor='{valor}'")
 
-    # Verificar respuestas validas
+    # Verificar respuestas validas (perfil de calidad de la primera fila, la que se califica)
     print(f"\n4. VALIDACION DE RESPUESTAS")
     print("-" * 70)
 
@@ -56,22 +62,11 @@ def diagnosticar_archivo_clave(ruta_archivo):
         print("  ERROR: El archivo esta vacio")
         return
 
-    primera_fila = df.iloc[0]
-    respuestas_validas = 0
-    respuestas_invalidas = []
-    respuestas_vacias = []
-
-    for num_p, col_name in columnas_resp.items():
-        if col_name in primera_fila.index:
-            valor = str(primera_fila[col_name]).strip().upper()
-            valor_limpio = valor.replace('.', '').replace(',', '')
-
-            if valor_limpio in ['A', 'B', 'C', 'D', 'E']:
-                respuestas_validas += 1
-            elif not valor_limpio or valor_limpio in ['NAN', 'NONE', '']:
-                respuestas_vacias.append(num_p)
-            else:
-                respuestas_invalidas.append((num_p, valor))
+    perfil = perfilar_respuestas(df.iloc[:1], columnas_resp, es_clave=True)
+    preguntas = perfil['preguntas']
+    respuestas_vacias = [int(n) for n in preguntas.loc[preguntas['Vacias'] > 0, 'Pregunta']]
+    respuestas_invalidas = preguntas.loc[preguntas['Invalidas'] > 0, ['Pregunta', 'Valores_Invalidos']]
+    respuestas_validas = len(preguntas) - len(respuestas_vacias) - len(respuestas_invalidas)
 
     print(f"  Respuestas validas (A-E): {respuestas_validas}")
     print(f"  Respuestas vacias: {len(respuestas_vacias)}")
@@ -82,13 +77,16 @@ def diagnosticar_archivo_clave(ruta_archivo):
         if len(respuestas_vacias) > 10:
             print(f"  ... y {len(respuestas_vacias) - 10} mas")
 
-    if respuestas_invalidas:
+    if len(respuestas_invalidas):
         print(f"\n  Preguntas con respuestas invalidas:")
-        for num_p, valor in respuestas_invalidas[:10]:
-            print(f"    Pregunta {num_p}: '{valor}'")
+        for num_p, valor in respuestas_invalidas.head(10).itertuples(index=False):
+            print(f"    Pregunta {num_p}: {valor}")
         if len(respuestas_invalidas) > 10:
             print(f"  ... y {len(respuestas_invalidas) - 10} mas")
 
+    if total_filas > 1:
+        print(f"\n  El archivo tiene {total_filas} filas; solo se usa la primera")
+
     print(f"\n5. RECOMENDACIONES")
     print("-" * 70)
 
@@ -111,20 +109,24 @@ def diagnosticar_archivo_clave(ruta_archivo):
     print("\n" + "=" * 70 + "\n")
 
 
-def diagnosticar_archivo_respuestas(ruta_archivo):
-    """Diagnostica el archivo de respuestas de alumnos."""
+def diagnosticar_archivo_respuestas(ruta_archivo, completo=False):
+    """
+    Diagnostica el archivo de respuestas de alumnos.
+    Por defecto solo lee los encabezados y la muestra de alumnos; el perfil de
+    calidad recorre todo el archivo y solo se calcula con completo=True.
+    """
     print("\n" + "=" * 70)
     print("DIAGNOSTICO DEL ARCHIVO DE RESPUESTAS")
     print("=" * 70)
     print(f"Archivo: {ruta_archivo}\n")
 
-    df = cargar_datos(ruta_archivo)
+    df = cargar_datos(ruta_archivo) if completo else cargar_muestra(ruta_archivo, filas=3)
     if df is None:
         return
 
     print(f"\n1. INFORMACION GENERAL")
     print("-" * 70)
-    print(f"  Alumnos (filas): {len(df)}")
+    print(f"  Alumnos (filas): {len(df) if completo else contar_filas(ruta_archivo)}")
     print(f"  Columnas totales: {len(df.columns)}")
 
     # Buscar columnas de identificacion
@@ -178,22 +180,38 @@ def diagnosticar_archivo_respuestas(ruta_archivo):
                 respuesta = alumno[col_name] if col_name in alumno.index else 'N/A'
                 print(f"      P{num_p}: {respuesta}")
 
+    # Perfil de calidad de todo el bloque de respuestas
+    if columnas_resp:
+        print(f"\n5. CALIDAD DE DATOS")
+        print("-" * 70)
+        if completo:
+            perfil = perfilar_respuestas(df, columnas_resp)
+            imprimir_perfil(perfil)
+            for advertencia in advertencias_calidad(perfil):
+                print(f"  ADVERTENCIA: {advertencia}")
+        else:
+            print("  (se omite: use --completo para revisar todo el archivo)")
+
     print("\n" + "=" * 70 + "\n")
 
 
 if __name__ == "__main__":
     import sys
 
-    if len(sys.argv) > 1:
-        archivo = sys.argv[1]
+    argumentos = [a for a in sys.argv[1:] if a != '--completo']
+    completo = '--completo' in sys.argv[1:]
+
+    if argumentos:
+        archivo = argumentos[0]
         if 'clave' in archivo.lower():
-            diagnosticar_archivo_clave(archivo)
+            diagnosticar_archivo_clave(archivo, completo)
         else:
-            diagnosticar_archivo_respuestas(archivo)
+            diagnosticar_archivo_respuestas(archivo, completo)
     else:
         print("\nUso:")
-        print("  python diagnostico.py <archivo.csv>")
+        print("  python diagnostico.py <archivo.csv> [--completo]")
         print("\nEjemplos:")
         print("  python diagnostico.py data/clave_respuestas.csv")
         print("  python diagnostico.py data/simulacro.csv")
+        print("  python diagnostico.py data/simulacro.csv --completo")
         print()
\ No newline at end of file
@@ -0,0 +1,133 @@
+# app/duplicados.py
+"""
+Envíos duplicados: Google Forms deja que un alumno envíe el examen más de
+una vez y cada envío se calificaba como un alumno distinto, lo que sesga
+promedios y rankings.
+
+Antes de armar los resultados, cada fila recibe una llave de identidad
+(el 'Nombre de usuario' normalizado o, si no hay, el nombre normalizado;
+ver identidad.clave_identidad). Las llaves se indexan por hash
+(pd.factorize) y en cada grupo con más de un envío se aplica la política:
+conservar el último (Marca temporal), el mejor, o conservar todos y marcarlos.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from identidad import clave_identidad, normalizar_nombre, normalizar_email, es_nombre_generico
+from matrices import obtener_cache
+
+POLITICA_ULTIMO = 'ultimo'  # El envío más reciente
+POLITICA_MEJOR = 'mejor'  # El de mayor puntaje (empate: el más reciente)
+POLITICA_MARCAR = 'marcar'  # Se califican todos y se marcan
+POLITICAS = (POLITICA_ULTIMO, POLITICA_MEJOR, POLITICA_MARCAR)
+
+COLUMNAS_REPORTE = ['Clave', 'Nombre', 'Email', 'Grupo', 'Fila', 'Marca_Temporal', 'Puntaje',
+                    'Envios', 'Conservado']
+
+
+def claves_envios(emails: List[str], nombres: List[str]) -> np.ndarray:
+    """
+    Llave de identidad de cada fila. Las filas sin email y con nombre vacío o
+    genérico ('Alumno_N') reciben una llave propia: no se pueden emparejar.
+    """
+    claves = np.empty(len(nombres), dtype=object)
+    vistas: Dict[Tuple[str, str], Optional[str]] = {}
+    for fila, (email, nombre) in enumerate(zip(emails, nombres)):
+        par = (email, nombre)
+        if par not in vistas:
+            identificable = normalizar_email(email) or not es_nombre_generico(normalizar_nombre(nombre))
+            vistas[par] = clave_identidad(email, nombre) if identificable else None
+        claves[fila] = vistas[par] if vistas[par] is not None else f"fila:{fila}"
+    return claves
+
+
+def parsear_marcas_tiempo(valores) -> pd.Series:
+    """
+    Fechas de la 'Marca temporal' de Google Forms ('2025/08/01 12:30:01 p.m. GMT-6').
+    Los valores que no se pueden leer quedan como NaT.
+    """
+    texto = pd.Series(valores).astype(str)
+    texto = texto.str.replace(r'\s*GMT[+-]?\d*.*$', '', regex=True)
+    texto = texto.str.replace(r'\b([ap])\.?\s*m\.?(?=\s|$)', lambda m: m.group(1).upper() + 'M',
+                              case=False, regex=True)
+    fechas = pd.to_datetime(texto, format='%Y/%m/%d %I:%M:%S %p', errors='coerce')
+
+    faltan = fechas.isna() & pd.Series(valores).notna().values
+    if faltan.any():
+        fechas[faltan] = pd.to_datetime(texto[faltan], format='mixed', dayfirst=True, errors='coerce')
+    return fechas
+
+
+def seleccionar_envios(claves: np.ndarray, politica: str, marcas: Optional[pd.Series] = None,
+                       puntajes: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Elige qué filas se califican.
+
+    Returns:
+        (conservar: máscara por fila, envios: número de envíos de la llave de cada fila)
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política de duplicados desconocida: {politica} (opciones: {', '.join(POLITICAS)})")
+
+    ids = pd.factorize(claves)[0]
+    envios = np.bincount(ids)[ids]
+    if politica == POLITICA_MARCAR or (envios == 1).all():
+        return np.ones(len(claves), dtype=bool), envios
+
+    # Sin fecha legible se usa el orden del archivo (Forms agrega los envíos al final)
+    tabla = pd.DataFrame({'id': ids, 'fila': np.arange(len(claves))})
+    tabla['marca'] = (marcas.values if marcas is not None else pd.NaT)
+    llaves = ['marca', 'fila']
+    if politica == POLITICA_MEJOR:
+        tabla['puntaje'] = puntajes
+        llaves = ['puntaje'] + llaves
+
+    elegidas = tabla.sort_values(llaves, kind='stable', na_position='first').groupby('id').tail(1)['fila']
+    conservar = np.zeros(len(claves), dtype=bool)
+    conservar[elegidas.values] = True
+    return conservar, envios
+
+
+def reporte_duplicados(conservar: np.ndarray, envios: np.ndarray, claves: np.ndarray,
+                       nombres: List[str], emails: List[str], grupos: List[str],
+                       marcas_crudas: Optional[List[Any]] = None,
+                       puntajes: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Filas de las llaves con más de un envío, juntas y en el orden del archivo."""
+    filas = np.flatnonzero(envios > 1)
+    if len(filas) == 0:
+        return pd.DataFrame(columns=COLUMNAS_REPORTE)
+
+    reporte = pd.DataFrame({
+        'Clave': claves[filas],
+        'Nombre': [nombres[f] for f in filas],
+        'Email': [emails[f] for f in filas],
+        'Grupo': [grupos[f] for f in filas],
+        'Fila': filas + 2,  # Fila en el CSV (1 = encabezados)
+        'Marca_Temporal': [marcas_crudas[f] for f in filas] if marcas_crudas is not None else '',
+        'Puntaje': puntajes[filas] if puntajes is not None else np.nan,
+        'Envios': envios[filas],
+        'Conservado': np.where(conservar[filas], 'Sí', 'No'),
+    })
+    reporte = reporte.sort_values(['Clave', 'Fila'], kind='stable', ignore_index=True)
+    return reporte[COLUMNAS_REPORTE]
+
+
+def obtener_reporte_duplicados(resultados: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Reporte que dejó el calificador al resolver los duplicados (vacío si no hubo)."""
+    cache = obtener_cache(resultados)
+    if cache is None or 'duplicados' not in cache:
+        return pd.DataFrame(columns=COLUMNAS_REPORTE)
+    return cache['duplicados']
+
+
+def generar_reporte_duplicados_csv(resultados: List[Dict[str, Any]], ruta_salida: str):
+    """Exporta a CSV los envíos duplicados y cuál se conservó."""
+    try:
+        reporte = obtener_reporte_duplicados(resultados)
+        reporte.to_csv(ruta_salida, index=False, encoding='utf-8-sig')
+        print(f"Reporte de envíos duplicados exportado: {ruta_salida} ({len(reporte)} envíos)")
+    except Exception as e:
+        print(f"Error al generar reporte de duplicados: {e}")
@@ -0,0 +1,207 @@
+# app/equiparacion.py
+"""
+Normalización y equiparación de puntajes entre simulacros.
+Cada simulacro tiene su propia dificultad, así que el porcentaje de uno no
+se compara directo con el de otro. Aquí se calculan puntajes z y T dentro
+de la generación y se equipara el porcentaje de un simulacro a la escala de
+otro (diseño de grupos equivalentes), de forma lineal o equipercentil.
+
+La distribución de cada generación se guarda como histograma acumulado con
+un intervalo por punto de la escala; la tabla equipercentil se calcula una
+vez sobre los bordes de ese histograma y equiparar a toda la generación es
+una sola llamada a np.interp.
+"""
+
+import sqlite3
+import sys
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+METODO_LINEAL = 'lineal'
+METODO_EQUIPERCENTIL = 'equipercentil'
+METODOS = (METODO_LINEAL, METODO_EQUIPERCENTIL)
+
+# Frecuencia mínima que se suma a cada intervalo dentro del rango observado
+# para que ahí la acumulada sea estrictamente creciente (así se puede invertir
+# aunque haya puntajes intermedios sin alumnos). Las colas vacías no se
+# suavizan: ver tabla_equipercentil.
+SUAVIZADO = 1e-6
+
+
+class DistribucionPuntajes:
+    """
+    Distribución de porcentajes (0-100) de una generación.
+
+    Cada punto de la escala (múltiplos de paso, p. ej. 100 / preguntas) es el
+    centro de un intervalo de ancho paso, de modo que el rango percentil de
+    un puntaje cuenta la mitad de los alumnos que lo obtuvieron. El atributo
+    tramo selecciona los bordes del rango observado (del primer al último
+    intervalo con alumnos).
+    """
+
+    def __init__(self, puntajes, paso: float = 1.0, nombre: str = ''):
+        puntajes = np.asarray(puntajes, dtype=np.float64)
+        if len(puntajes) == 0:
+            raise ValueError("No hay puntajes para construir la distribución")
+
+        self.nombre = nombre
+        self.paso = paso
+        self.alumnos = len(puntajes)
+        self.media = float(puntajes.mean())
+        self.desviacion = float(puntajes.std())
+
+        puntos = max(1, int(round(100 / paso)))
+        centros = np.linspace(0, 100, puntos + 1)
+        self.bordes = np.append(centros - paso / 2, centros[-1] + paso / 2)
+        conteos = np.histogram(np.clip(puntajes, 0, 100), self.bordes)[0].astype(np.float64)
+        ocupados = np.flatnonzero(conteos)
+        self.tramo = slice(ocupados[0], ocupados[-1] + 2)
+        conteos[ocupados[0]:ocupados[-1] + 1] += SUAVIZADO
+        self.acumulada = np.append(0.0, np.cumsum(conteos)) / conteos.sum()
+
+    def rango_percentil(self, puntajes) -> np.ndarray:
+        """Porcentaje de la generación por debajo de cada puntaje (0-100)."""
+        return 100.0 * np.interp(puntajes, self.bordes, self.acumulada)
+
+    def cuantil(self, rangos) -> np.ndarray:
+        """Puntaje que corresponde a cada rango percentil (inversa de rango_percentil en el rango observado)."""
+        return np.clip(np.interp(np.asarray(rangos) / 100.0, self.acumulada[self.tramo],
+                                 self.bordes[self.tramo]), 0, 100)
+
+
+def puntajes_z(puntajes, media: Optional[float] = None, desviacion: Optional[float] = None) -> np.ndarray:
+    """Puntajes estándar; por defecto con la media y desviación de los mismos puntajes."""
+    puntajes = np.asarray(puntajes, dtype=np.float64)
+    media = puntajes.mean() if media is None else media
+    desviacion = puntajes.std() if desviacion is None else desviacion
+    if desviacion <= 0:
+        return np.zeros_like(puntajes)
+    return (puntajes - media) / desviacion
+
+
+def puntajes_t(puntajes, media: Optional[float] = None, desviacion: Optional[float] = None) -> np.ndarray:
+    """Puntajes T (media 50, desviación 10)."""
+    return 50 + 10 * puntajes_z(puntajes, media, desviacion)
+
+
+def equiparacion_lineal(origen: DistribucionPuntajes, destino: DistribucionPuntajes) -> Tuple[float, float]:
+    """(pendiente, intercepto) que llevan la media y desviación de origen a las de destino."""
+    pendiente = destino.desviacion / origen.desviacion if origen.desviacion > 0 else 1.0
+    return pendiente, destino.media - pendiente * origen.media
+
+
+def tabla_equipercentil(origen: DistribucionPuntajes,
+                        destino: DistribucionPuntajes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equivalente en destino de cada borde del rango observado de origen
+    (mismo rango percentil). Entre bordes se interpola linealmente.
+
+    Por debajo del mínimo y por encima del máximo de origen no hay alumnos
+    con qué comparar, así que las colas se extrapolan en línea recta hacia
+    los extremos de la escala (0 -> 0 y 100 -> 100).
+    """
+    bordes = origen.bordes[origen.tramo]
+    # Sin recortar a 0-100: los bordes extremos quedan medio paso fuera de la escala
+    equivalentes = np.interp(origen.acumulada[origen.tramo], destino.acumulada[destino.tramo],
+                             destino.bordes[destino.tramo])
+    if bordes[0] > 0:
+        bordes, equivalentes = np.append(0.0, bordes), np.append(0.0, equivalentes)
+    if bordes[-1] < 100:
+        bordes, equivalentes = np.append(bordes, 100.0), np.append(equivalentes, 100.0)
+    return bordes, equivalentes
+
+
+def equiparar(puntajes, origen: DistribucionPuntajes, destino: DistribucionPuntajes,
+              metodo: str = METODO_EQUIPERCENTIL) -> np.ndarray:
+    """Lleva puntajes de la escala de origen a la de destino (0-100)."""
+    puntajes = np.asarray(puntajes, dtype=np.float64)
+    if metodo == METODO_LINEAL:
+        pendiente, intercepto = equiparacion_lineal(origen, destino)
+        return np.clip(pendiente * puntajes + intercepto, 0, 100)
+    if metodo == METODO_EQUIPERCENTIL:
+        bordes, equivalentes = tabla_equipercentil(origen, destino)
+        return np.clip(np.interp(puntajes, bordes, equivalentes), 0, 100)
+    raise ValueError(f"Método de equiparación desconocido: {metodo} (opciones: {', '.join(METODOS)})")
+
+
+def distribucion_resultados(resultados: List[Dict[str, Any]], nombre: str = '') -> DistribucionPuntajes:
+    """Distribución del porcentaje global de unos resultados del calificador."""
+    total = resultados[0].get('total_preguntas', 0) if resultados else 0
+    return DistribucionPuntajes([r['porcentaje_global'] for r in resultados],
+                                paso=100 / total if total else 1.0, nombre=nombre)
+
+
+def distribucion_examen(nombre_examen: str,
+                        conexion: Optional[sqlite3.Connection] = None) -> Optional[DistribucionPuntajes]:
+    """Distribución del porcentaje global de un examen guardado en el historial (None si no existe)."""
+    from historial import conectar
+
+    propia = conexion is None
+    if propia:
+        conexion = conectar()
+    try:
+        examen = conexion.execute("SELECT id, total_preguntas FROM examenes WHERE nombre = ?",
+                                  (nombre_examen,)).fetchone()
+        if examen is None:
+            return None
+        porcentajes = [fila[0] for fila in conexion.execute(
+            "SELECT porcentaje_global FROM resultados WHERE examen_id = ?", (examen[0],))]
+    finally:
+        if propia:
+            conexion.close()
+
+    if not porcentajes:
+        return None
+    return DistribucionPuntajes(porcentajes, paso=100 / examen[1] if examen[1] else 1.0, nombre=nombre_examen)
+
+
+def equiparar_resultados(resultados: List[Dict[str, Any]], referencia: DistribucionPuntajes,
+                         metodo: str = METODO_EQUIPERCENTIL) -> None:
+    """
+    Agrega a cada resultado la llave 'equiparacion':
+        z, t (dentro de esta generación),
+        porcentaje_equiparado, calificacion_equiparada (en la escala de referencia),
+        metodo, referencia (nombre del simulacro de referencia)
+    """
+    if not resultados:
+        return
+
+    porcentajes = np.array([r['porcentaje_global'] for r in resultados], dtype=np.float64)
+    origen = distribucion_resultados(resultados)
+    z = puntajes_z(porcentajes).round(3).tolist()
+    t = puntajes_t(porcentajes).round(2).tolist()
+    equiparados = equiparar(porcentajes, origen, referencia, metodo)
+    porcentaje_equiparado = equiparados.round(2).tolist()
+    calificacion_equiparada = (equiparados / 10).round(2).tolist()
+
+    for i, resultado in enumerate(resultados):
+        resultado['equiparacion'] = {
+            'z': z[i],
+            't': t[i],
+            'porcentaje_equiparado': porcentaje_equiparado[i],
+            'calificacion_equiparada': calificacion_equiparada[i],
+            'metodo': metodo,
+            'referencia': referencia.nombre,
+        }
+
+
+if __name__ == "__main__":
+    # Tabla de conversión entre dos simulacros del historial:
+    #   python equiparacion.py <examen> <examen_referencia> [lineal|equipercentil]
+    if len(sys.argv) < 3:
+        print("Uso: python equiparacion.py <examen> <examen_referencia> [lineal|equipercentil]")
+        sys.exit(1)
+
+    metodo_cli = sys.argv[3] if len(sys.argv) > 3 else METODO_EQUIPERCENTIL
+    distribucion = distribucion_examen(sys.argv[1])
+    referencia_cli = distribucion_examen(sys.argv[2])
+    if distribucion is None or referencia_cli is None:
+        print("No se encontraron los dos examenes en el historial")
+        sys.exit(1)
+
+    print(f"{sys.argv[1]}: media {distribucion.media:.2f}, desviación {distribucion.desviacion:.2f}")
+    print(f"{sys.argv[2]}: media {referencia_cli.media:.2f}, desviación {referencia_cli.desviacion:.2f}")
+    puntos_cli = np.linspace(0, 100, int(round(100 / distribucion.paso)) + 1)
+    for puntaje, equivalente in zip(puntos_cli, equiparar(puntos_cli, distribucion, referencia_cli, metodo_cli)):
+        print(f"  {puntaje:6.2f}% -> {equivalente:6.2f}%")
@@ -12,6 +12,13 @@ from openpyxl import Workbook
 from openpyxl.styles import (PatternFill, Font, Alignment, Border, Side)
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import BarChart, Reference
+import numpy as np
+from matrices import (obtener_matriz_estado, ancho_examen, ESTADO_ACIERTO, ESTADO_ERROR,
+                      ESTADO_SIN_RESPONDER, OPCIONES)
+from analisis_items import obtener_analisis_items, clasificar_discriminacion
+from confiabilidad import obtener_confiabilidad
+from perfiles_error import obtener_perfiles_error
+from rankings import asegurar_rankings, ordenar_por_posicion
 
 
 class GeneradorExcelConsolidado:
@@ -32,6 +39,7 @@ class GeneradorExcelConsolidado:
 
     def generar_reporte_completo(self, ruta_salida: str):
         """Genera el archivo Excel consolidado con todas las hojas."""
+        asegurar_rankings(self.resultados)
         print("\n" + "=" * 70)
         print("📊 GENERANDO REPORTE EXCEL CONSOLIDADO")
         print("=" * 70)
@@ -62,6 +70,18 @@ class GeneradorExcelConsolidado:
         print("  ✓ Generando Análisis de Preguntas Difíciles...")
         self._crear_hoja_preguntas_dificiles()
 
+        # 5b. Hoja de Análisis de Ítems
+        print("  ✓ Generando Análisis de Ítems...")
+        self._crear_hoja_analisis_items()
+
+        # 5c. Hoja de Confiabilidad por materia
+        print("  ✓ Generando Confiabilidad por Materia...")
+        self._crear_hoja_confiabilidad()
+
+        # 5d. Hoja de Perfiles de Error (grupos de regularización)
+        print("  ✓ Generando Perfiles de Error...")
+        self._crear_hoja_perfiles_error()
+
         # 6. Hoja de Matriz Visual
         print("  ✓ Generando Matriz Visual de Errores...")
         self._crear_hoja_matriz_visual()
@@ -203,6 +223,12 @@ class GeneradorExcelConsolidado:
             for materia in materias:
                 headers.append(f'{materia}\nAciertos')
 
+        # Puntajes equiparados (solo si se equipararon contra otro simulacro)
+        equiparados = bool(self.resultados) and 'equiparacion' in self.resultados[0]
+        if equiparados:
+            referencia = self.resultados[0]['equiparacion']['referencia']
+            headers.extend(['Z', 'T', f'% Equiparado\n({referencia})'])
+
         for col, header in enumerate(headers, 1):
             cell = ws.cell(1, col, header)
             cell.font = Font(bold=True, color=self.COLOR_BLANCO, size=11)
@@ -240,6 +266,12 @@ class GeneradorExcelConsolidado:
                 ws.cell(idx, col).alignment = Alignment(horizontal="center")
                 col += 1
 
+            if equiparados:
+                equiparacion = resultado['equiparacion']
+                for valor in (equiparacion['z'], equiparacion['t'], equiparacion['porcentaje_equiparado']):
+                    ws.cell(idx, col, valor).alignment = Alignment(horizontal="center")
+                    col += 1
+
         # Ajustar anchos
         ws.column_dimensions['A'].width = 5
         ws.column_dimensions['B'].width = 30
@@ -249,7 +281,7 @@ class GeneradorExcelConsolidado:
         ws.column_dimensions['F'].width = 12
         ws.column_dimensions['G'].width = 10
 
-        for col in range(8, 8 + len(materias)):
+        for col in range(8, len(headers) + 1):
             ws.column_dimensions[get_column_letter(col)].width = 15
 
     def _crear_hoja_grupo(self, nombre_grupo: str, alumnos: List[Dict[str, Any]]):
@@ -294,10 +326,8 @@ class GeneradorExcelConsolidado:
             cell.alignment = Alignment(horizontal="center")
 
         row += 1
-        for idx, alumno in enumerate(sorted(alumnos,
-                                            key=lambda x: x['porcentaje_global'],
-                                            reverse=True), 1):
-            ws.cell(row, 1, idx)
+        for alumno in ordenar_por_posicion(alumnos):
+            ws.cell(row, 1, alumno['ranking']['posicion_grupo'])
             ws.cell(row, 2, alumno['nombre'])
             ws.cell(row, 3, f"{alumno['total_aciertos']}/{alumno['total_preguntas']}")
             ws.cell(row, 4, f"{alumno['calificacion_global']:.2f}")
@@ -371,7 +401,8 @@ class GeneradorExcelConsolidado:
             cell.alignment = Alignment(horizontal="center")
 
         # Datos
-        for idx, resultado in enumerate(self.resultados, 2):
+        estados = obtener_matriz_estado(self.resultados, total_preguntas)
+        for idx, (resultado, fila) in enumerate(zip(self.resultados, estados.tolist()), 2):
             ws.cell(idx, 1, resultado['nombre'])
             ws.cell(idx, 2, resultado.get('email', ''))
             ws.cell(idx, 3, resultado.get('grupo', ''))
@@ -379,23 +410,19 @@ class GeneradorExcelConsolidado:
             ws.cell(idx, 5, resultado['total_errores'])
             ws.cell(idx, 6, resultado['total_sin_responder'])
 
-            aciertos = set(resultado['estadisticas']['aciertos'])
-            errores = set(resultado['estadisticas']['errores'])
-            sin_resp = set(resultado['estadisticas']['sin_responder'])
-
-            for p in range(1, total_preguntas + 1):
+            for p, estado in enumerate(fila, 1):
                 col = 6 + p
-                if p in aciertos:
+                if estado == ESTADO_ACIERTO:
                     cell = ws.cell(idx, col, '✓')
                     cell.fill = PatternFill(start_color=self.COLOR_EXCELENTE,
                                             end_color=self.COLOR_EXCELENTE,
                                             fill_type="solid")
-                elif p in errores:
+                elif estado == ESTADO_ERROR:
                     cell = ws.cell(idx, col, '✗')
                     cell.fill = PatternFill(start_color=self.COLOR_REGULAR,
                                             end_color=self.COLOR_REGULAR,
                                             fill_type="solid")
-                elif p in sin_resp:
+                elif estado == ESTADO_SIN_RESPONDER:
                     cell = ws.cell(idx, col, '-')
                     cell.fill = PatternFill(start_color=self.COLOR_GRIS,
                                             end_color=self.COLOR_GRIS,
@@ -417,13 +444,11 @@ class GeneradorExcelConsolidado:
         """Crea hoja con análisis de preguntas difíciles."""
         ws = self.wb.create_sheet("📊 Preguntas Difíciles")
 
-        # Calcular errores por pregunta
-        errores_por_pregunta = defaultdict(int)
+        # Calcular errores por pregunta (sobre la matriz de estados)
         total_alumnos = len(self.resultados)
-
-        for resultado in self.resultados:
-            for pregunta in resultado['estadisticas']['errores']:
-                errores_por_pregunta[pregunta] += 1
+        conteo = (obtener_matriz_estado(self.resultados, ancho_examen(self.resultados))
+                  == ESTADO_ERROR).sum(axis=0)
+        errores_por_pregunta = {int(p) + 1: int(conteo[p]) for p in np.flatnonzero(conteo)}
 
         # Título
         ws['A1'] = 'ANÁLISIS DE PREGUNTAS DIFÍCILES'
@@ -480,6 +505,197 @@ class GeneradorExcelConsolidado:
         for col in range(1, 6):
             ws.column_dimensions[get_column_letter(col)].width = 18
 
+    def _crear_hoja_analisis_items(self):
+        """Crea hoja con dificultad, discriminación y distractores por pregunta."""
+        ws = self.wb.create_sheet("🔎 Análisis de Ítems")
+        analisis = obtener_analisis_items(self.resultados)
+
+        # Título
+        ws['A1'] = 'ANÁLISIS DE ÍTEMS'
+        ws['A1'].font = Font(size=14, bold=True, color=self.COLOR_BLANCO)
+        ws['A1'].fill = PatternFill(start_color=self.COLOR_PRINCIPAL,
+                                    end_color=self.COLOR_PRINCIPAL,
+                                    fill_type="solid")
+        ws['A1'].alignment = Alignment(horizontal="center")
+        ws.merge_cells('A1:N1')
+
+        # Headers
+        headers = ['Pregunta', 'Clave', 'Dificultad (p)', 'Biserial',
+                   'Discriminación (27%)', 'Calidad'] + OPCIONES + ['Sin Resp.', 'Inválidas']
+        for col, header in enumerate(headers, 1):
+            cell = ws.cell(3, col, header)
+            cell.font = Font(bold=True, color=self.COLOR_BLANCO)
+            cell.fill = PatternFill(start_color=self.COLOR_HEADER,
+                                    end_color=self.COLOR_HEADER,
+                                    fill_type="solid")
+            cell.alignment = Alignment(horizontal="center", wrap_text=True)
+
+        row = 4
+        for item in analisis.itertuples(index=False):
+            calidad = clasificar_discriminacion(item.Indice_Discriminacion)
+            valores = [f"P{item.Pregunta}", item.Respuesta_Correcta, item.Dificultad,
+                       item.Correlacion_Biserial, item.Indice_Discriminacion, calidad]
+            valores += [getattr(item, opcion) for opcion in OPCIONES]
+            valores += [item.Sin_Responder, item.Invalidas]
+
+            for col, valor in enumerate(valores, 1):
+                if pd.isna(valor):
+                    valor = None
+                cell = ws.cell(row, col, valor)
+                cell.alignment = Alignment(horizontal="center")
+
+            # Resaltar las opciones correctas (puede haber varias: 'B/D')
+            for opcion in str(item.Respuesta_Correcta).split('/'):
+                if opcion not in OPCIONES:
+                    continue
+                col_correcta = 7 + OPCIONES.index(opcion)
+                ws.cell(row, col_correcta).fill = PatternFill(start_color=self.COLOR_EXCELENTE,
+                                                              end_color=self.COLOR_EXCELENTE,
+                                                              fill_type="solid")
+            if calidad == "Revisar":
+                ws.cell(row, 6).fill = PatternFill(start_color=self.COLOR_REGULAR,
+                                                   end_color=self.COLOR_REGULAR,
+                                                   fill_type="solid")
+            row += 1
+
+        # Ajustar anchos
+        for col in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 12
+        ws.column_dimensions['E'].width = 16
+
+    def _crear_hoja_confiabilidad(self):
+        """Crea hoja con KR-20, SEM y alfa si se elimina cada pregunta."""
+        ws = self.wb.create_sheet("📐 Confiabilidad")
+        resumen, por_pregunta = obtener_confiabilidad(self.resultados)
+
+        # Título
+        ws['A1'] = 'CONFIABILIDAD POR MATERIA (KR-20)'
+        ws['A1'].font = Font(size=14, bold=True, color=self.COLOR_BLANCO)
+        ws['A1'].fill = PatternFill(start_color=self.COLOR_PRINCIPAL,
+                                    end_color=self.COLOR_PRINCIPAL,
+                                    fill_type="solid")
+        ws['A1'].alignment = Alignment(horizontal="center")
+        ws.merge_cells('A1:G1')
+
+        def escribir_tabla(fila_inicio, tabla, headers):
+            for col, header in enumerate(headers, 1):
+                cell = ws.cell(fila_inicio, col, header)
+                cell.font = Font(bold=True, color=self.COLOR_BLANCO)
+                cell.fill = PatternFill(start_color=self.COLOR_HEADER,
+                                        end_color=self.COLOR_HEADER,
+                                        fill_type="solid")
+                cell.alignment = Alignment(horizontal="center")
+
+            fila = fila_inicio + 1
+            for valores in tabla.itertuples(index=False):
+                for col, valor in enumerate(valores, 1):
+                    ws.cell(fila, col, None if pd.isna(valor) else valor)
+                fila += 1
+            return fila
+
+        row = escribir_tabla(3, resumen,
+                             ['Materia', 'Preguntas', 'Alumnos', 'Media',
+                              'Desviación', 'KR-20', 'SEM'])
+
+        # Colorear KR-20 (>= 0.8 buena, >= 0.7 aceptable)
+        for fila in range(4, row):
+            kr20 = ws.cell(fila, 6).value
+            if kr20 is None:
+                continue
+            color = (self.COLOR_EXCELENTE if kr20 >= 0.8
+                     else self.COLOR_BIEN if kr20 >= 0.7
+                     else self.COLOR_REGULAR)
+            ws.cell(fila, 6).fill = PatternFill(start_color=color,
+                                                end_color=color,
+                                                fill_type="solid")
+
+        row += 2
+        ws.cell(row, 1, 'ALFA SI SE ELIMINA LA PREGUNTA').font = Font(bold=True, size=12,
+                                                                      color=self.COLOR_PRINCIPAL)
+        row += 1
+        fin = escribir_tabla(row, por_pregunta,
+                             ['Pregunta', 'Materia', 'KR-20 Materia', 'Alfa sin la pregunta'])
+
+        # Resaltar preguntas cuya eliminación mejora la confiabilidad
+        for fila in range(row + 1, fin):
+            alfa_sin = ws.cell(fila, 4).value
+            kr20 = ws.cell(fila, 3).value
+            if alfa_sin is not None and kr20 is not None and alfa_sin > kr20:
+                ws.cell(fila, 4).fill = PatternFill(start_color=self.COLOR_REGULAR,
+                                                    end_color=self.COLOR_REGULAR,
+                                                    fill_type="solid")
+
+        for col in range(1, 8):
+            ws.column_dimensions[get_column_letter(col)].width = 16
+
+    def _crear_hoja_perfiles_error(self):
+        """Crea hoja con los perfiles de error (k-means) y el perfil de cada alumno."""
+        ws = self.wb.create_sheet("🧩 Perfiles de Error")
+        resumen, asignacion = obtener_perfiles_error(self.resultados)
+
+        # Título
+        ws['A1'] = 'PERFILES DE ERROR (GRUPOS DE REGULARIZACIÓN)'
+        ws['A1'].font = Font(size=14, bold=True, color=self.COLOR_BLANCO)
+        ws['A1'].fill = PatternFill(start_color=self.COLOR_PRINCIPAL,
+                                    end_color=self.COLOR_PRINCIPAL,
+                                    fill_type="solid")
+        ws['A1'].alignment = Alignment(horizontal="center")
+        ws.merge_cells('A1:H1')
+
+        if resumen.empty:
+            ws['A3'] = 'Sin datos suficientes para formar perfiles'
+            return
+
+        def escribir_encabezados(fila, headers):
+            for col, header in enumerate(headers, 1):
+                cell = ws.cell(fila, col, header)
+                cell.font = Font(bold=True, color=self.COLOR_BLANCO)
+                cell.fill = PatternFill(start_color=self.COLOR_HEADER,
+                                        end_color=self.COLOR_HEADER,
+                                        fill_type="solid")
+                cell.alignment = Alignment(horizontal="center", wrap_text=True)
+
+        # Resumen: % de fallo del centroide por tema
+        temas = list(resumen.columns[4:])
+        escribir_encabezados(3, ['Perfil', 'Alumnos', '% Fallo Medio', 'Temas Débiles'] +
+                             [f'% Fallo {tema}' for tema in temas])
+        row = 4
+        for valores in resumen.itertuples(index=False):
+            for col, valor in enumerate(valores, 1):
+                ws.cell(row, col, valor).alignment = Alignment(horizontal="center")
+            # Colorear la tasa de fallo de cada tema (alta = rojo)
+            for col in range(5, 5 + len(temas)):
+                fallo = ws.cell(row, col).value
+                color = (self.COLOR_REGULAR if fallo >= 50
+                         else self.COLOR_BIEN if fallo >= 30
+                         else self.COLOR_EXCELENTE)
+                ws.cell(row, col).fill = PatternFill(start_color=color,
+                                                     end_color=color,
+                                                     fill_type="solid")
+            row += 1
+
+        # Alumnos de cada perfil
+        row += 2
+        ws.cell(row, 1, 'ALUMNOS POR PERFIL').font = Font(bold=True, size=12,
+                                                          color=self.COLOR_PRINCIPAL)
+        row += 1
+        escribir_encabezados(row, ['Perfil', 'Nombre', 'Email', 'Grupo', '%'])
+        row += 1
+        for alumno in asignacion.itertuples(index=False):
+            ws.cell(row, 1, int(alumno.Perfil)).alignment = Alignment(horizontal="center")
+            ws.cell(row, 2, alumno.Nombre)
+            ws.cell(row, 3, alumno.Email)
+            ws.cell(row, 4, alumno.Grupo)
+            ws.cell(row, 5, alumno.Porcentaje)
+            row += 1
+
+        ws.column_dimensions['A'].width = 10
+        ws.column_dimensions['B'].width = 30
+        ws.column_dimensions['C'].width = 30
+        ws.column_dimensions['D'].width = 30
+        for col in range(5, 5 + max(1, len(temas))):
+            ws.column_dimensions[get_column_letter(col)].width = 14
+
     def _crear_hoja_matriz_visual(self):
         """Crea matriz visual simplificada de errores."""
         ws = self.wb.create_sheet("🔲 Matriz Visual")
@@ -562,22 +778,21 @@ class GeneradorExcelConsolidado:
             ws.row_dimensions[row].height = 25
 
             # ===== DATOS DE ALUMNOS =====
-            # Ordenar alumnos por aciertos (descendente)
-            alumnos_ordenados = sorted(alumnos,
-                                       key=lambda x: x['total_aciertos'],
-                                       reverse=True)
+            # Alumnos en orden de su posición en el grupo (empates comparten lugar)
+            alumnos_ordenados = ordenar_por_posicion(alumnos)
 
             total_preguntas = alumnos_ordenados[0]['total_preguntas']
-            total_alumnos = len(alumnos_ordenados)
+            ultima_posicion = alumnos_ordenados[-1]['ranking']['posicion_grupo']
 
             row = 6
-            for posicion, alumno in enumerate(alumnos_ordenados, 1):
+            for alumno in alumnos_ordenados:
+                posicion = alumno['ranking']['posicion_grupo']
                 # Calcular porcentaje
                 aciertos = alumno['total_aciertos']
                 porcentaje = (aciertos / total_preguntas * 100) if total_preguntas > 0 else 0
 
                 # Determinar color según porcentaje
-                if posicion == total_alumnos:
+                if posicion == ultima_posicion:
                     # Último lugar siempre en gris
                     color_celda = COLOR_GRIS
                 elif porcentaje >= 85:
@@ -1,9 +1,104 @@
 # app/generador_clave.py
-import pandas as pd
+import csv
 import os
-from typing import List, Optional
+import re
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+# Cada línea se parte en tokens por espacios, comas, punto y coma o barras.
+# Un token de respuesta es una letra A-E con su número de pregunta opcional
+# delante ("12. C", "12) C", "12-C", "12: C", "12C"); las viñetas al inicio
+# de la línea se ignoran.
+_PATRON_VINETA = re.compile(r'^\s*[*\-•]\s*')
+_PATRON_SEPARADORES = re.compile(r'[\s,;|]+')
+_PATRON_TOKEN = re.compile(r'^(?:(\d{1,4})[.):=-]?)?([A-Ea-e])[.)]?$')
+_PATRON_NUMERO = re.compile(r'^(\d{1,4})[.):=-]?$')
+
+# Respuestas por línea en el reporte de texto
+RESPUESTAS_POR_LINEA = 5
+
+
+def _respuestas_en_lineas(texto: str) -> List[Tuple[Optional[int], str]]:
+    """
+    (número o None, letra) de cada respuesta, en orden.
+
+    Una línea aporta respuestas si todos sus tokens lo son ("A B C", "1A 2B")
+    o si empieza con una respuesta numerada ("12. C  revisar"); así un
+    encabezado como "Clave Versión B" o una frase con "a" o "e" no se toma
+    como respuesta.
+    """
+    encontradas = []
+    for linea in texto.splitlines():
+        tokens = [t for t in _PATRON_SEPARADORES.split(_PATRON_VINETA.sub('', linea)) if t]
+        respuestas_linea = []
+        numero_pendiente = None
+        completa = True
+        for token in tokens:
+            coincidencia = _PATRON_TOKEN.match(token)
+            if coincidencia and not (numero_pendiente is not None and coincidencia.group(1)):
+                numero = coincidencia.group(1) or numero_pendiente
+                respuestas_linea.append((int(numero) if numero else None, coincidencia.group(2)))
+                numero_pendiente = None
+                continue
+            coincidencia = _PATRON_NUMERO.match(token)
+            if coincidencia and numero_pendiente is None:
+                numero_pendiente = coincidencia.group(1)
+                continue
+            completa = False
+            break
+
+        if numero_pendiente is not None:
+            completa = False
+        if respuestas_linea and (completa or respuestas_linea[0][0] is not None):
+            encontradas.extend(respuestas_linea)
+    return encontradas
+
+
+def analizar_texto(texto: str, total_preguntas: int) -> Dict[str, Any]:
+    """
+    Tokeniza un texto con respuestas en una sola pasada.
+
+    Returns:
+        Diccionario con:
+        - respuestas: {número de pregunta: letra}
+        - procesadas: respuestas reconocidas en el texto
+        - conflictos: [(pregunta, letra anterior, letra nueva)] si una pregunta
+          aparece con letras distintas (se queda la última)
+        - fuera_de_rango: números de pregunta fuera de 1..total_preguntas
+        - huecos: preguntas sin respuesta antes de la última respondida
+    """
+    respuestas: Dict[int, str] = {}
+    conflictos = []
+    fuera_de_rango = []
+    procesadas = 0
+    siguiente = 1
+
+    for numero, letra in _respuestas_en_lineas(texto):
+        pregunta = numero if numero is not None else siguiente
+        siguiente = pregunta + 1
+        procesadas += 1
+
+        if not 1 <= pregunta <= total_preguntas:
+            fuera_de_rango.append(pregunta)
+            continue
+
+        letra = letra.upper()
+        anterior = respuestas.get(pregunta)
+        if anterior is not None and anterior != letra:
+            conflictos.append((pregunta, anterior, letra))
+        respuestas[pregunta] = letra
+
+    ultima = max(respuestas) if respuestas else 0
+    huecos = [p for p in range(1, ultima) if p not in respuestas]
+
+    return {
+        'respuestas': respuestas,
+        'procesadas': procesadas,
+        'conflictos': conflictos,
+        'fuera_de_rango': fuera_de_rango,
+        'huecos': huecos,
+    }
+
 
 class GeneradorClave:
     """Clase para generar archivos CSV de clave de respuestas."""
@@ -11,61 +106,38 @@ class GeneradorClave:
     def __init__(self, total_preguntas: int = 120):
         self.total_preguntas = total_preguntas
         self.respuestas = [''] * total_preguntas
+        self.ultimo_analisis: Optional[Dict[str, Any]] = None
+        self.preguntas_modificadas: List[int] = []  # Cambiadas por el último texto procesado
 
     def establecer_respuestas_desde_texto(self, texto: str) -> int:
         """
         Establece las respuestas desde un texto.
-        Acepta varios formatos:
+        Acepta varios formatos, incluso mezclados:
         - Una línea por respuesta: "A\nB\nC\n..."
         - Respuestas con viñetas: "* A\n* B\n* C\n..."
         - Respuestas numeradas: "1. A\n2. B\n3. C\n..."
         - Respuestas separadas por comas: "A, B, C, ..."
+        - Formato compacto: "1A 2B 3C ..."
+
+        Los números de pregunta explícitos se respetan (pueden venir
+        desordenados o solo en algunas respuestas); una respuesta sin
+        número va en la pregunta siguiente a la anterior.
+        El detalle queda en self.ultimo_analisis (ver analizar_texto).
 
         Returns:
             Número de respuestas válidas procesadas
         """
-        import re
-
-        # Limpiar el texto
-        texto = texto.strip()
-
-        if not texto:
-            return 0
-
-        # Detectar el formato
-        lineas = texto.split('\n')
-        respuestas_procesadas = []
-
-        for linea in lineas:
-            linea = linea.strip()
-            if not linea:
-                continue
-
-            # Remover viñetas, números, asteriscos, puntos
-            linea = re.sub(r'^[\*\-•]\s*', '', linea)  # Viñetas
-            linea = re.sub(r'^\d+[\.\)]\s*', '', linea)  # Números
-            linea = linea.strip()
-
-            # Extraer solo la letra (A, B, C, D, E)
-            match = re.search(r'^([A-Ea-e])\b', linea)
-            if match:
-                respuestas_procesadas.append(match.group(1).upper())
-
-        # Si no se encontraron respuestas con el método anterior,
-        # intentar separar por comas
-        if not respuestas_procesadas:
-            partes = re.split(r'[,;|\s]+', texto)
-            for parte in partes:
-                parte = parte.strip().upper()
-                if parte in ['A', 'B', 'C', 'D', 'E']:
-                    respuestas_procesadas.append(parte)
-
-        # Asignar las respuestas
-        for i, respuesta in enumerate(respuestas_procesadas):
-            if i < self.total_preguntas:
-                self.respuestas[i] = respuesta
-
-        return len(respuestas_procesadas)
+        analisis = analizar_texto(texto, self.total_preguntas)
+        # El texto es la clave completa: las preguntas que ya no aparecen se borran
+        nuevas = [''] * self.total_preguntas
+        for numero, respuesta in analisis['respuestas'].items():
+            nuevas[numero - 1] = respuesta
+        self.preguntas_modificadas = [i + 1 for i, (antes, ahora) in enumerate(zip(self.respuestas, nuevas))
+                                      if antes != ahora]
+        self.respuestas = nuevas
+
+        self.ultimo_analisis = analisis
+        return analisis['procesadas']
 
     def establecer_respuesta(self, numero_pregunta: int, respuesta: str) -> bool:
         """
@@ -118,68 +190,85 @@ class GeneradorClave:
             True si se generó correctamente
         """
         try:
-            # Crear el diccionario de datos
-            datos = {'Nombre': ['CLAVE']}
-
+            encabezados = ['Nombre']
             for i in range(1, self.total_preguntas + 1):
                 if formato == 'pregunta_n':
-                    nombre_col = f'pregunta_{i}'
+                    encabezados.append(f'pregunta_{i}')
                 elif formato == 'Pn':
-                    nombre_col = f'P{i}'
+                    encabezados.append(f'P{i}')
                 else:  # formato 'n.'
-                    nombre_col = f'{i}.'
-
-                datos[nombre_col] = [self.respuestas[i - 1]]
+                    encabezados.append(f'{i}.')
 
-            # Crear DataFrame y exportar
-            df = pd.DataFrame(datos)
-            df.to_csv(ruta_salida, index=False, encoding='utf-8-sig')
+            # Una sola fila: se escribe directo, sin armar un DataFrame
+            with open(ruta_salida, 'w', newline='', encoding='utf-8-sig') as archivo:
+                escritor = csv.writer(archivo, lineterminator=os.linesep)
+                escritor.writerow(encabezados)
+                escritor.writerow(['CLAVE'] + self.respuestas)
 
             return True
         except Exception as e:
             print(f"Error al generar CSV: {e}")
             return False
 
-    def generar_reporte_texto(self) -> str:
-        """Genera un reporte en texto de las respuestas."""
-        reporte = []
-        reporte.append("=" * 70)
-        reporte.append("CLAVE DE RESPUESTAS")
-        reporte.append("=" * 70)
-        reporte.append(f"Total de preguntas: {self.total_preguntas}")
-        reporte.append(f"Respuestas establecidas: {self.contar_respuestas_validas()}")
-        reporte.append(f"Respuestas faltantes: {self.total_preguntas - self.contar_respuestas_validas()}")
-        reporte.append("")
-
-        # Mostrar respuestas en columnas
-        reporte.append("RESPUESTAS:")
-        reporte.append("-" * 70)
-
-        # Mostrar en 5 columnas
-        for fila in range(0, self.total_preguntas, 5):
-            linea_parts = []
-            for col in range(5):
-                idx = fila + col
-                if idx < self.total_preguntas:
-                    num_pregunta = idx + 1
-                    respuesta = self.respuestas[idx] if self.respuestas[idx] else '?'
-                    linea_parts.append(f"{num_pregunta:3d}. {respuesta}")
-            reporte.append("  ".join(linea_parts))
-
-        reporte.append("")
+    def encabezado_reporte(self) -> List[str]:
+        """Líneas del reporte antes de las respuestas (siempre el mismo número de líneas)."""
+        validas = self.contar_respuestas_validas()
+        return [
+            "=" * 70,
+            "CLAVE DE RESPUESTAS",
+            "=" * 70,
+            f"Total de preguntas: {self.total_preguntas}",
+            f"Respuestas establecidas: {validas}",
+            f"Respuestas faltantes: {self.total_preguntas - validas}",
+            "",
+            "RESPUESTAS:",
+            "-" * 70,
+        ]
+
+    def numero_lineas_respuestas(self) -> int:
+        """Líneas de respuestas del reporte (RESPUESTAS_POR_LINEA por línea)."""
+        return -(-self.total_preguntas // RESPUESTAS_POR_LINEA)
+
+    def linea_respuestas(self, fila: int) -> str:
+        """Línea `fila` (desde 0) de la tabla de respuestas del reporte."""
+        inicio = fila * RESPUESTAS_POR_LINEA
+        fin = min(inicio + RESPUESTAS_POR_LINEA, self.total_preguntas)
+        return "  ".join(f"{idx + 1:3d}. {self.respuestas[idx] or '?'}" for idx in range(inicio, fin))
+
+    def pie_reporte(self) -> List[str]:
+        """Líneas del reporte después de las respuestas: faltantes y conflictos."""
+        pie = [""]
 
         # Mostrar respuestas faltantes si las hay
         faltantes = self.obtener_respuestas_faltantes()
         if faltantes:
-            reporte.append("PREGUNTAS SIN RESPUESTA:")
-            reporte.append("-" * 70)
+            pie.append("PREGUNTAS SIN RESPUESTA:")
+            pie.append("-" * 70)
             # Mostrar en grupos de 10
             for i in range(0, len(faltantes), 10):
                 grupo = faltantes[i:i + 10]
-                reporte.append("  " + ", ".join(str(n) for n in grupo))
-            reporte.append("")
+                pie.append("  " + ", ".join(str(n) for n in grupo))
+            pie.append("")
+
+        analisis = self.ultimo_analisis
+        if analisis and (analisis['conflictos'] or analisis['fuera_de_rango']):
+            pie.append("AVISOS DEL ÚLTIMO TEXTO PROCESADO:")
+            pie.append("-" * 70)
+            for pregunta, anterior, nueva in analisis['conflictos']:
+                pie.append(f"  Pregunta {pregunta}: aparece como {anterior} y como {nueva} (se usa {nueva})")
+            if analisis['fuera_de_rango']:
+                pie.append("  Fuera de rango (ignoradas): " +
+                           ", ".join(str(n) for n in analisis['fuera_de_rango']))
+            pie.append("")
+
+        pie.append("=" * 70)
+        return pie
 
-        reporte.append("=" * 70)
+    def generar_reporte_texto(self) -> str:
+        """Genera un reporte en texto de las respuestas."""
+        reporte = self.encabezado_reporte()
+        reporte.extend(self.linea_respuestas(fila) for fila in range(self.numero_lineas_respuestas()))
+        reporte.extend(self.pie_reporte())
         return "\n".join(reporte)
 
 
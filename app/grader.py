@@ -1,31 +1,52 @@
 # app/grader.py
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+import numpy as np
 from data_loader import (extraer_columnas_respuestas, obtener_respuestas_correctas,
-                         limpiar_respuesta, obtener_columna_flexible)
+                         codificar_bloque, obtener_columna_flexible)
+from matrices import (ResultadosCalificacion, mascara_respuesta, codigos_principales, calcular_matriz_estado,
+                      CODIGO_VACIA, ESTADO_ACIERTO, ESTADO_ERROR, ESTADO_SIN_RESPONDER)
+from registro_claves import ClaveCompilada
+from rankings import asignar_rankings
+from reglas_puntaje import ReglasPuntaje, aplicar_reglas, calcular_puntajes
+from duplicados import (claves_envios, parsear_marcas_tiempo, seleccionar_envios, reporte_duplicados,
+                        COLUMNAS_REPORTE)
+from config import POLITICA_DUPLICADOS
 
 
 def procesar_calificaciones_google_forms(
-        clave_df: pd.DataFrame,
+        clave_df: Union[pd.DataFrame, ClaveCompilada],
         respuestas_df: pd.DataFrame,
         mapeo_materias: Dict[str, range],
         columna_nombre: str,
         columna_email: str = 'Nombre de usuario',
-        columna_grupo: str = 'Grupo '
+        columna_grupo: str = 'Grupo ',
+        columna_version: str = 'Versión',
+        reglas: Optional[ReglasPuntaje] = None,
+        politica_duplicados: Optional[str] = POLITICA_DUPLICADOS,
+        columna_timestamp: str = 'Marca temporal'
 ) -> List[Dict[str, Any]]:
     """
     Procesa las calificaciones de un CSV de Google Forms.
 
     Args:
-        clave_df: DataFrame con las respuestas correctas
+        clave_df: DataFrame con las respuestas correctas, o una ClaveCompilada
+                  del registro de claves (no se vuelve a leer ni validar el CSV)
         respuestas_df: DataFrame con las respuestas de los alumnos
         mapeo_materias: Diccionario con los rangos de preguntas por materia
         columna_nombre: Nombre de la columna que contiene el nombre del alumno
         columna_email: Nombre de la columna que contiene el email
         columna_grupo: Nombre de la columna que contiene el grupo
+        columna_version: Columna con la versión del examen (solo si la clave
+                         compilada tiene versiones; ver ClaveCompilada.con_version)
+        reglas: Pesos, penalizaciones y anuladas del examen (None = un punto por acierto)
+        politica_duplicados: Qué hacer con varios envíos del mismo alumno
+                             ('ultimo', 'mejor', 'marcar'; None = calificar todos)
+        columna_timestamp: Columna con la fecha de cada envío (para 'ultimo')
 
     Returns:
-        Lista de diccionarios con los resultados por alumno
+        Lista de diccionarios con los resultados por alumno (ResultadosCalificacion,
+        que además conserva las respuestas codificadas y la clave)
     """
     print("\n" + "=" * 60)
     print("🔄 PROCESANDO CALIFICACIONES")
@@ -41,7 +62,10 @@ def procesar_calificaciones_google_forms(
     print(f"📋 Total de preguntas detectadas: {len(columnas_respuestas)}")
 
     # Obtener respuestas correctas
-    respuestas_correctas = obtener_respuestas_correctas(clave_df, columnas_respuestas)
+    if isinstance(clave_df, ClaveCompilada):
+        respuestas_correctas = clave_df.respuestas_correctas(columnas_respuestas.keys())
+    else:
+        respuestas_correctas = obtener_respuestas_correctas(clave_df, columnas_respuestas)
 
     if not respuestas_correctas:
         print("❌ Error: No se pudieron cargar las respuestas correctas")
@@ -61,39 +85,87 @@ def procesar_calificaciones_google_forms(
     print(f"\n📊 Procesando {len(respuestas_df)} alumno(s)...")
     print("-" * 60)
 
+    # Respuestas codificadas (columna j = pregunta j + 1) y clave como máscaras de opciones aceptadas
+    total_columnas = max(columnas_respuestas.keys())
+    clave_mascaras = np.zeros(total_columnas, dtype=np.uint8)
+    for num_pregunta, respuesta in respuestas_correctas.items():
+        clave_mascaras[num_pregunta - 1] = mascara_respuesta(respuesta)
+    clave_codigos = codigos_principales(clave_mascaras)
+    # Se codifican todas las columnas: con versiones revueltas, la columna de una pregunta
+    # calificada puede ser cualquiera hasta pasar al orden canónico
+    matriz_respuestas = codificar_bloque(respuestas_df, columnas_respuestas, total_columnas)
+
+    # Versiones revueltas: se pasan las respuestas al orden canónico (un gather por versión)
+    versiones_alumnos = None
+    if isinstance(clave_df, ClaveCompilada) and clave_df.versiones:
+        col_version_encontrada = obtener_columna_flexible(
+            respuestas_df, [columna_version, columna_version.strip(), 'Version', 'Versión', 'Forma'])
+        if col_version_encontrada is None:
+            print("⚠️ La clave tiene versiones pero no hay columna de versión; se usa el orden canónico")
+        else:
+            versiones_alumnos = respuestas_df[col_version_encontrada].map(normalizar_version).values
+            matriz_respuestas = reordenar_versiones(matriz_respuestas, versiones_alumnos, clave_df.versiones)
+
+    # Solo se conservan las respuestas de las preguntas que están en la clave
+    calificadas = np.zeros(total_columnas, dtype=bool)
+    calificadas[np.array(list(respuestas_correctas), dtype=np.int64) - 1] = True
+    matriz_respuestas[:, ~calificadas] = CODIGO_VACIA
+
+    nombres = _valores_columna(respuestas_df, col_nombre_encontrada,
+                               [f'Alumno_{idx + 1}' for idx in respuestas_df.index])
+    emails = _valores_columna(respuestas_df, col_email_encontrada, 'Sin email')
+    grupos = _valores_columna(respuestas_df, col_grupo_encontrada, 'Sin grupo')
+
+    # Estados de todo el grupo de una vez
+    estado = calcular_matriz_estado(matriz_respuestas, clave_codigos, clave_mascaras)
+
+    # Envíos duplicados del mismo alumno: se quitan antes de armar los resultados
+    envios = None
+    duplicados = None
+    if politica_duplicados:
+        conservar, envios, duplicados = _resolver_duplicados(
+            respuestas_df, estado, nombres, emails, grupos, politica_duplicados,
+            columna_timestamp, reglas, mapeo_materias)
+        if not conservar.all():
+            filas = np.flatnonzero(conservar)
+            matriz_respuestas, estado, envios = matriz_respuestas[filas], estado[filas], envios[filas]
+            nombres = [nombres[f] for f in filas]
+            emails = [emails[f] for f in filas]
+            grupos = [grupos[f] for f in filas]
+            if versiones_alumnos is not None:
+                versiones_alumnos = versiones_alumnos[filas]
+
+    # Listas por alumno (formato de los resultados; las cuentas en bloque usan matriz_estado
+    # y EstadosEmpaquetados del caché)
+    listas_aciertos = _listas_por_fila(estado == ESTADO_ACIERTO)
+    listas_errores = _listas_por_fila(estado == ESTADO_ERROR)
+    listas_sin_responder = _listas_por_fila(estado == ESTADO_SIN_RESPONDER)
+
+    # Materias de cada pregunta calificada (una pregunta puede estar en varios rangos)
+    materias = list(mapeo_materias.keys())
+    materias_de_pregunta: Dict[int, List[int]] = {}
+    total_por_materia = []
+    for indice, (materia, rango) in enumerate(mapeo_materias.items()):
+        preguntas_materia = [p for p in rango if p in respuestas_correctas]
+        total_por_materia.append(len(preguntas_materia))
+        for p in preguntas_materia:
+            materias_de_pregunta.setdefault(p, []).append(indice)
+
+    total_preguntas_examen = len(respuestas_correctas)
     resultados_finales = []
 
-    # Procesar cada alumno
-    for idx, alumno in respuestas_df.iterrows():
-        # Obtener información del alumno
-        nombre_alumno = obtener_valor_columna(alumno, col_nombre_encontrada, f'Alumno_{idx + 1}')
-        email_alumno = obtener_valor_columna(alumno, col_email_encontrada, 'Sin email')
-        grupo_alumno = obtener_valor_columna(alumno, col_grupo_encontrada, 'Sin grupo')
-
+    for posicion in range(len(nombres)):
+        nombre_alumno = nombres[posicion]
         print(f"  Procesando: {nombre_alumno}")
 
-        # Calcular aciertos
-        aciertos_totales = []
-        errores = []
-        sin_responder = []
-
-        for num_pregunta, nombre_col in sorted(columnas_respuestas.items()):
-            if num_pregunta in respuestas_correctas:
-                respuesta_alumno = limpiar_respuesta(alumno.get(nombre_col, ''))
-                respuesta_correcta = respuestas_correctas[num_pregunta]
+        aciertos_totales = listas_aciertos[posicion]
+        errores = listas_errores[posicion]
+        sin_responder = listas_sin_responder[posicion]
 
-                if not respuesta_alumno:
-                    sin_responder.append(num_pregunta)
-                elif respuesta_alumno == respuesta_correcta:
-                    aciertos_totales.append(num_pregunta)
-                else:
-                    errores.append(num_pregunta)
-
-        # Calcular calificaciones por materia
         reporte_alumno = {
             'nombre': nombre_alumno,
-            'email': email_alumno,
-            'grupo': grupo_alumno,
+            'email': emails[posicion],
+            'grupo': grupos[posicion],
             'calificaciones': {},
             'estadisticas': {
                 'aciertos': aciertos_totales,
@@ -101,16 +173,22 @@ def procesar_calificaciones_google_forms(
                 'sin_responder': sin_responder
             }
         }
+        if versiones_alumnos is not None:
+            reporte_alumno['version'] = versiones_alumnos[posicion]
+        if envios is not None and envios[posicion] > 1:
+            reporte_alumno['envios'] = int(envios[posicion])
+
+        # Repartir las preguntas de cada estado entre sus materias
+        por_materia = [([], [], []) for _ in materias]
+        for indice_estado, lista in enumerate((aciertos_totales, errores, sin_responder)):
+            for p in lista:
+                for indice_materia in materias_de_pregunta.get(p, ()):
+                    por_materia[indice_materia][indice_estado].append(p)
 
         # Procesar cada materia
-        for materia, rango in mapeo_materias.items():
-            # Filtrar solo las preguntas que existen en este examen
-            preguntas_materia = [p for p in rango if p in respuestas_correctas]
-            aciertos_materia = [p for p in aciertos_totales if p in preguntas_materia]
-            errores_materia = [p for p in errores if p in preguntas_materia]
-            sin_resp_materia = [p for p in sin_responder if p in preguntas_materia]
-
-            total_preguntas = len(preguntas_materia)
+        for indice_materia, materia in enumerate(materias):
+            aciertos_materia, errores_materia, sin_resp_materia = por_materia[indice_materia]
+            total_preguntas = total_por_materia[indice_materia]
             num_aciertos = len(aciertos_materia)
             porcentaje = (num_aciertos / total_preguntas * 100) if total_preguntas > 0 else 0
 
@@ -124,13 +202,12 @@ def procesar_calificaciones_google_forms(
                 'total': total_preguntas,
                 'porcentaje': round(porcentaje, 2),
                 'calificacion': round(calificacion_numerica, 2),
-                'preguntas_correctas': sorted(aciertos_materia),
-                'preguntas_incorrectas': sorted(errores_materia),
-                'preguntas_sin_responder': sorted(sin_resp_materia)
+                'preguntas_correctas': aciertos_materia,
+                'preguntas_incorrectas': errores_materia,
+                'preguntas_sin_responder': sin_resp_materia
             }
 
         # Calcular totales generales
-        total_preguntas_examen = len(respuestas_correctas)
         total_aciertos = len(aciertos_totales)
         total_errores = len(errores)
         total_sin_responder = len(sin_responder)
@@ -150,7 +227,117 @@ def procesar_calificaciones_google_forms(
     print(f"✅ Procesamiento completado: {len(resultados_finales)} alumno(s)")
     print("=" * 60 + "\n")
 
-    return resultados_finales
+    resultados = ResultadosCalificacion(resultados_finales, matriz_respuestas=matriz_respuestas,
+                                        clave=clave_codigos, mascaras=clave_mascaras)
+    resultados.cache['matriz_estado'] = estado
+    if duplicados is not None:
+        resultados.cache['duplicados'] = duplicados
+    if reglas is not None and not reglas.es_uniforme:
+        aplicar_reglas(resultados, reglas, mapeo_materias)
+    else:
+        asignar_rankings(resultados)
+    return resultados
+
+
+def _resolver_duplicados(respuestas_df: pd.DataFrame, estado: np.ndarray, nombres: List[str],
+                         emails: List[str], grupos: List[str], politica: str, columna_timestamp: str,
+                         reglas: Optional[ReglasPuntaje], mapeo_materias: Dict[str, range]):
+    """
+    Aplica la política de duplicados a las filas del CSV.
+
+    Returns:
+        (conservar por fila, envíos de cada fila, reporte de los duplicados)
+    """
+    claves = claves_envios(emails, nombres)
+    if not pd.Series(claves).duplicated().any():
+        return np.ones(len(claves), dtype=bool), np.ones(len(claves), dtype=np.int64), \
+            pd.DataFrame(columns=COLUMNAS_REPORTE)
+
+    col_timestamp = obtener_columna_flexible(respuestas_df, [columna_timestamp, columna_timestamp.strip(),
+                                                             'Marca temporal', 'Timestamp'])
+    marcas_crudas = respuestas_df[col_timestamp].tolist() if col_timestamp is not None else None
+    marcas = parsear_marcas_tiempo(marcas_crudas) if marcas_crudas is not None else None
+    if reglas is not None:
+        puntajes = calcular_puntajes(estado, reglas, mapeo_materias)['puntajes'][:, -1].round(2)
+    else:
+        puntajes = (estado == ESTADO_ACIERTO).sum(axis=1)
+
+    conservar, envios = seleccionar_envios(claves, politica, marcas, puntajes)
+    reporte = reporte_duplicados(conservar, envios, claves, nombres, emails, grupos, marcas_crudas, puntajes)
+
+    alumnos = reporte['Clave'].nunique()
+    descartados = int((~conservar).sum())
+    print(f"🔁 {alumnos} alumno(s) con más de un envío ({len(reporte)} envíos); "
+          f"política '{politica}': se descartaron {descartados}")
+    return conservar, envios, reporte
+
+
+def normalizar_version(valor: Any) -> str:
+    """'  b ' -> 'B'; vacío si no hay versión."""
+    if pd.isna(valor):
+        return ''
+    return str(valor).strip().upper()
+
+
+def reordenar_versiones(matriz_respuestas: np.ndarray, versiones_alumnos: np.ndarray,
+                        permutaciones: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Pasa las respuestas de cada versión al orden canónico.
+    permutaciones[v][j] es el índice canónico de la pregunta j + 1 de la versión v;
+    las filas de versiones desconocidas se dejan en el orden en que llegaron.
+    Una permutación con más preguntas que columnas de respuestas (o que no es
+    una permutación de 0..n-1) se rechaza con ValueError.
+    """
+    ancho = matriz_respuestas.shape[1]
+    canonica = matriz_respuestas.copy()
+    for version, permutacion in permutaciones.items():
+        permutacion = np.asarray(permutacion, dtype=np.int64)
+        largo = len(permutacion)
+        if largo > ancho:
+            raise ValueError(f"La versión {version} tiene {largo} preguntas, pero el archivo de "
+                             f"respuestas solo tiene {ancho} columnas de preguntas")
+        if (np.sort(permutacion) != np.arange(largo)).any():
+            raise ValueError(f"La permutación de la versión {version} no cubre las preguntas 1..{largo}")
+
+        filas = np.flatnonzero(versiones_alumnos == version.upper())
+        if len(filas) == 0:
+            continue
+        inversa = np.empty(largo, dtype=np.int64)
+        inversa[permutacion] = np.arange(largo)
+        canonica[filas, :largo] = matriz_respuestas[filas][:, inversa]
+
+    conocidas = {v.upper() for v in permutaciones}
+    desconocidas = sorted(set(versiones_alumnos) - conocidas)
+    if desconocidas:
+        print(f"⚠️ Versiones sin permutación (se califican en orden canónico): {desconocidas}")
+    return canonica
+
+
+def _listas_por_fila(mascara: np.ndarray) -> List[List[int]]:
+    """Números de pregunta (1-based) marcados en cada fila, como listas de int."""
+    filas, columnas = np.nonzero(mascara)
+    cortes = np.bincount(filas, minlength=mascara.shape[0]).cumsum()[:-1]
+    return [c.tolist() for c in np.split(columnas + 1, cortes)]
+
+
+def _valores_columna(df: pd.DataFrame, nombre_columna: Optional[str], valor_default) -> List[str]:
+    """
+    obtener_valor_columna para toda la columna. valor_default puede ser
+    un valor o una lista con un valor por fila.
+    """
+    defaults = valor_default if isinstance(valor_default, list) else [valor_default] * len(df)
+    if nombre_columna is None or nombre_columna not in df.columns:
+        return defaults
+
+    valores = []
+    for valor, default in zip(df[nombre_columna].tolist(), defaults):
+        if pd.notna(valor):
+            valor_str = str(valor).strip()
+            if valor_str and valor_str.lower() not in ['nan', 'none', '']:
+                valores.append(valor_str)
+                continue
+        valores.append(default)
+    return valores
 
 
 def obtener_valor_columna(fila: pd.Series, nombre_columna: Optional[str], valor_default: str) -> str:
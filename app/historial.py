@@ -0,0 +1,352 @@
+# app/historial.py
+"""
+Almacén histórico de resultados en SQLite.
+Guarda cada examen calificado (alumnos, calificaciones por materia y el
+estado de cada pregunta empaquetado) para poder consultar a un alumno
+a lo largo de varios simulacros o la tendencia de un grupo.
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+from config import RUTA_HISTORIAL
+from matrices import EstadosEmpaquetados, obtener_estados_empaquetados, ancho_examen
+from identidad import IndiceIdentidad, clave_identidad, normalizar_email, normalizar_nombre, es_nombre_generico
+from longitudinal import ESQUEMA_LONGITUDINAL, MATERIA_GLOBAL, registrar_series, reporte_grupos
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS examenes (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL UNIQUE,
+    fecha TEXT NOT NULL,
+    total_preguntas INTEGER NOT NULL,
+    total_alumnos INTEGER NOT NULL,
+    ancho_estados INTEGER  -- Preguntas en el blob de estados (con la clave parcial, más que total_preguntas)
+);
+
+CREATE TABLE IF NOT EXISTS alumnos (
+    id INTEGER PRIMARY KEY,
+    clave TEXT NOT NULL UNIQUE,
+    email TEXT,
+    nombre TEXT
+);
+
+CREATE TABLE IF NOT EXISTS resultados (
+    id INTEGER PRIMARY KEY,
+    examen_id INTEGER NOT NULL REFERENCES examenes(id) ON DELETE CASCADE,
+    alumno_id INTEGER NOT NULL REFERENCES alumnos(id),
+    grupo TEXT,
+    total_aciertos INTEGER,
+    total_errores INTEGER,
+    total_sin_responder INTEGER,
+    porcentaje_global REAL,
+    calificacion_global REAL,
+    estados BLOB  -- EstadosEmpaquetados.fila_bytes: 2 bits por pregunta
+);
+
+CREATE TABLE IF NOT EXISTS calificaciones_materia (
+    resultado_id INTEGER NOT NULL REFERENCES resultados(id) ON DELETE CASCADE,
+    materia TEXT NOT NULL,
+    aciertos INTEGER,
+    errores INTEGER,
+    sin_responder INTEGER,
+    total INTEGER,
+    porcentaje REAL,
+    calificacion REAL,
+    PRIMARY KEY (resultado_id, materia)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_alumnos_email ON alumnos(email);
+CREATE INDEX IF NOT EXISTS idx_resultados_examen ON resultados(examen_id);
+CREATE INDEX IF NOT EXISTS idx_resultados_alumno ON resultados(alumno_id, examen_id);
+CREATE INDEX IF NOT EXISTS idx_resultados_grupo ON resultados(grupo, examen_id);
+"""
+
+# Máximo de parámetros por consulta IN (...) para no exceder el límite de SQLite
+_LOTE_PARAMETROS = 900
+
+
+def conectar(ruta: Optional[str] = None) -> sqlite3.Connection:
+    """Abre (y crea si no existe) la base de datos del historial."""
+    ruta = ruta or RUTA_HISTORIAL
+    carpeta = os.path.dirname(ruta)
+    if carpeta and not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("PRAGMA foreign_keys = ON")
+    conexion.execute("PRAGMA journal_mode = WAL")
+    conexion.execute("PRAGMA synchronous = NORMAL")
+    conexion.executescript(ESQUEMA)
+    conexion.executescript(ESQUEMA_LONGITUDINAL)
+    _migrar(conexion)
+    return conexion
+
+
+def _migrar(conexion: sqlite3.Connection):
+    """Agrega las columnas nuevas a una base creada con un esquema anterior."""
+    columnas = {fila[1] for fila in conexion.execute("PRAGMA table_info(examenes)")}
+    if 'ancho_estados' not in columnas:
+        with conexion:
+            conexion.execute("ALTER TABLE examenes ADD COLUMN ancho_estados INTEGER")
+
+
+def clave_alumno(resultado: Dict[str, Any]) -> str:
+    """Identificador estable del alumno: email si existe, si no el nombre normalizado."""
+    return clave_identidad(resultado.get('email'), resultado.get('nombre', ''))
+
+
+def _cargar_indice_identidad(conexion: sqlite3.Connection) -> IndiceIdentidad:
+    """Índice de identidad con todos los alumnos ya registrados."""
+    indice = IndiceIdentidad()
+    for clave, email, nombre in conexion.execute("SELECT clave, email, nombre FROM alumnos ORDER BY id"):
+        indice.agregar(clave, email, nombre)
+    return indice
+
+
+def _resolver_claves(conexion: sqlite3.Connection, resultados: List[Dict[str, Any]],
+                     nombre_examen: str) -> List[str]:
+    """
+    Clave de alumno de cada resultado, uniendo variantes del mismo alumno
+    con los ya registrados (ver identidad.IndiceIdentidad).
+    """
+    indice = _cargar_indice_identidad(conexion)
+    claves = []
+    usadas = set()
+    for posicion, r in enumerate(resultados):
+        email, nombre = r.get('email'), r.get('nombre', '')
+        clave = indice.resolver(email, nombre)
+
+        # Dos registros del mismo examen nunca son el mismo alumno
+        if clave is None or clave in usadas:
+            if normalizar_email(email) is None and es_nombre_generico(normalizar_nombre(nombre)):
+                clave = f"anonimo:{nombre_examen}:{posicion}"
+            else:
+                clave = clave_identidad(email, nombre)
+                if clave in usadas:
+                    clave = f"{clave}#{nombre_examen}:{posicion}"
+            indice.agregar(clave, email, nombre)
+
+        usadas.add(clave)
+        claves.append(clave)
+    return claves
+
+
+def _obtener_ids_alumnos(conexion: sqlite3.Connection, claves: List[str]) -> Dict[str, int]:
+    """Devuelve el id de cada clave de alumno (consultas por lotes)."""
+    ids = {}
+    unicas = list(dict.fromkeys(claves))
+    for inicio in range(0, len(unicas), _LOTE_PARAMETROS):
+        lote = unicas[inicio:inicio + _LOTE_PARAMETROS]
+        marcadores = ','.join('?' * len(lote))
+        for id_alumno, clave in conexion.execute(
+                f"SELECT id, clave FROM alumnos WHERE clave IN ({marcadores})", lote):
+            ids[clave] = id_alumno
+    return ids
+
+
+def guardar_examen(resultados: List[Dict[str, Any]], nombre_examen: str,
+                   conexion: Optional[sqlite3.Connection] = None,
+                   fecha: Optional[str] = None) -> int:
+    """
+    Guarda un examen calificado en una sola transacción.
+    Si ya existe un examen con el mismo nombre, se reemplaza conservando su
+    fecha; solo se puede reemplazar si es el último examen de las series de
+    sus alumnos (si no, los cambios de los examenes posteriores quedarían
+    calculados contra datos viejos y se lanza ValueError).
+
+    Returns:
+        Id del examen guardado
+    """
+    propia = conexion is None
+    if propia:
+        conexion = conectar()
+
+    try:
+        total_preguntas = resultados[0]['total_preguntas'] if resultados else 0
+        ancho = ancho_examen(resultados)
+        estados = obtener_estados_empaquetados(resultados, ancho)
+
+        with conexion:
+            existente = conexion.execute("SELECT id, fecha FROM examenes WHERE nombre = ?",
+                                         (nombre_examen,)).fetchone()
+            if existente is not None:
+                if _tiene_examenes_posteriores(conexion, existente[0]):
+                    raise ValueError(f"El examen '{nombre_examen}' ya tiene examenes posteriores en el "
+                                     f"historial; guárdelo con otro nombre")
+                fecha = existente[1] if fecha is None else fecha
+            fecha = fecha or datetime.now().isoformat(timespec='seconds')
+            conexion.execute("DELETE FROM examenes WHERE nombre = ?", (nombre_examen,))
+            claves = _resolver_claves(conexion, resultados, nombre_examen)
+            cursor = conexion.execute(
+                "INSERT INTO examenes (nombre, fecha, total_preguntas, total_alumnos, ancho_estados) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (nombre_examen, fecha, total_preguntas, len(resultados), ancho))
+            examen_id = cursor.lastrowid
+
+            conexion.executemany(
+                "INSERT INTO alumnos (clave, email, nombre) VALUES (?, ?, ?) "
+                "ON CONFLICT(clave) DO UPDATE SET email = COALESCE(alumnos.email, excluded.email)",
+                [(clave, normalizar_email(r.get('email')), r['nombre'])
+                 for clave, r in zip(claves, resultados)])
+            ids_alumnos = _obtener_ids_alumnos(conexion, claves)
+
+            # Ids explícitos para poder insertar las materias en el mismo lote
+            siguiente_id = conexion.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM resultados").fetchone()[0]
+            filas_resultados = []
+            filas_materias = []
+            for posicion, (clave, r) in enumerate(zip(claves, resultados)):
+                resultado_id = siguiente_id + posicion
+                filas_resultados.append((
+                    resultado_id, examen_id, ids_alumnos[clave], str(r.get('grupo', '')),
+                    r['total_aciertos'], r['total_errores'], r['total_sin_responder'],
+                    r['porcentaje_global'], r['calificacion_global'], estados.fila_bytes(posicion)))
+                for materia, datos in r['calificaciones'].items():
+                    filas_materias.append((
+                        resultado_id, materia, datos['aciertos'], datos['errores'],
+                        datos['sin_responder'], datos['total'], datos['porcentaje'],
+                        datos['calificacion']))
+
+            conexion.executemany(
+                "INSERT INTO resultados (id, examen_id, alumno_id, grupo, total_aciertos, total_errores, "
+                "total_sin_responder, porcentaje_global, calificacion_global, estados) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", filas_resultados)
+            conexion.executemany(
+                "INSERT INTO calificaciones_materia (resultado_id, materia, aciertos, errores, "
+                "sin_responder, total, porcentaje, calificacion) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                filas_materias)
+
+            # Series por alumno y resúmenes por grupo (solo con el examen nuevo)
+            porcentajes = {MATERIA_GLOBAL: [r['porcentaje_global'] for r in resultados]}
+            for materia in (resultados[0]['calificaciones'] if resultados else {}):
+                porcentajes[materia] = [r['calificaciones'].get(materia, {}).get('porcentaje', 0.0)
+                                        for r in resultados]
+            registrar_series(conexion, examen_id, [ids_alumnos[clave] for clave in claves],
+                             [str(r.get('grupo', '')) for r in resultados], porcentajes)
+
+        print(f"Examen '{nombre_examen}' guardado en el historial ({len(resultados)} alumnos)")
+        return examen_id
+    finally:
+        if propia:
+            conexion.close()
+
+
+def _tiene_examenes_posteriores(conexion: sqlite3.Connection, examen_id: int) -> bool:
+    """Indica si algún alumno del examen tiene entradas más nuevas en su serie."""
+    return conexion.execute(
+        "SELECT EXISTS (SELECT 1 FROM serie_alumno s JOIN serie_alumno t "
+        "ON t.alumno_id = s.alumno_id AND t.materia = s.materia AND t.secuencia > s.secuencia "
+        "WHERE s.examen_id = ?)", (examen_id,)).fetchone()[0] == 1
+
+
+def listar_examenes(conexion: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """Lista los examenes guardados en orden cronológico."""
+    propia = conexion is None
+    if propia:
+        conexion = conectar()
+    try:
+        return pd.read_sql_query(
+            "SELECT id, nombre, fecha, total_preguntas, total_alumnos FROM examenes ORDER BY fecha, id",
+            conexion)
+    finally:
+        if propia:
+            conexion.close()
+
+
+def estados_examen(nombre_examen: str,
+                   conexion: Optional[sqlite3.Connection] = None) -> Optional[EstadosEmpaquetados]:
+    """
+    Estados por pregunta de un examen guardado, empaquetados y en el orden
+    en que se guardaron los alumnos. None si el examen no existe o está vacío.
+    El ancho es el que se guardó con el examen (o total_preguntas en bases anteriores).
+    """
+    propia = conexion is None
+    if propia:
+        conexion = conectar()
+    try:
+        examen = conexion.execute("SELECT id, COALESCE(ancho_estados, total_preguntas) FROM examenes "
+                                  "WHERE nombre = ?", (nombre_examen,)).fetchone()
+        filas = [] if examen is None else [fila[0] for fila in conexion.execute(
+            "SELECT estados FROM resultados WHERE examen_id = ? ORDER BY id", (examen[0],))]
+    finally:
+        if propia:
+            conexion.close()
+
+    if not filas:
+        return None
+    # El blob redondea a bytes completos: el ancho guardado nunca puede pasar de sus bits
+    ancho = min(examen[1], len(filas[0]) // 2 * 8)
+    return EstadosEmpaquetados.desde_bytes(filas, ancho)
+
+
+def historial_alumno(email_o_nombre: str, conexion: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """
+    Resultados de un alumno en todos los examenes guardados.
+    Una fila por examen con el porcentaje global y el porcentaje por materia.
+    """
+    propia = conexion is None
+    if propia:
+        conexion = conectar()
+    try:
+        if '@' in email_o_nombre:
+            email, nombre = email_o_nombre, ''
+        else:
+            email, nombre = None, email_o_nombre
+        clave = _cargar_indice_identidad(conexion).resolver(email, nombre) or clave_identidad(email, nombre)
+        df = pd.read_sql_query(
+            """
+            SELECT e.nombre AS examen, e.fecha, r.grupo, r.total_aciertos, r.porcentaje_global,
+                   cm.materia, cm.porcentaje
+            FROM alumnos a
+            JOIN resultados r ON r.alumno_id = a.id
+            JOIN examenes e ON e.id = r.examen_id
+            JOIN calificaciones_materia cm ON cm.resultado_id = r.id
+            WHERE a.clave = ?
+            ORDER BY e.fecha, e.id
+            """, conexion, params=(clave,))
+    finally:
+        if propia:
+            conexion.close()
+
+    return _pivotar_materias(df, ['examen', 'fecha', 'grupo', 'total_aciertos', 'porcentaje_global'])
+
+
+def tendencia_grupo(grupo: str, conexion: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """
+    Promedios de un grupo en cada examen guardado (global y por materia),
+    leídos de los resúmenes por grupo (ver longitudinal.reporte_grupos).
+    """
+    propia = conexion is None
+    if propia:
+        conexion = conectar()
+    try:
+        resumen = reporte_grupos(grupo, conexion)
+    finally:
+        if propia:
+            conexion.close()
+
+    if resumen.empty:
+        return pd.DataFrame(columns=['examen', 'fecha', 'alumnos', 'porcentaje_global'])
+
+    tabla = resumen.pivot_table(index=['examen', 'fecha'], columns='materia', values='media',
+                                sort=False).reset_index()
+    tabla.columns.name = None
+    alumnos = resumen[resumen['materia'] == MATERIA_GLOBAL].set_index(['examen', 'fecha'])['alumnos']
+    tabla.insert(2, 'alumnos', alumnos.reindex(pd.MultiIndex.from_frame(tabla[['examen', 'fecha']])).values)
+    tabla.insert(3, 'porcentaje_global', tabla.pop(MATERIA_GLOBAL))
+    return tabla.round(2)
+
+
+def _pivotar_materias(df: pd.DataFrame, columnas_fijas: List[str]) -> pd.DataFrame:
+    """Convierte filas (examen, materia) en una columna por materia."""
+    if df.empty:
+        return pd.DataFrame(columns=columnas_fijas)
+
+    tabla = df.pivot_table(index=columnas_fijas, columns='materia', values='porcentaje',
+                           sort=False).reset_index()
+    tabla.columns.name = None
+    return tabla.round(2)
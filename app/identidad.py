@@ -0,0 +1,232 @@
+# app/identidad.py
+"""
+Resolución de identidad de alumnos entre exámenes.
+Un mismo alumno puede aparecer con el nombre escrito distinto (acentos,
+espacios, un apellido de menos) o sin email. El índice normaliza los
+nombres, usa el 'Nombre de usuario' como llave principal y, para los
+casi-duplicados, solo compara contra los candidatos que comparten un
+bloque (pares de prefijos de palabras), no contra todos los registros.
+"""
+
+import re
+import unicodedata
+import zlib
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import List, Dict, Optional, Set, Tuple
+
+# Similitud mínima para considerar que dos nombres son el mismo alumno
+UMBRAL_SIMILITUD = 0.88
+
+# Descuento por cada palabra faltante o con error de dedo (dos diferencias como máximo)
+PENALIZACION_DIFERENCIA = 0.05
+
+# Bloques con más candidatos que esto se ignoran (nombres muy comunes)
+MAXIMO_POR_BLOQUE = 50
+
+# Letras de cada palabra que forman la llave de bloque
+LARGO_PREFIJO_BLOQUE = 4
+
+# Valores que pone el calificador cuando falta el dato
+_EMAILS_VACIOS = {'', 'sin email', 'nan', 'none'}
+_PATRON_NOMBRE_GENERICO = re.compile(r'^alumno_\d+$')
+_PATRON_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar_nombre(nombre: str) -> str:
+    """
+    'José  MARÍA Pérez ' -> 'jose maria perez'
+    (minúsculas, sin acentos, sin puntuación, espacios colapsados).
+    """
+    texto = unicodedata.normalize('NFKD', str(nombre or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).casefold()
+    return ' '.join(_PATRON_NO_ALFANUMERICO.sub(' ', texto).split())
+
+
+def normalizar_email(email: str) -> Optional[str]:
+    """Email en minúsculas, o None si es un valor vacío/por defecto."""
+    email = str(email or '').strip().lower()
+    if email in _EMAILS_VACIOS:
+        return None
+    return email
+
+
+def es_nombre_generico(nombre_normalizado: str) -> bool:
+    """Indica si el nombre es el genérico 'Alumno_N' que pone el calificador."""
+    return not nombre_normalizado or bool(_PATRON_NOMBRE_GENERICO.match(nombre_normalizado.replace(' ', '_')))
+
+
+def claves_bloque(nombre_normalizado: str) -> Set[int]:
+    """
+    Llaves de bloque (hash) de un nombre: cada par de prefijos de palabra.
+    Dos variantes del mismo nombre con al menos dos palabras que empiezan
+    igual ('gomez' / 'gomes') caen en algún bloque compartido.
+    """
+    prefijos = sorted(set(p[:LARGO_PREFIJO_BLOQUE] for p in nombre_normalizado.split()))
+    if len(prefijos) == 1:
+        return {zlib.crc32(prefijos[0].encode())}
+    return {zlib.crc32(f"{a}|{b}".encode()) for a, b in combinations(prefijos, 2)}
+
+
+def _palabras_parecidas(a: str, b: str) -> bool:
+    """Dos palabras que difieren por un error de dedo ('gomez' / 'gomes')."""
+    if a[0] != b[0] or abs(len(a) - len(b)) > 1 or min(len(a), len(b)) < 4:
+        return False
+    return SequenceMatcher(None, a, b).ratio() >= 0.8
+
+
+def similitud_nombres(nombre_a: str, nombre_b: str) -> float:
+    """
+    Similitud entre dos nombres normalizados (0 a 1), sin importar el orden
+    de las palabras. Cada palabra del nombre más corto debe coincidir con
+    una del otro (igual o con un error de dedo) y al otro le puede sobrar
+    a lo más una palabra (p. ej. el segundo apellido). Cada diferencia
+    descuenta PENALIZACION_DIFERENCIA.
+    """
+    menor, mayor = sorted((nombre_a.split(), nombre_b.split()), key=len)
+    if not menor or len(mayor) - len(menor) > 1 or (len(menor) < 2 and menor != mayor):
+        return 0.0
+
+    # Los números ('Alumno 12' / 'Alumno 13') deben coincidir exactamente
+    if sorted(p for p in menor if p.isdigit()) != sorted(p for p in mayor if p.isdigit()):
+        return 0.0
+
+    restantes = list(mayor)
+    pendientes = []
+    for palabra in menor:
+        if palabra in restantes:
+            restantes.remove(palabra)
+        else:
+            pendientes.append(palabra)
+
+    diferencias = len(mayor) - len(menor)
+    for palabra in pendientes:
+        parecida = next((p for p in restantes if _palabras_parecidas(palabra, p)), None)
+        if parecida is None:
+            return 0.0
+        restantes.remove(parecida)
+        diferencias += 1
+
+    return 1.0 - PENALIZACION_DIFERENCIA * diferencias
+
+
+class IndiceIdentidad:
+    """
+    Índice de identidades conocidas (clave -> email, nombre normalizado).
+    Se llena con los alumnos ya registrados y resuelve cada registro nuevo
+    a una clave existente o crea una nueva.
+    """
+
+    def __init__(self, umbral_similitud: float = UMBRAL_SIMILITUD):
+        self.umbral_similitud = umbral_similitud
+        self._identidades: List[Tuple[str, Optional[str], str]] = []  # (clave, email, nombre)
+        self._por_email: Dict[str, int] = {}
+        self._por_nombre: Dict[str, List[int]] = {}
+        self._bloques: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._identidades)
+
+    def agregar(self, clave: str, email: Optional[str], nombre: str) -> None:
+        """Registra una identidad existente."""
+        email = normalizar_email(email)
+        nombre = normalizar_nombre(nombre)
+        posicion = len(self._identidades)
+        self._identidades.append((clave, email, nombre))
+
+        if email:
+            self._por_email.setdefault(email, posicion)
+        if not es_nombre_generico(nombre):
+            self._por_nombre.setdefault(nombre, []).append(posicion)
+            for llave in claves_bloque(nombre):
+                self._bloques.setdefault(llave, []).append(posicion)
+
+    def _compatible(self, posicion: int, email: Optional[str]) -> bool:
+        """Dos registros con emails distintos nunca se unen por nombre."""
+        email_conocido = self._identidades[posicion][1]
+        return email is None or email_conocido is None or email_conocido == email
+
+    def resolver(self, email: Optional[str], nombre: str) -> Optional[str]:
+        """
+        Busca la identidad de un registro: primero por email, luego por nombre
+        exacto normalizado y por último por nombre parecido dentro de sus bloques.
+
+        Returns:
+            Clave de la identidad encontrada o None
+        """
+        email = normalizar_email(email)
+        nombre = normalizar_nombre(nombre)
+
+        if email and email in self._por_email:
+            return self._identidades[self._por_email[email]][0]
+
+        if es_nombre_generico(nombre):
+            return None
+
+        for posicion in self._por_nombre.get(nombre, []):
+            if self._compatible(posicion, email):
+                return self._identidades[posicion][0]
+
+        candidatos = set()
+        for llave in claves_bloque(nombre):
+            bloque = self._bloques.get(llave, [])
+            if len(bloque) <= MAXIMO_POR_BLOQUE:
+                candidatos.update(bloque)
+
+        mejor_posicion, mejor_similitud = None, self.umbral_similitud
+        for posicion in sorted(candidatos):
+            if not self._compatible(posicion, email):
+                continue
+            similitud = similitud_nombres(nombre, self._identidades[posicion][2])
+            if similitud >= mejor_similitud:
+                mejor_posicion, mejor_similitud = posicion, similitud
+
+        return None if mejor_posicion is None else self._identidades[mejor_posicion][0]
+
+    def resolver_o_agregar(self, email: Optional[str], nombre: str,
+                           clave_nueva: Optional[str] = None) -> str:
+        """Resuelve el registro o, si no hay coincidencia, lo agrega como identidad nueva."""
+        clave = self.resolver(email, nombre)
+        if clave is not None:
+            return clave
+
+        clave = clave_nueva or clave_identidad(email, nombre)
+        self.agregar(clave, email, nombre)
+        return clave
+
+
+def clave_identidad(email: Optional[str], nombre: str) -> str:
+    """Clave estable de una identidad nueva: email si existe, si no el nombre normalizado."""
+    email = normalizar_email(email)
+    if email:
+        return f"email:{email}"
+    return f"nombre:{normalizar_nombre(nombre)}"
+
+
+def vincular_registros(registros: List[Tuple[Optional[str], str]],
+                       umbral_similitud: float = UMBRAL_SIMILITUD) -> List[str]:
+    """
+    Asigna una clave de identidad a cada registro (email, nombre),
+    uniendo los que corresponden al mismo alumno.
+    """
+    indice = IndiceIdentidad(umbral_similitud)
+    claves = []
+    for posicion, (email, nombre) in enumerate(registros):
+        clave_nueva = None
+        if normalizar_email(email) is None and es_nombre_generico(normalizar_nombre(nombre)):
+            clave_nueva = f"anonimo:{posicion}"
+        claves.append(indice.resolver_o_agregar(email, nombre, clave_nueva))
+    return claves
+
+
+if __name__ == "__main__":
+    ejemplos = [
+        ('alumno1@gmail.com', 'José María Pérez López'),
+        ('Sin email', 'jose maria  perez lopez '),
+        ('Sin email', 'JOSE MARIA PEREZ'),
+        ('otro@gmail.com', 'Ana Gómez'),
+        ('Sin email', 'Ana Gomes'),
+        ('Sin email', 'Alumno_7'),
+    ]
+    for (email, nombre), clave in zip(ejemplos, vincular_registros(ejemplos)):
+        print(f"{nombre:28s} {email:20s} -> {clave}")
@@ -0,0 +1,83 @@
+# app/indice_resultados.py
+"""
+Índices precalculados sobre los resultados de calificación.
+Permiten ordenar por columna y filtrar por grupo sin reordenar
+la lista de diccionarios en cada consulta (usado por la tabla de la GUI).
+"""
+
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+# Columnas ordenables: nombre visible -> función que extrae la llave de orden
+COLUMNAS_ORDENABLES: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'nombre': lambda r: str(r.get('nombre', '')).lower(),
+    'grupo': lambda r: str(r.get('grupo', '')).lower(),
+    'total': lambda r: r.get('total_aciertos', 0),
+    'calificacion': lambda r: r.get('calificacion_global', 0),
+    'porcentaje': lambda r: r.get('porcentaje_global', 0),
+}
+
+TODOS_LOS_GRUPOS = 'Todos'
+
+
+class IndiceResultados:
+    """Almacén de solo lectura con índices de orden y de grupo."""
+
+    def __init__(self, resultados: List[Dict[str, Any]]):
+        self.resultados = resultados
+
+        # Posiciones de cada alumno por grupo (en orden original)
+        self.posiciones_grupo: Dict[str, List[int]] = {}
+        for idx, resultado in enumerate(resultados):
+            grupo = str(resultado.get('grupo', 'Sin grupo'))
+            self.posiciones_grupo.setdefault(grupo, []).append(idx)
+
+        # Órdenes ya calculados: (columna, grupo, descendente) -> lista de posiciones
+        self._ordenes: Dict[Tuple[str, str, bool], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.resultados)
+
+    def obtener_grupos(self) -> List[str]:
+        """Lista de grupos disponibles (ordenados)."""
+        return sorted(self.posiciones_grupo.keys())
+
+    def _orden_columna(self, columna: str, descendente: bool) -> List[int]:
+        """
+        Orden global de una columna (se calcula una sola vez por sentido).
+        El orden es estable en ambos sentidos: los empates conservan el
+        orden original, por eso el descendente no es el ascendente invertido.
+        """
+        llave = (columna, TODOS_LOS_GRUPOS, descendente)
+        if llave not in self._ordenes:
+            extraer = COLUMNAS_ORDENABLES[columna]
+            valores = [extraer(r) for r in self.resultados]
+            self._ordenes[llave] = sorted(range(len(valores)), key=valores.__getitem__,
+                                          reverse=descendente)
+        return self._ordenes[llave]
+
+    def obtener_vista(self, columna: str = 'porcentaje', descendente: bool = True,
+                      grupo: Optional[str] = None) -> List[int]:
+        """
+        Devuelve las posiciones de los alumnos ordenadas por columna y
+        filtradas por grupo. Los filtros se derivan del orden global ya
+        calculado, por lo que no se vuelve a ordenar la lista.
+        """
+        if columna not in COLUMNAS_ORDENABLES:
+            raise ValueError(f"Columna no ordenable: {columna}")
+
+        grupo = grupo or TODOS_LOS_GRUPOS
+        llave = (columna, grupo, descendente)
+
+        if llave not in self._ordenes:
+            orden_global = self._orden_columna(columna, descendente)
+            if grupo == TODOS_LOS_GRUPOS:
+                self._ordenes[llave] = orden_global
+            else:
+                miembros = set(self.posiciones_grupo.get(grupo, []))
+                self._ordenes[llave] = [idx for idx in orden_global if idx in miembros]
+
+        return self._ordenes[llave]
+
+    def obtener_pagina(self, vista: List[int], inicio: int, tamanio: int) -> List[Dict[str, Any]]:
+        """Devuelve los resultados de una página de la vista."""
+        return [self.resultados[idx] for idx in vista[inicio:inicio + tamanio]]
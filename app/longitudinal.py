@@ -0,0 +1,250 @@
+# app/longitudinal.py
+"""
+Seguimiento longitudinal de alumnos y grupos entre simulacros.
+Cada vez que se guarda un examen en el historial se agrega una entrada
+por alumno y materia a su serie de tiempo (porcentaje, cambio contra el
+examen anterior y percentil dentro del examen) y un resumen por grupo
+(sumas y conteos) del examen nuevo. Los reportes leen de estas tablas,
+sin recalcular todo el historial.
+"""
+
+import sqlite3
+from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+MATERIA_GLOBAL = 'Global'
+
+ESQUEMA_LONGITUDINAL = """
+CREATE TABLE IF NOT EXISTS serie_alumno (
+    alumno_id INTEGER NOT NULL REFERENCES alumnos(id),
+    materia TEXT NOT NULL,
+    secuencia INTEGER NOT NULL,
+    examen_id INTEGER NOT NULL REFERENCES examenes(id) ON DELETE CASCADE,
+    porcentaje REAL NOT NULL,
+    delta REAL,
+    percentil REAL NOT NULL,
+    PRIMARY KEY (alumno_id, materia, secuencia)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS resumen_grupo (
+    grupo TEXT NOT NULL,
+    materia TEXT NOT NULL,
+    examen_id INTEGER NOT NULL REFERENCES examenes(id) ON DELETE CASCADE,
+    alumnos INTEGER NOT NULL,
+    suma REAL NOT NULL,
+    suma_cuadrados REAL NOT NULL,
+    alumnos_con_delta INTEGER NOT NULL,
+    suma_delta REAL NOT NULL,
+    PRIMARY KEY (grupo, materia, examen_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_serie_examen ON serie_alumno(examen_id, materia);
+CREATE INDEX IF NOT EXISTS idx_resumen_examen ON resumen_grupo(examen_id);
+"""
+
+# Máximo de parámetros por consulta IN (...) para no exceder el límite de SQLite
+_LOTE_PARAMETROS = 900
+
+
+def calcular_percentiles(valores: np.ndarray) -> np.ndarray:
+    """Percentil de cada valor dentro del arreglo (empates a la mitad), de 0 a 100."""
+    ordenados = np.sort(valores)
+    menores = np.searchsorted(ordenados, valores, side='left')
+    iguales = np.searchsorted(ordenados, valores, side='right') - menores
+    return 100.0 * (menores + 0.5 * iguales) / len(valores)
+
+
+def _ultimas_entradas(conexion: sqlite3.Connection, alumno_ids: List[int]) -> Dict[tuple, tuple]:
+    """Última entrada de la serie de cada (alumno, materia): (secuencia, porcentaje)."""
+    ultimas = {}
+    unicos = list(dict.fromkeys(alumno_ids))
+    for inicio in range(0, len(unicos), _LOTE_PARAMETROS):
+        lote = unicos[inicio:inicio + _LOTE_PARAMETROS]
+        marcadores = ','.join('?' * len(lote))
+        # SQLite devuelve las columnas de la fila con MAX(secuencia)
+        for alumno_id, materia, secuencia, porcentaje in conexion.execute(
+                f"SELECT alumno_id, materia, MAX(secuencia), porcentaje FROM serie_alumno "
+                f"WHERE alumno_id IN ({marcadores}) GROUP BY alumno_id, materia", lote):
+            ultimas[(alumno_id, materia)] = (secuencia, porcentaje)
+    return ultimas
+
+
+def registrar_series(conexion: sqlite3.Connection, examen_id: int, alumno_ids: List[int],
+                     grupos: List[str], porcentajes: Dict[str, np.ndarray]) -> None:
+    """
+    Agrega el examen a las series de los alumnos y a los resúmenes de grupo.
+    Debe llamarse dentro de la transacción que guarda el examen.
+
+    Args:
+        conexion: Conexión al historial
+        examen_id: Id del examen recién guardado
+        alumno_ids: Id de alumno de cada resultado
+        grupos: Grupo de cada resultado
+        porcentajes: materia -> porcentaje de cada resultado (incluye MATERIA_GLOBAL)
+    """
+    if not alumno_ids:
+        return
+
+    ultimas = _ultimas_entradas(conexion, alumno_ids)
+    grupos = np.asarray(grupos, dtype=object)
+    nombres_grupo, grupo_idx = np.unique(grupos, return_inverse=True)
+
+    filas_serie = []
+    filas_resumen = []
+    for materia, valores in porcentajes.items():
+        valores = np.asarray(valores, dtype=np.float64)
+        percentiles = calcular_percentiles(valores)
+
+        anteriores = [ultimas.get((alumno_id, materia)) for alumno_id in alumno_ids]
+        con_delta = np.array([a is not None for a in anteriores])
+        deltas = np.array([valor - a[1] if a is not None else 0.0
+                           for valor, a in zip(valores, anteriores)])
+
+        for alumno_id, valor, delta, percentil, anterior in zip(
+                alumno_ids, valores, deltas, percentiles, anteriores):
+            secuencia = anterior[0] + 1 if anterior is not None else 1
+            filas_serie.append((alumno_id, materia, secuencia, examen_id, float(valor),
+                                round(float(delta), 2) if anterior is not None else None,
+                                round(float(percentil), 2)))
+
+        # Resumen por grupo del examen nuevo (sumas para media, desviación y cambio medio)
+        num_grupos = len(nombres_grupo)
+        alumnos = np.bincount(grupo_idx, minlength=num_grupos)
+        suma = np.bincount(grupo_idx, weights=valores, minlength=num_grupos)
+        suma_cuadrados = np.bincount(grupo_idx, weights=valores ** 2, minlength=num_grupos)
+        alumnos_con_delta = np.bincount(grupo_idx, weights=con_delta, minlength=num_grupos)
+        suma_delta = np.bincount(grupo_idx, weights=deltas, minlength=num_grupos)
+        for g, grupo in enumerate(nombres_grupo):
+            filas_resumen.append((str(grupo), materia, examen_id, int(alumnos[g]), float(suma[g]),
+                                  float(suma_cuadrados[g]), int(alumnos_con_delta[g]),
+                                  float(suma_delta[g])))
+
+    conexion.executemany(
+        "INSERT INTO serie_alumno (alumno_id, materia, secuencia, examen_id, porcentaje, delta, percentil) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", filas_serie)
+    conexion.executemany(
+        "INSERT INTO resumen_grupo (grupo, materia, examen_id, alumnos, suma, suma_cuadrados, "
+        "alumnos_con_delta, suma_delta) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas_resumen)
+
+
+def _conexion_historial(conexion: Optional[sqlite3.Connection]):
+    """Devuelve (conexion, propia); abre el historial si no se pasó una conexión."""
+    if conexion is not None:
+        return conexion, False
+    from historial import conectar
+    return conectar(), True
+
+
+def reporte_progreso(nombre_examen: Optional[str] = None,
+                     conexion: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """
+    Progreso de cada alumno en un examen (por defecto el último guardado):
+    porcentaje, cambio contra su examen anterior y percentil, por materia.
+    """
+    conexion, propia = _conexion_historial(conexion)
+    try:
+        if nombre_examen is None:
+            fila = conexion.execute("SELECT id FROM examenes ORDER BY fecha DESC, id DESC LIMIT 1").fetchone()
+        else:
+            fila = conexion.execute("SELECT id FROM examenes WHERE nombre = ?", (nombre_examen,)).fetchone()
+        if fila is None:
+            return pd.DataFrame()
+
+        return pd.read_sql_query(
+            """
+            SELECT a.nombre, a.email, r.grupo, s.materia, s.porcentaje, s.delta, s.percentil,
+                   s.secuencia AS examenes_presentados
+            FROM serie_alumno s
+            JOIN alumnos a ON a.id = s.alumno_id
+            JOIN resultados r ON r.examen_id = s.examen_id AND r.alumno_id = s.alumno_id
+            WHERE s.examen_id = ?
+            ORDER BY r.grupo, a.nombre, s.materia
+            """, conexion, params=(fila[0],))
+    finally:
+        if propia:
+            conexion.close()
+
+
+def reporte_tendencias(alumno_ids: Optional[List[int]] = None,
+                       conexion: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """
+    Tendencia de cada alumno por materia a partir de su serie:
+    primer y último porcentaje, cambio total, pendiente (puntos por examen)
+    y último percentil.
+    """
+    conexion, propia = _conexion_historial(conexion)
+    try:
+        consulta = ("SELECT s.alumno_id, a.nombre, s.materia, s.secuencia, s.porcentaje, s.percentil "
+                    "FROM serie_alumno s JOIN alumnos a ON a.id = s.alumno_id")
+        parametros: tuple = ()
+        if alumno_ids is not None:
+            consulta += f" WHERE s.alumno_id IN ({','.join('?' * len(alumno_ids))})"
+            parametros = tuple(alumno_ids)
+        serie = pd.read_sql_query(consulta + " ORDER BY s.alumno_id, s.materia, s.secuencia",
+                                  conexion, params=parametros)
+    finally:
+        if propia:
+            conexion.close()
+
+    if serie.empty:
+        return pd.DataFrame()
+
+    # Pendiente de mínimos cuadrados por (alumno, materia) con sumas agrupadas
+    serie['xy'] = serie['secuencia'] * serie['porcentaje']
+    serie['xx'] = serie['secuencia'] ** 2
+    grupos = serie.groupby(['alumno_id', 'nombre', 'materia'], sort=False)
+    tabla = grupos.agg(examenes=('secuencia', 'size'), primero=('porcentaje', 'first'),
+                       ultimo=('porcentaje', 'last'), percentil=('percentil', 'last'),
+                       sx=('secuencia', 'sum'), sy=('porcentaje', 'sum'),
+                       sxy=('xy', 'sum'), sxx=('xx', 'sum')).reset_index()
+
+    n = tabla['examenes']
+    denominador = n * tabla['sxx'] - tabla['sx'] ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pendiente = (n * tabla['sxy'] - tabla['sx'] * tabla['sy']) / denominador
+    tabla['pendiente'] = np.where(denominador > 0, pendiente, np.nan)
+    tabla['cambio_total'] = tabla['ultimo'] - tabla['primero']
+
+    columnas = ['alumno_id', 'nombre', 'materia', 'examenes', 'primero', 'ultimo',
+                'cambio_total', 'pendiente', 'percentil']
+    return tabla[columnas].round(2)
+
+
+def reporte_grupos(grupo: Optional[str] = None,
+                   conexion: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """
+    Media, desviación y cambio medio por grupo, materia y examen,
+    leídos de los resúmenes guardados al calificar cada examen.
+    """
+    conexion, propia = _conexion_historial(conexion)
+    try:
+        consulta = """
+            SELECT g.grupo, e.nombre AS examen, e.fecha, g.materia, g.alumnos,
+                   g.suma, g.suma_cuadrados, g.alumnos_con_delta, g.suma_delta
+            FROM resumen_grupo g
+            JOIN examenes e ON e.id = g.examen_id
+        """
+        parametros: tuple = ()
+        if grupo is not None:
+            consulta += " WHERE g.grupo = ?"
+            parametros = (grupo,)
+        resumen = pd.read_sql_query(consulta + " ORDER BY g.grupo, e.fecha, e.id, g.materia",
+                                    conexion, params=parametros)
+    finally:
+        if propia:
+            conexion.close()
+
+    if resumen.empty:
+        return resumen
+
+    resumen['media'] = resumen['suma'] / resumen['alumnos']
+    varianza = resumen['suma_cuadrados'] / resumen['alumnos'] - resumen['media'] ** 2
+    resumen['desviacion'] = np.sqrt(varianza.clip(lower=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resumen['cambio_medio'] = np.where(resumen['alumnos_con_delta'] > 0,
+                                           resumen['suma_delta'] / resumen['alumnos_con_delta'], np.nan)
+
+    columnas = ['grupo', 'examen', 'fecha', 'materia', 'alumnos', 'media', 'desviacion', 'cambio_medio']
+    return resumen[columnas].round(2)
@@ -5,7 +5,7 @@ Interfaz moderna y minimalista
 """
 import os
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 from datetime import datetime
 import threading
 
@@ -14,8 +14,13 @@ from config import (RUTA_DATOS, MAPEO_MATERIAS, COLUMNA_NOMBRE,
                     COLUMNA_EMAIL, COLUMNA_GRUPO)
 from data_loader import cargar_datos, validar_estructura_csv
 from grader import procesar_calificaciones_google_forms, calcular_estadisticas_grupo
-from generador_clave import GeneradorClave
+from generador_clave import GeneradorClave, RESPUESTAS_POR_LINEA
 from excel_consolidado import generar_reporte_consolidado
+from indice_resultados import (IndiceResultados, COLUMNAS_ORDENABLES,
+                               TODOS_LOS_GRUPOS)
+from historial import guardar_examen, listar_examenes
+from equiparacion import distribucion_examen, equiparar_resultados
+from registro_claves import RegistroClaves, compilar_clave_generador
 
 # Colores del tema Lobatchewsky
 COLORS = {
@@ -31,11 +36,14 @@ COLORS = {
     'error': '#DC3545'
 }
 
+# Filas que se insertan en la tabla de resultados por cada página
+TAMANIO_PAGINA_TABLA = 200
+
 
 class VentanaGeneradorClaveModerna(tk.Toplevel):
     """Ventana moderna para generar claves de respuestas."""
 
-    def __init__(self, parent):
+    def __init__(self, parent, al_usar_clave=None):
         super().__init__(parent)
         self.title("Crear Clave de Respuestas")
         self.geometry("800x800")  # Aumentado el tamaño inicial
@@ -45,6 +53,9 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
 
         self.generador = None
         self.total_preguntas = tk.IntVar(value=110)
+        self.texto_previa = None  # Vista previa abierta (se actualiza al escribir)
+        self.al_usar_clave = al_usar_clave  # Recibe la ClaveCompilada para calificar sin CSV
+        self._tarea_procesar = None
 
         self.crear_interfaz()
 
@@ -183,6 +194,8 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
             highlightbackground=COLORS['gris_medio'])
         self.texto_respuestas.pack(fill=tk.BOTH, expand=False,
                                    padx=15, pady=(0, 10))
+        # Procesar mientras se escribe o pega (con una pausa corta)
+        self.texto_respuestas.bind('<KeyRelease>', self._texto_modificado)
 
         # Botones de acción
         btn_frame = tk.Frame(entrada_frame, bg=COLORS['blanco'])
@@ -283,6 +296,23 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
         self.btn_generar.bind("<Enter>", on_enter_generar)
         self.btn_generar.bind("<Leave>", on_leave_generar)
 
+        # Botón Usar clave: la entrega compilada a la ventana principal, sin CSV
+        if self.al_usar_clave is not None:
+            self.btn_usar = tk.Button(
+                final_frame,
+                text="✅ Usar para Calificar",
+                command=self.usar_clave,
+                font=('Open Sans', 11, 'bold'),
+                bg=COLORS['principal'],
+                fg=COLORS['blanco'],
+                relief=tk.RAISED,
+                bd=2,
+                padx=20,
+                pady=12,
+                cursor='hand2'
+            )
+            self.btn_usar.pack(side=tk.LEFT, padx=10)
+
         # Botón Cancelar
         self.btn_cancelar = tk.Button(
             final_frame,
@@ -353,6 +383,7 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
         total = self.total_preguntas.get()
         self.generador = GeneradorClave(total_preguntas=total)
         self.actualizar_info()
+        self._actualizar_vista_previa(completa=True)
         messagebox.showinfo("✓ Inicializado",
                             f"Generador listo para {total} preguntas.")
 
@@ -364,17 +395,46 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
 
         texto = self.texto_respuestas.get("1.0", tk.END)
         num_procesadas = self.generador.establecer_respuestas_desde_texto(texto)
+        analisis = self.generador.ultimo_analisis
 
         self.actualizar_info()
-        messagebox.showinfo("✓ Procesado",
-                            f"Respuestas procesadas: {num_procesadas}\n"
-                            f"Válidas: {self.generador.contar_respuestas_validas()}")
+        self._actualizar_vista_previa()
+
+        mensaje = (f"Respuestas procesadas: {num_procesadas}\n"
+                   f"Válidas: {self.generador.contar_respuestas_validas()}")
+        if analisis['conflictos']:
+            preguntas = ", ".join(str(p) for p, _, _ in analisis['conflictos'][:10])
+            mensaje += f"\nRepetidas con distinta letra: {preguntas}"
+        if analisis['huecos']:
+            preguntas = ", ".join(str(p) for p in analisis['huecos'][:10])
+            mensaje += f"\nSin respuesta en medio: {preguntas}"
+        if analisis['fuera_de_rango']:
+            preguntas = ", ".join(str(p) for p in analisis['fuera_de_rango'][:10])
+            mensaje += f"\nFuera de rango: {preguntas}"
+        messagebox.showinfo("✓ Procesado", mensaje)
+
+    def _texto_modificado(self, event=None):
+        if self.generador is None:
+            return
+        if self._tarea_procesar is not None:
+            self.after_cancel(self._tarea_procesar)
+        self._tarea_procesar = self.after(300, self._procesar_en_vivo)
+
+    def _procesar_en_vivo(self):
+        self._tarea_procesar = None
+        if self.generador is None:
+            return
+        texto = self.texto_respuestas.get("1.0", tk.END)
+        self.generador.establecer_respuestas_desde_texto(texto)
+        self.actualizar_info()
+        self._actualizar_vista_previa()
 
     def limpiar(self):
         self.texto_respuestas.delete("1.0", tk.END)
         if self.generador:
             self.generador.limpiar_respuestas()
             self.actualizar_info()
+            self._actualizar_vista_previa(completa=True)
 
     def mostrar_vista_previa(self):
         if self.generador is None:
@@ -382,6 +442,11 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
                                    "Primero inicialice el generador.")
             return
 
+        if self.texto_previa is not None and self.texto_previa.winfo_exists():
+            self._actualizar_vista_previa(completa=True)
+            self.texto_previa.winfo_toplevel().lift()
+            return
+
         ventana = tk.Toplevel(self)
         ventana.title("Vista Previa")
         ventana.geometry("700x550")
@@ -391,10 +456,8 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
                                           font=('Courier New', 9),
                                           bg=COLORS['blanco'])
         texto.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-
-        reporte = self.generador.generar_reporte_texto()
-        texto.insert("1.0", reporte)
-        texto.config(state=tk.DISABLED)
+        self.texto_previa = texto
+        self._actualizar_vista_previa(completa=True)
 
         btn_cerrar = tk.Button(
             ventana,
@@ -411,6 +474,39 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
         )
         btn_cerrar.pack(pady=10)
 
+    def _actualizar_vista_previa(self, completa=False):
+        """
+        Actualiza la vista previa abierta. Solo se reescriben el encabezado,
+        las líneas con preguntas modificadas y el pie (faltantes y avisos).
+        """
+        texto = self.texto_previa
+        if texto is None or not texto.winfo_exists():
+            self.texto_previa = None
+            return
+
+        generador = self.generador
+        texto.config(state=tk.NORMAL)
+        if completa:
+            texto.delete("1.0", tk.END)
+            texto.insert("1.0", generador.generar_reporte_texto())
+        else:
+            encabezado = generador.encabezado_reporte()
+            for numero, linea in enumerate(encabezado, 1):
+                texto.delete(f"{numero}.0", f"{numero}.end")
+                texto.insert(f"{numero}.0", linea)
+
+            primera = len(encabezado) + 1
+            filas = {(p - 1) // RESPUESTAS_POR_LINEA for p in generador.preguntas_modificadas}
+            for fila in sorted(filas):
+                numero = primera + fila
+                texto.delete(f"{numero}.0", f"{numero}.end")
+                texto.insert(f"{numero}.0", generador.linea_respuestas(fila))
+
+            inicio_pie = primera + generador.numero_lineas_respuestas()
+            texto.delete(f"{inicio_pie}.0", tk.END)
+            texto.insert(f"{inicio_pie}.0", "\n".join(generador.pie_reporte()))
+        texto.config(state=tk.DISABLED)
+
     def actualizar_info(self):
         if self.generador is None:
             self.label_info.config(text="❌ No inicializado")
@@ -445,6 +541,9 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
 
         if filename:
             if self.generador.generar_csv(filename, formato='n.'):
+                # La clave también pasa en memoria: no hace falta volver a leer el CSV
+                if self.al_usar_clave is not None:
+                    self._entregar_clave(os.path.splitext(os.path.basename(filename))[0])
                 messagebox.showinfo("✓ Éxito",
                                     f"Archivo generado:\n{filename}")
                 self.destroy()
@@ -453,6 +552,30 @@ class VentanaGeneradorClaveModerna(tk.Toplevel):
                                      "No se pudo generar el archivo.")
 
 
+    def usar_clave(self):
+        if self.generador is None:
+            messagebox.showwarning("⚠ Advertencia",
+                                   "Primero inicialice el generador.")
+            return
+
+        if self.generador.contar_respuestas_validas() == 0:
+            messagebox.showwarning("⚠ Advertencia",
+                                   "No hay respuestas válidas.")
+            return
+
+        if self._entregar_clave(f"clave_capturada_{self.generador.total_preguntas}"):
+            self.destroy()
+
+    def _entregar_clave(self, nombre):
+        """Compila la clave del generador y la entrega a la ventana principal."""
+        clave = compilar_clave_generador(self.generador, nombre=nombre)
+        if clave is None:
+            messagebox.showerror("✗ Error", "No se pudo compilar la clave.")
+            return False
+        self.al_usar_clave(clave)
+        return True
+
+
 class SistemaCalificacionesLobatchewsky:
     """Sistema principal de calificaciones con interfaz moderna."""
 
@@ -466,7 +589,10 @@ class SistemaCalificacionesLobatchewsky:
         self.ruta_clave = tk.StringVar()
         self.ruta_respuestas = tk.StringVar()
         self.resultados = None
+        self.advertencias_datos = []  # Perfil de calidad del último archivo de respuestas
         self.procesando = False
+        self.registro_claves = RegistroClaves()
+        self.clave_memoria = None  # Clave capturada en el generador (en lugar de un CSV)
 
         # Fuentes
         self.font_titulo = ('Poppins', 14, 'bold')
@@ -575,6 +701,11 @@ class SistemaCalificacionesLobatchewsky:
                                                     padx=20, pady=(10, 5),
                                                     state=tk.DISABLED)
 
+        self.btn_equiparar = self.crear_boton_lateral(panel, "⚖️ Equiparar con Simulacro",
+                                                      self.equiparar_simulacro,
+                                                      padx=20, pady=(0, 5),
+                                                      state=tk.DISABLED)
+
         self.btn_excel = self.crear_boton_lateral(panel, "📄 Generar Excel",
                                                   self.generar_excel_consolidado,
                                                   padx=20, pady=(0, 15),
@@ -678,17 +809,84 @@ class SistemaCalificacionesLobatchewsky:
         # Frame de resultados (oculto inicialmente)
         self.frame_resultados = tk.Frame(contenido_frame, bg=COLORS['blanco'])
 
-        # Área de texto con scroll
+        # Resumen (estadísticas generales, sin el listado de alumnos)
         self.texto_resultados = scrolledtext.ScrolledText(
             self.frame_resultados,
+            height=16,
             font=('Courier New', 9),
             bg=COLORS['blanco'],
             fg=COLORS['texto_principal'],
             wrap=tk.WORD,
             relief=tk.FLAT,
             bd=0)
-        self.texto_resultados.pack(fill=tk.BOTH, expand=True,
-                                   padx=20, pady=20)
+        self.texto_resultados.pack(fill=tk.X, padx=20, pady=(20, 10))
+
+        # Tabla de alumnos
+        self.crear_tabla_resultados(self.frame_resultados)
+
+    def crear_tabla_resultados(self, parent):
+        """Crea la tabla de alumnos (se llena por páginas al hacer scroll)."""
+        filtros_frame = tk.Frame(parent, bg=COLORS['blanco'])
+        filtros_frame.pack(fill=tk.X, padx=20, pady=(0, 5))
+
+        tk.Label(filtros_frame, text="👥 Grupo:",
+                 font=self.font_normal,
+                 bg=COLORS['blanco'],
+                 fg=COLORS['principal']).pack(side=tk.LEFT)
+
+        self.filtro_grupo = tk.StringVar(value=TODOS_LOS_GRUPOS)
+        self.combo_grupo = ttk.Combobox(filtros_frame,
+                                        textvariable=self.filtro_grupo,
+                                        values=[TODOS_LOS_GRUPOS],
+                                        state='readonly',
+                                        width=25)
+        self.combo_grupo.pack(side=tk.LEFT, padx=10)
+        self.combo_grupo.bind("<<ComboboxSelected>>",
+                              lambda e: self.actualizar_tabla())
+
+        self.label_conteo = tk.Label(filtros_frame, text="",
+                                     font=('Open Sans', 9),
+                                     bg=COLORS['blanco'],
+                                     fg=COLORS['gris_oscuro'])
+        self.label_conteo.pack(side=tk.RIGHT)
+
+        tabla_frame = tk.Frame(parent, bg=COLORS['blanco'])
+        tabla_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+
+        columnas = [('pos', '#', 50),
+                    ('nombre', 'Nombre', 280),
+                    ('grupo', 'Grupo', 120),
+                    ('total', 'Total', 90),
+                    ('calificacion', 'Cal.', 80),
+                    ('porcentaje', '%', 80),
+                    ('percentil', 'Pctl.', 70)]
+
+        self.tabla = ttk.Treeview(tabla_frame,
+                                  columns=[c[0] for c in columnas],
+                                  show='headings')
+        for clave, titulo, ancho in columnas:
+            self.tabla.column(clave, width=ancho,
+                              anchor=tk.W if clave == 'nombre' else tk.CENTER)
+            if clave in COLUMNAS_ORDENABLES:
+                self.tabla.heading(clave, text=titulo,
+                                   command=lambda c=clave: self.ordenar_tabla(c))
+            else:
+                self.tabla.heading(clave, text=titulo)
+
+        self.scroll_tabla = ttk.Scrollbar(tabla_frame, orient="vertical",
+                                          command=self.tabla.yview)
+        self.tabla.configure(yscrollcommand=self._on_scroll_tabla)
+
+        self.tabla.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scroll_tabla.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Estado de la vista
+        self.indice = None
+        self.vista_actual = []
+        self.filas_cargadas = 0
+        self.carga_pendiente = False
+        self.columna_orden = 'porcentaje'
+        self.orden_descendente = True
 
     def oscurecer_color(self, color):
         """Oscurece un color hex."""
@@ -699,7 +897,22 @@ class SistemaCalificacionesLobatchewsky:
 
     def abrir_generador_clave(self):
         """Abre la ventana del generador de claves."""
-        VentanaGeneradorClaveModerna(self.root)
+        VentanaGeneradorClaveModerna(self.root, al_usar_clave=self.usar_clave_generada)
+
+    def usar_clave_generada(self, clave):
+        """Recibe la clave compilada del generador; se califica con ella sin leer CSV."""
+        # El registro es opcional: la clave se usa aunque no se pueda guardar
+        try:
+            self.registro_claves.registrar(clave, fuente='generador')
+        except Exception as e:
+            print(f"No se pudo registrar la clave capturada: {e}")
+        self.clave_memoria = clave
+        self.ruta_clave.set('')
+        self.label_clave.config(
+            text=f"✓ {clave.nombre} (capturada)",
+            fg=COLORS['blanco'])
+        self.status_label.config(
+            text=f"✓ Clave capturada: {clave.total_preguntas} preguntas")
 
     def buscar_archivo(self, tipo):
         """Busca un archivo CSV."""
@@ -714,6 +927,7 @@ class SistemaCalificacionesLobatchewsky:
 
             if tipo == 'clave':
                 self.ruta_clave.set(filename)
+                self.clave_memoria = None
                 self.label_clave.config(
                     text=f"✓ {nombre_archivo}",
                     fg=COLORS['blanco'])
@@ -731,7 +945,8 @@ class SistemaCalificacionesLobatchewsky:
         if self.procesando:
             return
 
-        if not self.ruta_clave.get() or not self.ruta_respuestas.get():
+        tiene_clave = self.clave_memoria is not None or self.ruta_clave.get()
+        if not tiene_clave or not self.ruta_respuestas.get():
             messagebox.showerror("Error",
                                  "Por favor seleccione ambos archivos")
             return
@@ -748,25 +963,29 @@ class SistemaCalificacionesLobatchewsky:
     def _procesar_thread(self):
         """Procesamiento en hilo separado."""
         try:
-            clave_df = cargar_datos(self.ruta_clave.get())
+            # La clave capturada en el generador ya viene compilada; la de CSV se
+            # compila una vez y se reutiliza mientras el archivo no cambie
+            clave = self.clave_memoria
+            if clave is None:
+                clave = self.registro_claves.clave_desde_csv(self.ruta_clave.get())
             respuestas_df = cargar_datos(self.ruta_respuestas.get())
 
-            if clave_df is None or respuestas_df is None:
+            if clave is None or respuestas_df is None:
                 self.root.after(0, self._procesar_error,
                                 "Error al cargar archivos")
                 return
 
-            valido_clave, _ = validar_estructura_csv(clave_df, es_clave=True)
-            valido_resp, _ = validar_estructura_csv(respuestas_df, es_clave=False)
+            valido_resp, self.advertencias_datos = validar_estructura_csv(respuestas_df, es_clave=False)
 
-            if not valido_clave or not valido_resp:
+            if not valido_resp:
                 self.root.after(0, self._procesar_error,
                                 "Formato de archivo incorrecto")
                 return
 
             resultados = procesar_calificaciones_google_forms(
-                clave_df, respuestas_df, MAPEO_MATERIAS,
-                COLUMNA_NOMBRE, COLUMNA_EMAIL, COLUMNA_GRUPO
+                clave, respuestas_df, MAPEO_MATERIAS,
+                COLUMNA_NOMBRE, COLUMNA_EMAIL, COLUMNA_GRUPO,
+                reglas=self.registro_claves.obtener_reglas(clave)
             )
 
             if not resultados:
@@ -774,6 +993,13 @@ class SistemaCalificacionesLobatchewsky:
                                 "No se procesaron calificaciones")
                 return
 
+            # El historial es opcional: un fallo aquí no debe afectar la calificación
+            try:
+                nombre_examen = os.path.splitext(os.path.basename(self.ruta_respuestas.get()))[0]
+                guardar_examen(resultados, nombre_examen)
+            except Exception as e:
+                print(f"No se pudo guardar el examen en el historial: {e}")
+
             self.root.after(0, self._procesar_completado, resultados)
 
         except Exception as e:
@@ -782,6 +1008,7 @@ class SistemaCalificacionesLobatchewsky:
     def _procesar_completado(self, resultados):
         """Callback cuando el procesamiento termina."""
         self.resultados = resultados
+        self.indice = IndiceResultados(resultados)
         self.procesando = False
 
         self.status_label.config(
@@ -789,10 +1016,15 @@ class SistemaCalificacionesLobatchewsky:
 
         # Habilitar botones
         self.btn_mostrar.config(state=tk.NORMAL)
+        self.btn_equiparar.config(state=tk.NORMAL)
         self.btn_excel.config(state=tk.NORMAL)
 
-        messagebox.showinfo("✓ Éxito",
-                            f"Se procesaron {len(resultados)} alumnos correctamente")
+        mensaje = f"Se procesaron {len(resultados)} alumnos correctamente"
+        if self.advertencias_datos:
+            mensaje += (f"\n\nCalidad de datos ({len(self.advertencias_datos)} advertencias):\n" +
+                        "\n".join(f"• {a}" for a in self.advertencias_datos[:5]) +
+                        "\n\nDetalle en 'Mostrar Reporte'")
+        messagebox.showinfo("✓ Éxito", mensaje)
 
     def _procesar_error(self, mensaje):
         """Callback cuando hay un error."""
@@ -809,15 +1041,79 @@ class SistemaCalificacionesLobatchewsky:
         self.frame_inicial.pack_forget()
         self.frame_resultados.pack(fill=tk.BOTH, expand=True)
 
-        # Limpiar y mostrar
+        # Limpiar y mostrar resumen
         self.texto_resultados.delete(1.0, tk.END)
 
-        # Generar reporte
         reporte = self._generar_reporte_visual()
         self.texto_resultados.insert(1.0, reporte)
 
+        # Tabla de alumnos
+        if self.indice is None:
+            self.indice = IndiceResultados(self.resultados)
+        self.combo_grupo.config(values=[TODOS_LOS_GRUPOS] + self.indice.obtener_grupos())
+        self.filtro_grupo.set(TODOS_LOS_GRUPOS)
+        self.actualizar_tabla()
+
         self.status_label.config(text="✓ Resultados mostrados")
 
+    def ordenar_tabla(self, columna):
+        """Ordena la tabla por columna (clic repetido invierte el orden)."""
+        if columna == self.columna_orden:
+            self.orden_descendente = not self.orden_descendente
+        else:
+            self.columna_orden = columna
+            self.orden_descendente = columna not in ('nombre', 'grupo')
+        self.actualizar_tabla()
+
+    def actualizar_tabla(self):
+        """Reinicia la tabla con la vista actual y carga la primera página."""
+        if self.indice is None:
+            return
+
+        grupo = self.filtro_grupo.get()
+        self.vista_actual = self.indice.obtener_vista(self.columna_orden,
+                                                      self.orden_descendente,
+                                                      grupo)
+        self.tabla.delete(*self.tabla.get_children())
+        self.filas_cargadas = 0
+        self._cargar_pagina_tabla()
+        self.tabla.yview_moveto(0)
+
+        self.label_conteo.config(
+            text=f"{len(self.vista_actual)} de {len(self.indice)} alumnos")
+
+    def _cargar_pagina_tabla(self):
+        """Inserta la siguiente página de filas en la tabla."""
+        inicio = self.filas_cargadas
+        pagina = self.indice.obtener_pagina(self.vista_actual, inicio,
+                                            TAMANIO_PAGINA_TABLA)
+
+        # Posición y percentil ya calculados: globales, o del grupo si se filtra por uno
+        en_grupo = self.combo_grupo.get() not in ('', TODOS_LOS_GRUPOS)
+        sufijo = '_grupo' if en_grupo else ''
+        for resultado in pagina:
+            ranking = resultado['ranking']
+            self.tabla.insert('', tk.END, values=(
+                ranking['posicion' + sufijo],
+                resultado['nombre'],
+                resultado.get('grupo', ''),
+                f"{resultado['total_aciertos']}/{resultado['total_preguntas']}",
+                f"{resultado['calificacion_global']:.2f}",
+                f"{resultado['porcentaje_global']:.1f}%",
+                f"{ranking['percentil' + sufijo]:.1f}"
+            ))
+
+        self.filas_cargadas += len(pagina)
+        self.carga_pendiente = False
+
+    def _on_scroll_tabla(self, primero, ultimo):
+        """Carga más filas cuando el scroll se acerca al final."""
+        self.scroll_tabla.set(primero, ultimo)
+        if (float(ultimo) > 0.9 and not self.carga_pendiente
+                and self.filas_cargadas < len(self.vista_actual)):
+            self.carga_pendiente = True
+            self.root.after_idle(self._cargar_pagina_tabla)
+
     def _generar_reporte_visual(self):
         """Genera un reporte visual de los resultados."""
         lineas = []
@@ -850,11 +1146,15 @@ class SistemaCalificacionesLobatchewsky:
 
         lineas.append("📈 DISTRIBUCIÓN DE CALIFICACIONES")
         lineas.append("-" * 90)
-        lineas.append(f"  Excelente (90-100%):      {excelente:3d} {'█' * (excelente * 3)}")
-        lineas.append(f"  Muy bien (80-89%):        {muy_bien:3d} {'█' * (muy_bien * 3)}")
-        lineas.append(f"  Bien (70-79%):            {bien:3d} {'█' * (bien * 3)}")
-        lineas.append(f"  Regular (60-69%):         {regular:3d} {'█' * (regular * 3)}")
-        lineas.append(f"  Necesita mejorar (<60%):  {necesita:3d} {'█' * (necesita * 3)}")
+        # Barras proporcionales al total (no crecen con el número de alumnos)
+        total_alumnos = len(self.resultados)
+        for etiqueta, cantidad in [("Excelente (90-100%):     ", excelente),
+                                   ("Muy bien (80-89%):       ", muy_bien),
+                                   ("Bien (70-79%):           ", bien),
+                                   ("Regular (60-69%):        ", regular),
+                                   ("Necesita mejorar (<60%): ", necesita)]:
+            barra = self._crear_barra_ascii(cantidad / total_alumnos * 100, 40)
+            lineas.append(f"  {etiqueta} {cantidad:5d} {barra}")
         lineas.append("")
 
         # Promedio por materia
@@ -865,23 +1165,14 @@ class SistemaCalificacionesLobatchewsky:
             lineas.append(f"  {materia:20s} {datos['promedio']:6.2f}% {barra}")
         lineas.append("")
 
-        # Detalles por alumno
-        lineas.append("👥 CALIFICACIONES POR ALUMNO")
-        lineas.append("-" * 90)
-        lineas.append(f"  {'#':<4} {'Nombre':<30} {'Grupo':<10} {'Total':<10} {'Cal.':<8} {'%':<8}")
-        lineas.append("-" * 90)
-
-        for idx, resultado in enumerate(sorted(self.resultados,
-                                               key=lambda x: x['porcentaje_global'],
-                                               reverse=True), 1):
-            nombre = resultado['nombre'][:28]
-            grupo = str(resultado.get('grupo', ''))[:8]
-            total = f"{resultado['total_aciertos']}/{resultado['total_preguntas']}"
-            cal = f"{resultado['calificacion_global']:.2f}"
-            porc = f"{resultado['porcentaje_global']:.1f}%"
-
-            lineas.append(f"  {idx:<4} {nombre:<30} {grupo:<10} {total:<10} {cal:<8} {porc:<8}")
+        if self.advertencias_datos:
+            lineas.append("🩺 CALIDAD DE DATOS")
+            lineas.append("-" * 90)
+            for advertencia in self.advertencias_datos:
+                lineas.append(f"  ⚠ {advertencia}")
+            lineas.append("")
 
+        lineas.append("👥 Calificaciones por alumno: ver tabla inferior")
         lineas.append("=" * 90)
 
         return "\n".join(lineas)
@@ -891,6 +1182,45 @@ class SistemaCalificacionesLobatchewsky:
         lleno = int(porcentaje / 100 * longitud)
         return f"[{'█' * lleno}{' ' * (longitud - lleno)}]"
 
+    def equiparar_simulacro(self):
+        """Equipara los porcentajes con los de otro simulacro guardado en el historial."""
+        if not self.resultados:
+            messagebox.showwarning("Advertencia",
+                                   "Primero procese las calificaciones")
+            return
+
+        actual = os.path.splitext(os.path.basename(self.ruta_respuestas.get()))[0]
+        try:
+            examenes = [nombre for nombre in listar_examenes()['nombre'] if nombre != actual]
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo leer el historial:\n{str(e)}")
+            return
+
+        if not examenes:
+            messagebox.showinfo("Equiparar",
+                                "No hay otros simulacros guardados en el historial")
+            return
+
+        nombre = simpledialog.askstring(
+            "Equiparar con Simulacro",
+            "Simulacro de referencia (últimos guardados):\n\n" +
+            "\n".join(f"• {n}" for n in examenes[-10:]),
+            initialvalue=examenes[-1], parent=self.root)
+        if not nombre:
+            return
+
+        referencia = distribucion_examen(nombre.strip())
+        if referencia is None:
+            messagebox.showerror("Error", f"No se encontró el simulacro '{nombre}' en el historial")
+            return
+
+        equiparar_resultados(self.resultados, referencia)
+        self.status_label.config(text=f"✅ Equiparado con {referencia.nombre}")
+        messagebox.showinfo("✓ Equiparado",
+                            f"Porcentajes equiparados a la escala de {referencia.nombre} "
+                            f"(media {referencia.media:.1f}%, desviación {referencia.desviacion:.1f}).\n\n"
+                            "El Excel incluirá las columnas Z, T y % Equiparado.")
+
     def generar_excel_consolidado(self):
         """Genera el reporte Excel consolidado."""
         if not self.resultados:
@@ -922,6 +1252,9 @@ class SistemaCalificacionesLobatchewsky:
                                     "• Hojas por Grupo\n"
                                     "• Análisis de Errores\n"
                                     "• Preguntas Difíciles\n"
+                                    "• Análisis de Ítems\n"
+                                    "• Confiabilidad por Materia\n"
+                                    "• Perfiles de Error\n"
                                     "• Matriz Visual")
 
             except Exception as e:
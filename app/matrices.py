@@ -0,0 +1,325 @@
+# app/matrices.py
+"""
+Representaciones matriciales de los resultados de calificación.
+Convierte las listas por alumno (aciertos, errores, sin_responder)
+en una matriz alumno x pregunta para procesarla con numpy, y define
+la codificación de las respuestas crudas (A-E) que guarda el calificador.
+
+La clave se guarda además como máscara de 5 bits por pregunta (bit c =
+se acepta la opción c), para aceptar varias respuestas en una pregunta.
+"""
+
+import re
+from itertools import chain
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+# Estados por pregunta (mismo significado que el CSV de errores: 0=correcta, 1=incorrecta)
+ESTADO_ACIERTO = 0
+ESTADO_ERROR = 1
+ESTADO_SIN_RESPONDER = 2
+ESTADO_NO_CALIFICADA = 3  # La pregunta no está en la clave
+
+# Códigos de respuesta: A-E -> 0-4 (índice en OPCIONES)
+OPCIONES = ['A', 'B', 'C', 'D', 'E']
+CODIGO_VACIA = 5  # Sin responder (o pregunta sin columna / fuera de la clave)
+CODIGO_INVALIDA = 6  # Respondida con algo distinto de A-E (cuenta como error)
+TOTAL_CODIGOS = 7
+
+_CODIGOS_OPCION = {opcion: codigo for codigo, opcion in enumerate(OPCIONES)}
+
+# Máscaras de la clave: bit c = se acepta la opción c; 0 = pregunta no calificada
+MASCARA_NO_CALIFICADA = 0
+
+# Bit de cada código de respuesta (VACIA e INVALIDA caen fuera de los 5 bits de la máscara)
+_BIT_CODIGO = np.array([1 << codigo for codigo in range(TOTAL_CODIGOS)], dtype=np.uint8)
+
+# Opción más baja aceptada por cada máscara (CODIGO_VACIA para 0)
+_CODIGO_PRINCIPAL = np.array([CODIGO_VACIA] + [(m & -m).bit_length() - 1 for m in range(1, 32)],
+                             dtype=np.uint8)
+
+# Varias opciones en una celda de la clave: "B/D", "B D", "B|D", "B+D" ("B, D" llega como "B D";
+# ver data_loader.limpiar_respuesta_clave). Sin separador ("BD", "BAD") es un error de captura.
+_PATRON_VARIAS_OPCIONES = re.compile(r'[A-E](?:\s*[/|&+]\s*[A-E]|\s+[A-E])*')
+
+
+def codificar_respuesta(respuesta: str) -> int:
+    """Convierte una respuesta ya limpia (limpiar_respuesta) en su código."""
+    if not respuesta:
+        return CODIGO_VACIA
+    return _CODIGOS_OPCION.get(respuesta, CODIGO_INVALIDA)
+
+
+def mascara_respuesta(respuesta: str) -> int:
+    """
+    Máscara de las opciones de una respuesta de la clave ya limpia ('B/D' -> 0b01010).
+    0 si no es válida, incluso si repite una letra ('B/B').
+    """
+    if not respuesta or not _PATRON_VARIAS_OPCIONES.fullmatch(respuesta):
+        return MASCARA_NO_CALIFICADA
+    mascara = 0
+    for letra in respuesta:
+        if letra in _CODIGOS_OPCION:
+            bit = 1 << _CODIGOS_OPCION[letra]
+            if mascara & bit:
+                return MASCARA_NO_CALIFICADA
+            mascara |= bit
+    return mascara
+
+
+def letras_mascara(mascara: int) -> str:
+    """Opciones aceptadas como texto: 0b01010 -> 'B/D'."""
+    return '/'.join(opcion for codigo, opcion in enumerate(OPCIONES) if mascara >> codigo & 1)
+
+
+def mascaras_desde_codigos(clave: np.ndarray) -> np.ndarray:
+    """Máscaras de una clave de una sola respuesta por pregunta."""
+    clave = np.asarray(clave)
+    return np.where(clave < len(OPCIONES), _BIT_CODIGO[np.minimum(clave, TOTAL_CODIGOS - 1)],
+                    MASCARA_NO_CALIFICADA).astype(np.uint8)
+
+
+def codigos_principales(mascaras: np.ndarray) -> np.ndarray:
+    """Código de la opción más baja aceptada en cada pregunta (CODIGO_VACIA si no se califica)."""
+    return _CODIGO_PRINCIPAL[np.asarray(mascaras) & 0b11111]
+
+
+class ResultadosCalificacion(list):
+    """
+    Lista de resultados por alumno (igual que antes) que además conserva
+    las respuestas codificadas y la clave, más una caché para los cálculos
+    derivados (matriz de estados, análisis de ítems, etc.).
+
+    La caché asume que la lista no se modifica después de calificar.
+    """
+
+    def __init__(self, alumnos=(), matriz_respuestas: Optional[np.ndarray] = None,
+                 clave: Optional[np.ndarray] = None, mascaras: Optional[np.ndarray] = None):
+        super().__init__(alumnos)
+        self.matriz_respuestas = matriz_respuestas  # alumnos x preguntas, códigos uint8
+        self.clave = clave  # código correcto por pregunta (CODIGO_VACIA = no calificada)
+        if mascaras is None and clave is not None:
+            mascaras = mascaras_desde_codigos(clave)
+        self.mascaras = mascaras  # opciones aceptadas por pregunta (ver mascara_respuesta)
+        self.cache: Dict[str, Any] = {}
+
+
+def obtener_cache(resultados: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Devuelve la caché de los resultados, o None si es una lista simple."""
+    return getattr(resultados, 'cache', None)
+
+
+def tiene_respuestas(resultados: List[Dict[str, Any]]) -> bool:
+    """Indica si los resultados conservan las respuestas codificadas."""
+    return getattr(resultados, 'matriz_respuestas', None) is not None
+
+
+def ancho_examen(resultados: List[Dict[str, Any]]) -> int:
+    """Número de la última pregunta presente en los resultados."""
+    if tiene_respuestas(resultados):
+        return resultados.matriz_respuestas.shape[1]
+
+    maximo = 0
+    for r in resultados:
+        for llave in ('aciertos', 'errores', 'sin_responder'):
+            if r['estadisticas'][llave]:
+                maximo = max(maximo, max(r['estadisticas'][llave]))
+    return maximo
+
+
+def construir_matriz_estado(resultados: List[Dict[str, Any]],
+                            total_preguntas: Optional[int] = None) -> np.ndarray:
+    """
+    Construye la matriz de estados (alumnos x preguntas, uint8).
+    La columna j corresponde a la pregunta j + 1.
+
+    Args:
+        resultados: Lista de resultados de alumnos
+        total_preguntas: Número de columnas (por defecto, 'total_preguntas' del primer alumno)
+
+    Returns:
+        Matriz con valores ESTADO_*
+    """
+    if total_preguntas is None:
+        total_preguntas = resultados[0]['total_preguntas'] if resultados else 0
+
+    num_alumnos = len(resultados)
+    matriz = np.full((num_alumnos, total_preguntas), ESTADO_NO_CALIFICADA, dtype=np.uint8)
+
+    # Se aplica en orden inverso de prioridad: acierto > error > sin responder
+    for estado, llave in ((ESTADO_SIN_RESPONDER, 'sin_responder'),
+                          (ESTADO_ERROR, 'errores'),
+                          (ESTADO_ACIERTO, 'aciertos')):
+        listas = [r['estadisticas'][llave] for r in resultados]
+        largos = np.fromiter(map(len, listas), dtype=np.int64, count=num_alumnos)
+        filas = np.repeat(np.arange(num_alumnos), largos)
+        columnas = np.fromiter(chain.from_iterable(listas), dtype=np.int64,
+                               count=int(largos.sum())) - 1
+
+        dentro = (columnas >= 0) & (columnas < total_preguntas)
+        matriz[filas[dentro], columnas[dentro]] = estado
+
+    return matriz
+
+
+def calcular_matriz_estado(matriz_respuestas: np.ndarray, clave: np.ndarray,
+                           mascaras: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calcula los estados directamente desde las respuestas codificadas y la clave.
+    Con mascaras, una respuesta es acierto si su bit está en la máscara de la
+    pregunta ((1 << código) & máscara), así que varias respuestas aceptadas no
+    cuestan nada extra.
+    """
+    if mascaras is None:
+        mascaras = mascaras_desde_codigos(clave)
+    acierto = (_BIT_CODIGO[matriz_respuestas] & mascaras) != 0
+    estado = np.where(acierto, ESTADO_ACIERTO, ESTADO_ERROR).astype(np.uint8)
+    estado[matriz_respuestas == CODIGO_VACIA] = ESTADO_SIN_RESPONDER
+    estado[:, mascaras == MASCARA_NO_CALIFICADA] = ESTADO_NO_CALIFICADA
+    return estado
+
+
+def obtener_matriz_estado(resultados: List[Dict[str, Any]],
+                          total_preguntas: Optional[int] = None) -> np.ndarray:
+    """
+    Igual que construir_matriz_estado, pero usa las respuestas codificadas
+    y la caché cuando los resultados vienen del calificador.
+    """
+    if total_preguntas is None:
+        total_preguntas = resultados[0]['total_preguntas'] if resultados else 0
+
+    if not tiene_respuestas(resultados):
+        return construir_matriz_estado(resultados, total_preguntas)
+
+    cache = obtener_cache(resultados)
+    if 'matriz_estado' not in cache:
+        cache['matriz_estado'] = calcular_matriz_estado(resultados.matriz_respuestas, resultados.clave,
+                                                        resultados.mascaras)
+    matriz = cache['matriz_estado']
+
+    ancho = matriz.shape[1]
+    if total_preguntas <= ancho:
+        return matriz[:, :total_preguntas]
+
+    relleno = np.full((matriz.shape[0], total_preguntas - ancho), ESTADO_NO_CALIFICADA, dtype=np.uint8)
+    return np.hstack([matriz, relleno])
+
+
+# Máscaras de estado empaquetado: cada estado ocupa 2 bits repartidos en dos
+# planos de bits (bit bajo y bit alto de ESTADO_*), 8 preguntas por byte.
+# Bits encendidos de cada byte (np.bitwise_count solo existe desde numpy 2.0)
+_BITS_POR_BYTE = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def contar_bits(bits: np.ndarray) -> np.ndarray:
+    """Bits encendidos de cada elemento de un arreglo uint8."""
+    return _BITS_POR_BYTE[np.asarray(bits, dtype=np.uint8)]
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    """Cuenta de bits encendidos por fila de una matriz uint8."""
+    return contar_bits(bits).sum(axis=1, dtype=np.int64)
+
+
+class EstadosEmpaquetados:
+    """
+    Matriz de estados empaquetada a 2 bits por pregunta.
+
+    Se guarda como dos planos de bits (alumnos x ceil(preguntas/8), uint8):
+    `bajo` con el bit 0 del estado y `alto` con el bit 1. Así
+    ACIERTO=00, ERROR=01, SIN_RESPONDER=10 y NO_CALIFICADA=11; los bits
+    de relleno del último byte quedan como NO_CALIFICADA y no cuentan
+    en ningún total. Un examen de 110 preguntas ocupa 28 bytes por alumno.
+
+    El ahorro de memoria es del caché de los resultados y del historial: cada
+    resultado sigue trayendo sus listas de preguntas (estadisticas y
+    preguntas_* por materia), que leen los reportes y los consumidores externos.
+    """
+
+    def __init__(self, bajo: np.ndarray, alto: np.ndarray, total_preguntas: int):
+        self.bajo = bajo
+        self.alto = alto
+        self.total_preguntas = total_preguntas
+
+    @classmethod
+    def desde_matriz(cls, estado: np.ndarray) -> 'EstadosEmpaquetados':
+        """Empaqueta una matriz de estados (alumnos x preguntas, valores ESTADO_*)."""
+        estado = np.asarray(estado, dtype=np.uint8)
+        num_alumnos, total_preguntas = estado.shape
+        ancho = -(-total_preguntas // 8) * 8
+        if ancho != total_preguntas:
+            relleno = np.full((num_alumnos, ancho - total_preguntas), ESTADO_NO_CALIFICADA, dtype=np.uint8)
+            estado = np.hstack([estado, relleno])
+        bajo = np.packbits(estado & 1, axis=1)
+        alto = np.packbits(estado >> 1, axis=1)
+        return cls(bajo, alto, total_preguntas)
+
+    @classmethod
+    def desde_bytes(cls, filas: List[bytes], total_preguntas: int) -> 'EstadosEmpaquetados':
+        """Reconstruye los estados desde los bytes de cada fila (ver fila_bytes)."""
+        bytes_plano = -(-total_preguntas // 8)
+        datos = np.frombuffer(b''.join(filas), dtype=np.uint8).reshape(len(filas), 2 * bytes_plano)
+        return cls(datos[:, :bytes_plano].copy(), datos[:, bytes_plano:].copy(), total_preguntas)
+
+    def __len__(self) -> int:
+        return self.bajo.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.bajo.nbytes + self.alto.nbytes
+
+    def fila_bytes(self, posicion: int) -> bytes:
+        """Bytes de un alumno (plano bajo seguido del alto), para guardarlos."""
+        return self.bajo[posicion].tobytes() + self.alto[posicion].tobytes()
+
+    def a_matriz(self) -> np.ndarray:
+        """Desempaqueta a la matriz de estados (alumnos x preguntas, uint8)."""
+        bajo = np.unpackbits(self.bajo, axis=1, count=self.total_preguntas)
+        alto = np.unpackbits(self.alto, axis=1, count=self.total_preguntas)
+        return bajo | (alto << 1)
+
+    def bits_estado(self, estado: int) -> np.ndarray:
+        """Plano de bits de las preguntas con el estado indicado."""
+        bajo = self.bajo if estado & 1 else ~self.bajo
+        alto = self.alto if estado & 2 else ~self.alto
+        return bajo & alto
+
+    def totales(self) -> Dict[str, np.ndarray]:
+        """Aciertos, errores y sin responder de cada alumno."""
+        return {
+            'aciertos': _popcount(self.bits_estado(ESTADO_ACIERTO)),
+            'errores': _popcount(self.bits_estado(ESTADO_ERROR)),
+            'sin_responder': _popcount(self.bits_estado(ESTADO_SIN_RESPONDER)),
+        }
+
+    def mascara(self, preguntas: List[int]) -> np.ndarray:
+        """Máscara empaquetada con las preguntas indicadas (numeradas desde 1)."""
+        bits = np.zeros(self.bajo.shape[1] * 8, dtype=np.uint8)
+        indices = np.asarray([p - 1 for p in preguntas if 1 <= p <= self.total_preguntas], dtype=np.int64)
+        bits[indices] = 1
+        return np.packbits(bits)
+
+    def conteos_por_materia(self, preguntas_por_materia: Dict[str, List[int]],
+                            estado: int = ESTADO_ACIERTO) -> Dict[str, np.ndarray]:
+        """Cuenta por alumno de preguntas con el estado indicado en cada materia."""
+        bits = self.bits_estado(estado)
+        return {materia: _popcount(bits & self.mascara(preguntas))
+                for materia, preguntas in preguntas_por_materia.items()}
+
+
+def obtener_estados_empaquetados(resultados: List[Dict[str, Any]],
+                                 total_preguntas: Optional[int] = None) -> EstadosEmpaquetados:
+    """Estados empaquetados de los resultados (en caché si vienen del calificador)."""
+    if total_preguntas is None:
+        total_preguntas = ancho_examen(resultados)
+
+    cache = obtener_cache(resultados)
+    llave = ('estados_empaquetados', total_preguntas)
+    if cache is not None and llave in cache:
+        return cache[llave]
+
+    empaquetados = EstadosEmpaquetados.desde_matriz(obtener_matriz_estado(resultados, total_preguntas))
+    if cache is not None:
+        cache[llave] = empaquetados
+    return empaquetados
@@ -3,6 +3,7 @@ import pandas as pd
 from typing import List, Dict, Any
 from datetime import datetime
 from collections import defaultdict
+from rankings import asegurar_rankings, ordenar_por_posicion
 
 
 def agrupar_por_grupo(resultados: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
@@ -117,6 +118,7 @@ def generar_excel_metricas_grupos(resultados: List[Dict[str, Any]], ruta_salida:
         from openpyxl.utils import get_column_letter
 
         # Agrupar resultados
+        asegurar_rankings(resultados)
         grupos = agrupar_por_grupo(resultados)
         print(f"\nGrupos encontrados: {list(grupos.keys())}")
 
@@ -272,7 +274,7 @@ def generar_excel_metricas_grupos(resultados: List[Dict[str, Any]], ruta_salida:
                 cell.font = font_header
 
             row += 1
-            for alumno in sorted(alumnos, key=lambda x: x['total_aciertos'], reverse=True):
+            for alumno in ordenar_por_posicion(alumnos):
                 ws_grupo.cell(row, 1, alumno['nombre'])
                 ws_grupo.cell(row, 2, alumno.get('email', ''))
                 ws_grupo.cell(row, 3, alumno['total_aciertos'])
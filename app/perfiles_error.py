@@ -0,0 +1,215 @@
+# app/perfiles_error.py
+"""
+Perfiles de error: agrupa a los alumnos que fallan los mismos temas para
+armar grupos de regularización. Cada alumno se describe con su vector de
+fallos (por materia o por pregunta) y se agrupa con k-means por
+mini-lotes, que escala a decenas de miles de alumnos en un solo núcleo.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import MAPEO_MATERIAS
+from matrices import (obtener_matriz_estado, obtener_cache, ancho_examen,
+                      ESTADO_ERROR, ESTADO_SIN_RESPONDER, ESTADO_NO_CALIFICADA)
+
+NUM_PERFILES = 6
+TAMANIO_LOTE = 1024
+ITERACIONES = 100
+
+# Un tema es débil en un perfil si su tasa de fallo supera a la general por este margen,
+# descontando el nivel general del perfil (así un perfil bajo en todo no marca todos los temas)
+MARGEN_TEMA_DEBIL = 0.10
+MAXIMO_TEMAS_DEBILES = 3
+
+# Alumnos por bloque al asignar todos los alumnos a su centroide
+_BLOQUE_ASIGNACION = 8192
+
+
+def matriz_fallos(resultados: List[Dict[str, Any]], nivel: str = 'materia',
+                  mapeo_materias: Optional[Dict[str, range]] = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    Vector de fallos (incorrecta o sin responder) de cada alumno.
+
+    Args:
+        nivel: 'materia' (fracción de fallos por materia) o 'pregunta' (0/1 por pregunta calificada)
+
+    Returns:
+        (matriz alumnos x temas en float32, nombre de cada tema)
+    """
+    if mapeo_materias is None:
+        mapeo_materias = MAPEO_MATERIAS
+
+    estado = obtener_matriz_estado(resultados, ancho_examen(resultados))
+    calificada = (estado != ESTADO_NO_CALIFICADA).any(axis=0)
+    fallos = ((estado == ESTADO_ERROR) | (estado == ESTADO_SIN_RESPONDER)).astype(np.float32)
+
+    if nivel == 'pregunta':
+        columnas = np.flatnonzero(calificada)
+        return fallos[:, columnas], [f"P{c + 1}" for c in columnas]
+
+    # Pertenencia pregunta -> materia (solo preguntas calificadas), para sumar en un producto
+    nombres = []
+    pertenencia = []
+    for materia, rango in mapeo_materias.items():
+        columna = np.zeros(estado.shape[1], dtype=np.float32)
+        preguntas = np.array([p - 1 for p in rango if 0 < p <= estado.shape[1]], dtype=np.int64)
+        columna[preguntas] = 1
+        columna[~calificada] = 0
+        if columna.any():
+            nombres.append(materia)
+            pertenencia.append(columna / columna.sum())
+    if not pertenencia:
+        return np.zeros((len(resultados), 0), dtype=np.float32), []
+
+    return fallos @ np.stack(pertenencia, axis=1), nombres
+
+
+def _distancias(datos: np.ndarray, centroides: np.ndarray) -> np.ndarray:
+    """Distancia euclidiana al cuadrado de cada fila a cada centroide."""
+    return ((datos ** 2).sum(axis=1)[:, None] - 2 * datos @ centroides.T
+            + (centroides ** 2).sum(axis=1)[None, :])
+
+
+def _iniciar_centroides(datos: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Inicialización k-means++ sobre una muestra de los datos. Si la muestra
+    tiene menos de k puntos distintos devuelve menos centroides, para no
+    repetir semillas.
+    """
+    muestra = datos[rng.choice(len(datos), size=min(len(datos), 20 * TAMANIO_LOTE), replace=False)]
+    centroides = [muestra[rng.integers(len(muestra))]]
+    distancia = ((muestra - centroides[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = distancia.sum()
+        if total <= 0:
+            break
+        indice = rng.choice(len(muestra), p=distancia / total)
+        centroides.append(muestra[indice])
+        distancia = np.minimum(distancia, ((muestra - muestra[indice]) ** 2).sum(axis=1))
+    return np.array(centroides, dtype=np.float32)
+
+
+def asignar_centroides(datos: np.ndarray, centroides: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Centroide más cercano de cada fila e inercia total (por bloques)."""
+    etiquetas = np.empty(len(datos), dtype=np.int64)
+    inercia = 0.0
+    for inicio in range(0, len(datos), _BLOQUE_ASIGNACION):
+        distancias = _distancias(datos[inicio:inicio + _BLOQUE_ASIGNACION], centroides)
+        etiquetas[inicio:inicio + _BLOQUE_ASIGNACION] = distancias.argmin(axis=1)
+        inercia += float(np.maximum(distancias.min(axis=1), 0).sum())
+    return etiquetas, inercia
+
+
+def kmeans_minilotes(datos: np.ndarray, k: int, tamanio_lote: int = TAMANIO_LOTE,
+                     iteraciones: int = ITERACIONES, semilla: int = 0
+                     ) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    K-means por mini-lotes (Sculley, 2010): en cada iteración se asigna un lote
+    aleatorio y cada centroide se mueve hacia sus puntos con tasa 1/conteo.
+
+    Returns:
+        (centroides k x d, etiqueta de cada fila, inercia)
+    """
+    datos = np.asarray(datos, dtype=np.float32)
+    rng = np.random.default_rng(semilla)
+    k = max(1, min(k, len(datos)))
+
+    centroides = _iniciar_centroides(datos, k, rng)
+    k = len(centroides)
+    conteos = np.zeros(k, dtype=np.float64)
+    tamanio_lote = min(tamanio_lote, len(datos))
+
+    for _ in range(iteraciones):
+        lote = datos[rng.choice(len(datos), size=tamanio_lote, replace=False)]
+        etiquetas_lote = _distancias(lote, centroides).argmin(axis=1)
+
+        # Sumas por centroide del lote; equivale a aplicar la tasa 1/conteo punto por punto
+        en_lote = np.bincount(etiquetas_lote, minlength=k).astype(np.float64)
+        sumas = np.zeros_like(centroides, dtype=np.float64)
+        np.add.at(sumas, etiquetas_lote, lote)
+        conteos += en_lote
+        movidos = en_lote > 0
+        tasa = (en_lote[movidos] / conteos[movidos])[:, None]
+        centroides[movidos] = ((1 - tasa) * centroides[movidos]
+                               + tasa * sumas[movidos] / en_lote[movidos][:, None])
+
+    etiquetas, inercia = asignar_centroides(datos, centroides)
+    return centroides, etiquetas, inercia
+
+
+def calcular_perfiles_error(resultados: List[Dict[str, Any]], num_perfiles: int = NUM_PERFILES,
+                            nivel: str = 'materia', semilla: int = 0
+                            ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Agrupa a los alumnos por su perfil de fallos.
+
+    Returns:
+        (resumen por perfil, asignación de cada alumno)
+        Los perfiles se numeran de menor a mayor tasa de fallo media; el
+        resumen incluye los temas débiles (ver MARGEN_TEMA_DEBIL) y la tasa
+        de fallo (%) del centroide en cada tema.
+    """
+    if not resultados:
+        return pd.DataFrame(), pd.DataFrame()
+
+    fallos, temas = matriz_fallos(resultados, nivel)
+    if not temas:
+        return pd.DataFrame(), pd.DataFrame()
+
+    centroides, etiquetas, _ = kmeans_minilotes(fallos, num_perfiles, semilla=semilla)
+
+    # Renumerar: perfil 1 = menos fallos; los centroides sin alumnos se descartan
+    con_alumnos = np.flatnonzero(np.bincount(etiquetas, minlength=len(centroides)))
+    orden = con_alumnos[np.argsort(centroides[con_alumnos].mean(axis=1), kind='stable')]
+    renumerar = np.zeros(len(centroides), dtype=np.int64)
+    renumerar[orden] = np.arange(1, len(orden) + 1)
+    centroides = centroides[orden]
+    etiquetas = renumerar[etiquetas]
+
+    alumnos = np.bincount(etiquetas, minlength=len(orden) + 1)[1:]
+    tasa_general = fallos.mean(axis=0)
+
+    filas = []
+    for indice, centroide in enumerate(centroides):
+        # Exceso de fallo en cada tema descontando el nivel general del perfil
+        nivel_perfil = float(centroide.mean() - tasa_general.mean())
+        exceso = centroide - tasa_general - nivel_perfil
+        debiles = [temas[t] for t in np.argsort(-exceso, kind='stable')[:MAXIMO_TEMAS_DEBILES]
+                   if exceso[t] >= MARGEN_TEMA_DEBIL]
+        if debiles:
+            descripcion = ', '.join(debiles)
+        elif nivel_perfil >= MARGEN_TEMA_DEBIL:
+            descripcion = 'Bajo en todos los temas'
+        else:
+            descripcion = 'Ninguno destacado'
+        fila = {'Perfil': indice + 1, 'Alumnos': int(alumnos[indice]),
+                'Fallo_Medio': round(float(centroide.mean()) * 100, 1),
+                'Temas_Debiles': descripcion}
+        fila.update({tema: round(float(valor) * 100, 1) for tema, valor in zip(temas, centroide)})
+        filas.append(fila)
+    resumen = pd.DataFrame(filas)
+
+    asignacion = pd.DataFrame({
+        'Nombre': [r['nombre'] for r in resultados],
+        'Email': [r.get('email', '') for r in resultados],
+        'Grupo': [r.get('grupo', '') for r in resultados],
+        'Perfil': etiquetas,
+        'Porcentaje': [r['porcentaje_global'] for r in resultados],
+    })
+    asignacion = asignacion.sort_values(['Perfil', 'Grupo', 'Nombre'], kind='stable', ignore_index=True)
+
+    return resumen, asignacion
+
+
+def obtener_perfiles_error(resultados: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Perfiles por materia con los valores por defecto, reutilizando la caché de los resultados."""
+    cache = obtener_cache(resultados)
+    if cache is None:
+        return calcular_perfiles_error(resultados)
+
+    if 'perfiles_error' not in cache:
+        cache['perfiles_error'] = calcular_perfiles_error(resultados)
+    return cache['perfiles_error']
@@ -0,0 +1,146 @@
+# app/rankings.py
+"""
+Posiciones y percentiles de los alumnos: en toda la generación, dentro de
+su grupo y por materia. Cada clasificación sale de un solo ordenamiento
+(lexsort por partición y puntaje) y se guarda en cada resultado, así que
+los reportes leen la posición en lugar de volver a ordenar.
+
+Empates: la posición de competencia comparte lugar y salta (1, 2, 2, 4),
+la densa no salta (1, 2, 2, 3) y el percentil cuenta los empates a la mitad
+(igual que longitudinal.calcular_percentiles).
+"""
+
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+def calcular_rangos(puntajes: np.ndarray, particion: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Posiciones (mayor puntaje = 1) dentro de cada partición.
+
+    Args:
+        puntajes: Puntaje de cada alumno
+        particion: Índice de partición de cada alumno (None = todos juntos)
+
+    Returns:
+        {'competencia', 'densa', 'percentil'} en el orden original
+    """
+    puntajes = np.asarray(puntajes, dtype=np.float64)
+    n = len(puntajes)
+    if particion is None:
+        particion = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        vacio = np.zeros(0, dtype=np.int64)
+        return {'competencia': vacio, 'densa': vacio, 'percentil': np.zeros(0)}
+
+    # Orden por partición y puntaje descendente (estable: los empates quedan en orden original)
+    orden = np.lexsort((-puntajes, particion))
+    p_ord = particion[orden]
+    s_ord = puntajes[orden]
+
+    posiciones = np.arange(n)
+    nueva_particion = np.ones(n, dtype=bool)
+    nueva_particion[1:] = p_ord[1:] != p_ord[:-1]
+    nuevo_valor = nueva_particion.copy()
+    nuevo_valor[1:] |= s_ord[1:] != s_ord[:-1]
+
+    inicio_particion = np.maximum.accumulate(np.where(nueva_particion, posiciones, 0))
+    inicio_valor = np.maximum.accumulate(np.where(nuevo_valor, posiciones, 0))
+
+    id_particion = np.cumsum(nueva_particion) - 1
+    id_valor = np.cumsum(nuevo_valor) - 1
+    tamanio_particion = np.bincount(id_particion)[id_particion]
+    empatados = np.bincount(id_valor)[id_valor]
+
+    competencia = inicio_valor - inicio_particion + 1
+    densa = id_valor - id_valor[inicio_particion] + 1
+    menores = tamanio_particion - (competencia - 1) - empatados
+    percentil = 100.0 * (menores + 0.5 * empatados) / tamanio_particion
+
+    resultado = {}
+    for nombre, valores in (('competencia', competencia), ('densa', densa), ('percentil', percentil)):
+        en_orden_original = np.empty_like(valores)
+        en_orden_original[orden] = valores
+        resultado[nombre] = en_orden_original
+    return resultado
+
+
+def _nombre_grupo(resultado: Dict[str, Any]) -> str:
+    """Grupo del alumno, con la misma normalización que los reportes por grupo."""
+    grupo = resultado.get('grupo', 'Sin Grupo')
+    if not grupo or str(grupo).lower() in ['nan', 'none', '']:
+        grupo = 'Sin Grupo'
+    return str(grupo)
+
+
+def _indices_grupo(resultados: List[Dict[str, Any]]) -> np.ndarray:
+    grupos = np.array([_nombre_grupo(r) for r in resultados], dtype=object)
+    return np.unique(grupos, return_inverse=True)[1]
+
+
+def _puntaje_materia(datos: Dict[str, Any]) -> float:
+    return datos.get('puntaje', datos.get('aciertos', 0))
+
+
+def asignar_rankings(resultados: List[Dict[str, Any]], totales: Optional[np.ndarray] = None,
+                     por_materia: Optional[Dict[str, np.ndarray]] = None) -> None:
+    """
+    Calcula y guarda en cada resultado la llave 'ranking':
+        posicion, posicion_densa, percentil (toda la generación),
+        posicion_grupo, posicion_densa_grupo, percentil_grupo,
+        materias: {materia: {posicion, percentil, posicion_grupo, percentil_grupo}}
+    La puntuación es el puntaje de las reglas del examen (ver reglas_puntaje)
+    o, si no hay, el total de aciertos (global) o los aciertos de la materia.
+    totales y por_materia permiten pasar esas puntuaciones ya calculadas.
+    """
+    if not resultados:
+        return
+
+    grupo_idx = _indices_grupo(resultados)
+    if totales is None:
+        totales = np.fromiter((r.get('puntaje', r['total_aciertos']) for r in resultados),
+                              dtype=np.float64, count=len(resultados))
+    globales = calcular_rangos(totales)
+    por_grupo = calcular_rangos(totales, grupo_idx)
+
+    materias = {}
+    for materia in resultados[0]['calificaciones']:
+        if por_materia is not None and materia in por_materia:
+            puntajes = por_materia[materia]
+        else:
+            puntajes = np.fromiter((_puntaje_materia(r['calificaciones'].get(materia, {})) for r in resultados),
+                                   dtype=np.float64, count=len(resultados))
+        materias[materia] = (calcular_rangos(puntajes), calcular_rangos(puntajes, grupo_idx))
+
+    # Listas de Python (ya redondeadas) para no crear escalares de numpy alumno por alumno
+    def _listas(rangos):
+        return rangos['competencia'].tolist(), rangos['densa'].tolist(), rangos['percentil'].round(2).tolist()
+
+    g_pos, g_densa, g_pct = _listas(globales)
+    gr_pos, gr_densa, gr_pct = _listas(por_grupo)
+    m_listas = [(m, _listas(gl), _listas(gr)) for m, (gl, gr) in materias.items()]
+
+    for i, resultado in enumerate(resultados):
+        resultado['ranking'] = {
+            'posicion': g_pos[i],
+            'posicion_densa': g_densa[i],
+            'percentil': g_pct[i],
+            'posicion_grupo': gr_pos[i],
+            'posicion_densa_grupo': gr_densa[i],
+            'percentil_grupo': gr_pct[i],
+            'materias': {m: {'posicion': gl[0][i], 'percentil': gl[2][i],
+                             'posicion_grupo': gr[0][i], 'percentil_grupo': gr[2][i]}
+                         for m, gl, gr in m_listas},
+        }
+
+
+def asegurar_rankings(resultados: List[Dict[str, Any]]) -> None:
+    """Calcula los rankings si los resultados aún no los tienen (p. ej. cargados de otro lado)."""
+    if resultados and 'ranking' not in resultados[0]:
+        asignar_rankings(resultados)
+
+
+def ordenar_por_posicion(alumnos: List[Dict[str, Any]], llave: str = 'posicion_grupo') -> List[Dict[str, Any]]:
+    """Alumnos en orden de su posición ya calculada (los empates conservan su orden)."""
+    return sorted(alumnos, key=lambda r: r['ranking'][llave])
@@ -0,0 +1,446 @@
+# app/registro_claves.py
+"""
+Registro de claves compiladas.
+Una clave se compila una sola vez (desde el CSV o desde GeneradorClave) a
+un vector uint8 inmutable con las opciones aceptadas en cada pregunta
+(máscara de bits; ver matrices.mascara_respuesta), el mapeo de materias
+y un hash de contenido. Se guarda en data/claves para
+que la GUI, el vigilante y el servidor la busquen por id, hash o nombre
+sin volver a leer ni validar el CSV.
+
+También guarda las versiones del examen (A/B con preguntas revueltas)
+como permutaciones hacia la numeración canónica, y las reglas de puntaje
+de cada clave (pesos, penalizaciones, anuladas), que no cambian su hash.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+import pandas as pd
+
+from config import RUTA_DATOS, MAPEO_MATERIAS
+from data_loader import cargar_datos, extraer_columnas_respuestas, obtener_respuestas_correctas
+from matrices import (mascara_respuesta, letras_mascara, mascaras_desde_codigos,
+                      codigos_principales, contar_bits, MASCARA_NO_CALIFICADA)
+from reglas_puntaje import ReglasPuntaje
+
+RUTA_CLAVES = os.path.join(RUTA_DATOS, 'claves')
+ARCHIVO_INDICE = 'indice.json'
+
+# Permutaciones de versiones junto al CSV de la clave: clave.csv -> clave_versiones.csv
+SUFIJO_VERSIONES = '_versiones.csv'
+
+# Largo del id corto (prefijo del hash)
+LARGO_ID = 12
+
+# Bloqueo del índice entre procesos (GUI, vigilante y servidor tienen cada uno su registro)
+ESPERA_BLOQUEO = 10.0  # Segundos máximos esperando el bloqueo
+BLOQUEO_ABANDONADO = 30.0  # Un bloqueo más viejo que esto se da por abandonado
+
+
+def _solo_lectura(arreglo: np.ndarray) -> np.ndarray:
+    arreglo = np.array(arreglo)
+    arreglo.flags.writeable = False
+    return arreglo
+
+
+class ClaveCompilada:
+    """
+    Clave lista para calificar.
+
+    Atributos:
+        mascaras: Opciones aceptadas por pregunta (posición j = pregunta j + 1; 0 = no calificada)
+        vector: Código de la opción aceptada más baja de cada pregunta (CODIGO_VACIA = no calificada)
+        materia_por_pregunta: Índice en nombres_materias de cada pregunta (-1 = sin materia)
+        nombres_materias: Materias en el orden del mapeo
+        versiones: Versión -> permutación (posición en la versión -> índice canónico)
+    """
+
+    def __init__(self, mascaras: np.ndarray, nombres_materias: List[str],
+                 materia_por_pregunta: np.ndarray, nombre: str = '',
+                 versiones: Optional[Dict[str, np.ndarray]] = None):
+        self.mascaras = _solo_lectura(np.asarray(mascaras, dtype=np.uint8))
+        self.vector = _solo_lectura(codigos_principales(self.mascaras))
+        self.nombres_materias = tuple(nombres_materias)
+        self.materia_por_pregunta = _solo_lectura(np.asarray(materia_por_pregunta, dtype=np.int16))
+        self.nombre = nombre
+        self.versiones = {str(v): _solo_lectura(np.asarray(p, dtype=np.int32))
+                          for v, p in (versiones or {}).items()}
+        self.hash = self._calcular_hash()
+
+    @property
+    def id(self) -> str:
+        return self.hash[:LARGO_ID]
+
+    @property
+    def total_preguntas(self) -> int:
+        return len(self.mascaras)
+
+    @property
+    def varias_respuestas(self) -> bool:
+        """Indica si alguna pregunta acepta más de una opción."""
+        return bool((contar_bits(self.mascaras) > 1).any())
+
+    def _calcular_hash(self) -> str:
+        """Hash del contenido (no del nombre): la misma clave siempre tiene el mismo id."""
+        h = hashlib.sha256()
+        h.update(self.vector.tobytes())
+        # Las claves de una sola respuesta conservan el hash que tenían antes de las máscaras
+        if self.varias_respuestas:
+            h.update(self.mascaras.tobytes())
+        h.update(json.dumps(self.nombres_materias).encode())
+        h.update(self.materia_por_pregunta.tobytes())
+        for version in sorted(self.versiones):
+            h.update(version.encode())
+            h.update(self.versiones[version].tobytes())
+        return h.hexdigest()
+
+    def mapeo_materias(self) -> Dict[str, List[int]]:
+        """Preguntas (1-based) de cada materia."""
+        return {materia: (np.flatnonzero(self.materia_por_pregunta == indice) + 1).tolist()
+                for indice, materia in enumerate(self.nombres_materias)}
+
+    def respuestas_correctas(self, preguntas: Optional[List[int]] = None) -> Dict[int, str]:
+        """
+        Misma salida que data_loader.obtener_respuestas_correctas:
+        pregunta -> letra, solo para las preguntas pedidas que están en la clave.
+        """
+        if preguntas is None:
+            preguntas = range(1, self.total_preguntas + 1)
+        return {p: letras_mascara(int(self.mascaras[p - 1])) for p in sorted(preguntas)
+                if 0 < p <= self.total_preguntas and self.mascaras[p - 1] != MASCARA_NO_CALIFICADA}
+
+    def con_version(self, version: str, permutacion: List[int]) -> 'ClaveCompilada':
+        """
+        Nueva clave que además conoce una versión revuelta del examen.
+
+        Args:
+            version: Nombre de la versión (p. ej. 'B')
+            permutacion: Para cada pregunta de la versión (en orden), su número canónico (1-based)
+        """
+        permutacion = np.asarray(permutacion, dtype=np.int64) - 1
+        if (np.sort(permutacion) != np.arange(len(permutacion))).any():
+            raise ValueError(f"La permutación de la versión {version} no cubre las preguntas 1..{len(permutacion)}")
+        versiones = dict(self.versiones)
+        versiones[str(version)] = permutacion
+        return ClaveCompilada(self.mascaras, list(self.nombres_materias), self.materia_por_pregunta,
+                              self.nombre, versiones)
+
+
+def _layout_materias(total_preguntas: int, mapeo_materias: Dict[str, range]):
+    materia_por_pregunta = np.full(total_preguntas, -1, dtype=np.int16)
+    for indice, rango in enumerate(mapeo_materias.values()):
+        preguntas = np.array([p - 1 for p in rango if 0 < p <= total_preguntas], dtype=np.int64)
+        materia_por_pregunta[preguntas] = indice
+    return list(mapeo_materias.keys()), materia_por_pregunta
+
+
+def compilar_clave_df(clave_df: pd.DataFrame, nombre: str = '',
+                      mapeo_materias: Optional[Dict[str, range]] = None,
+                      mostrar_detalle: bool = False) -> Optional[ClaveCompilada]:
+    """Compila la clave de un DataFrame (primera fila) validando cada pregunta una sola vez."""
+    if mapeo_materias is None:
+        mapeo_materias = MAPEO_MATERIAS
+
+    salida = contextlib.nullcontext() if mostrar_detalle else contextlib.redirect_stdout(io.StringIO())
+    with salida:
+        columnas = extraer_columnas_respuestas(clave_df)
+        respuestas = obtener_respuestas_correctas(clave_df, columnas) if columnas else {}
+    if not respuestas:
+        print(f"Error: la clave '{nombre}' no tiene respuestas válidas")
+        return None
+
+    mascaras = np.zeros(max(columnas.keys()), dtype=np.uint8)
+    for pregunta, respuesta in respuestas.items():
+        mascaras[pregunta - 1] = mascara_respuesta(respuesta)
+
+    nombres, materia_por_pregunta = _layout_materias(len(mascaras), mapeo_materias)
+    return ClaveCompilada(mascaras, nombres, materia_por_pregunta, nombre)
+
+
+def compilar_clave_generador(generador, nombre: str = '',
+                             mapeo_materias: Optional[Dict[str, range]] = None) -> Optional[ClaveCompilada]:
+    """Compila la clave capturada en un GeneradorClave (sin pasar por CSV)."""
+    if mapeo_materias is None:
+        mapeo_materias = MAPEO_MATERIAS
+
+    mascaras = np.array([mascara_respuesta(r) for r in generador.respuestas], dtype=np.uint8)
+    if not mascaras.any():
+        print("Error: el generador no tiene respuestas capturadas")
+        return None
+
+    nombres, materia_por_pregunta = _layout_materias(len(mascaras), mapeo_materias)
+    return ClaveCompilada(mascaras, nombres, materia_por_pregunta, nombre)
+
+
+def cargar_permutaciones_csv(ruta: str) -> Dict[str, List[int]]:
+    """
+    Lee las permutaciones de versiones de un CSV con una fila por versión:
+    columna 'Version' y, en cada columna de pregunta ('1.', 'P1', ...),
+    el número canónico de esa pregunta. Se aplican con ClaveCompilada.con_version.
+    """
+    df = cargar_datos(ruta)
+    if df is None:
+        return {}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        columnas = extraer_columnas_respuestas(df)
+    columna_version = next((c for c in df.columns if str(c).strip().lower() in ('version', 'versión')), df.columns[0])
+
+    permutaciones = {}
+    for _, fila in df.iterrows():
+        version = str(fila[columna_version]).strip().upper()
+        permutaciones[version] = [int(fila[columnas[p]]) for p in sorted(columnas)]
+    return permutaciones
+
+
+def ruta_versiones(ruta_clave: str) -> str:
+    """CSV de versiones que acompaña a un CSV de clave (exista o no)."""
+    return os.path.splitext(ruta_clave)[0] + SUFIJO_VERSIONES
+
+
+def aplicar_versiones(clave: ClaveCompilada, permutaciones: Dict[str, List[int]]) -> ClaveCompilada:
+    """Clave con todas las versiones de permutaciones (ValueError si alguna no es válida)."""
+    for version, permutacion in permutaciones.items():
+        clave = clave.con_version(version, permutacion)
+    return clave
+
+
+class RegistroClaves:
+    """Claves compiladas guardadas en disco (un .npz por clave y un índice JSON)."""
+
+    def __init__(self, carpeta: str = RUTA_CLAVES):
+        self.carpeta = carpeta
+        self._cargadas: Dict[str, ClaveCompilada] = {}
+        self._indice = self._leer_indice()
+
+    # -- índice ----------------------------------------------------------------
+
+    def _ruta_indice(self) -> str:
+        return os.path.join(self.carpeta, ARCHIVO_INDICE)
+
+    def _leer_indice(self) -> Dict[str, Any]:
+        try:
+            with open(self._ruta_indice(), encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return {'claves': {}, 'fuentes': {}}
+
+    @contextlib.contextmanager
+    def _bloqueo_indice(self):
+        """Bloqueo exclusivo del índice (archivo .lock creado con O_EXCL, portable)."""
+        if not os.path.exists(self.carpeta):
+            os.makedirs(self.carpeta)
+        ruta_bloqueo = self._ruta_indice() + '.lock'
+        limite = time.monotonic() + ESPERA_BLOQUEO
+        while True:
+            try:
+                os.close(os.open(ruta_bloqueo, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(ruta_bloqueo) > BLOQUEO_ABANDONADO:
+                        os.remove(ruta_bloqueo)
+                        continue
+                except OSError:
+                    continue  # Otro proceso lo acaba de liberar
+                if time.monotonic() > limite:
+                    raise TimeoutError(f"No se pudo bloquear el índice de claves ({ruta_bloqueo})")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(ruta_bloqueo)
+
+    def _actualizar_indice(self, cambio: Callable[[Dict[str, Any]], None]):
+        """
+        Aplica un cambio al índice en disco: bajo el bloqueo se vuelve a leer,
+        se aplica el cambio y se reemplaza el archivo, así no se pierden las
+        claves que otro proceso registró mientras tanto.
+        """
+        with self._bloqueo_indice():
+            indice = self._leer_indice()
+            cambio(indice)
+            temporal = self._ruta_indice() + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump(indice, archivo, ensure_ascii=False, indent=2)
+            os.replace(temporal, self._ruta_indice())
+        self._indice = indice
+
+    # -- consulta ----------------------------------------------------------------
+
+    def listar(self) -> pd.DataFrame:
+        """Claves registradas (id, nombre, preguntas, versiones, fecha)."""
+        filas = [{'id': hash_[:LARGO_ID], **{k: v for k, v in info.items() if k != 'archivo'}}
+                 for hash_, info in self._indice['claves'].items()]
+        return pd.DataFrame(filas)
+
+    def resolver_hash(self, referencia: str) -> Optional[str]:
+        """Hash completo a partir de un id, hash o nombre de clave (el más reciente)."""
+        hash_ = self._buscar_hash(referencia)
+        if hash_ is None:
+            # Otro proceso pudo registrar la clave después de leer el índice
+            self._indice = self._leer_indice()
+            hash_ = self._buscar_hash(referencia)
+        return hash_
+
+    def _buscar_hash(self, referencia: str) -> Optional[str]:
+        claves = self._indice['claves']
+        if referencia in claves:
+            return referencia
+
+        coincidencias = [h for h in claves if h.startswith(referencia)]
+        if len(coincidencias) == 1:
+            return coincidencias[0]
+
+        por_nombre = [h for h, info in claves.items() if info.get('nombre') == referencia]
+        if por_nombre:
+            return max(por_nombre, key=lambda h: claves[h].get('fecha', ''))
+        return None
+
+    def obtener(self, referencia: str) -> Optional[ClaveCompilada]:
+        """Clave por id, hash o nombre (se carga del disco una sola vez)."""
+        hash_ = self.resolver_hash(referencia)
+        if hash_ is None:
+            return None
+
+        if hash_ not in self._cargadas:
+            ruta = os.path.join(self.carpeta, self._indice['claves'][hash_]['archivo'])
+            with np.load(ruta) as datos:
+                versiones = {str(v)[len('version_'):]: datos[v] for v in datos.files if v.startswith('version_')}
+                # Las claves guardadas antes de las máscaras solo tienen el vector de códigos
+                mascaras = datos['mascaras'] if 'mascaras' in datos.files else mascaras_desde_codigos(datos['vector'])
+                self._cargadas[hash_] = ClaveCompilada(
+                    mascaras, [str(m) for m in datos['nombres_materias']],
+                    datos['materia_por_pregunta'], self._indice['claves'][hash_].get('nombre', ''), versiones)
+        return self._cargadas[hash_]
+
+    # -- registro ---------------------------------------------------------------
+
+    def registrar(self, clave: ClaveCompilada, fuente: str = '') -> str:
+        """Guarda la clave (si no existía) y devuelve su id."""
+        if clave.hash not in self._indice['claves']:
+            if not os.path.exists(self.carpeta):
+                os.makedirs(self.carpeta)
+            archivo = f"{clave.id}.npz"
+            arreglos = {f"version_{v}": p for v, p in clave.versiones.items()}
+            np.savez(os.path.join(self.carpeta, archivo), vector=clave.vector, mascaras=clave.mascaras,
+                     materia_por_pregunta=clave.materia_por_pregunta,
+                     nombres_materias=np.array(clave.nombres_materias), **arreglos)
+            info = {
+                'nombre': clave.nombre,
+                'archivo': archivo,
+                'preguntas': int(clave.total_preguntas),
+                'calificadas': int((clave.mascaras != MASCARA_NO_CALIFICADA).sum()),
+                'versiones': sorted(clave.versiones),
+                'fuente': fuente,
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._actualizar_indice(lambda indice: indice['claves'].setdefault(clave.hash, info))
+        self._cargadas[clave.hash] = clave
+        return clave.id
+
+    # -- reglas de puntaje ---------------------------------------------------------
+
+    def guardar_reglas(self, clave: ClaveCompilada, reglas: ReglasPuntaje) -> None:
+        """Asocia reglas de puntaje a una clave (la registra si hace falta); reemplaza las anteriores."""
+        self.registrar(clave)
+        archivo = f"{clave.id}_reglas.npz"
+        np.savez(os.path.join(self.carpeta, archivo), pesos=reglas.pesos,
+                 penalizaciones=reglas.penalizaciones, anuladas=reglas.anuladas,
+                 nombre=np.array(reglas.nombre))
+        self._actualizar_indice(lambda indice: indice['claves'][clave.hash].update(reglas=archivo))
+
+    def obtener_reglas(self, clave: ClaveCompilada) -> Optional[ReglasPuntaje]:
+        """Reglas de puntaje de la clave, o None si se califica un punto por acierto."""
+        info = self._indice['claves'].get(clave.hash)
+        if info is None or 'reglas' not in info:
+            # Otro proceso (p. ej. reglas_puntaje.py) pudo guardar reglas después de leer el índice
+            self._indice = self._leer_indice()
+            info = self._indice['claves'].get(clave.hash)
+        if info is None or 'reglas' not in info:
+            return None
+        try:
+            with np.load(os.path.join(self.carpeta, info['reglas'])) as datos:
+                return ReglasPuntaje(datos['pesos'], datos['penalizaciones'], datos['anuladas'],
+                                     str(datos['nombre']))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudieron leer las reglas de la clave {clave.id}: {e}")
+            return None
+
+    def clave_desde_csv(self, ruta: str, mapeo_materias: Optional[Dict[str, range]] = None
+                        ) -> Optional[ClaveCompilada]:
+        """
+        Clave compilada de un CSV. Solo se lee y compila el CSV si es nuevo
+        o cambió (tamaño/fecha) desde la última vez. Si junto a él hay un
+        <clave>_versiones.csv, la clave incluye esas versiones revueltas.
+        """
+        ruta = os.path.abspath(ruta)
+        info = os.stat(ruta)
+        firma = [info.st_size, info.st_mtime_ns]
+        archivo_versiones = ruta_versiones(ruta)
+        if os.path.exists(archivo_versiones):
+            info_versiones = os.stat(archivo_versiones)
+            firma += [info_versiones.st_size, info_versiones.st_mtime_ns]
+
+        fuente = self._indice['fuentes'].get(ruta)
+        if fuente is not None and fuente['firma'] == firma and mapeo_materias is None:
+            clave = self.obtener(fuente['hash'])
+            if clave is not None:
+                return clave
+
+        clave_df = cargar_datos(ruta)
+        if clave_df is None:
+            return None
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        clave = compilar_clave_df(clave_df, nombre, mapeo_materias)
+        if clave is None:
+            return None
+        if os.path.exists(archivo_versiones):
+            try:
+                clave = aplicar_versiones(clave, cargar_permutaciones_csv(archivo_versiones))
+            except ValueError as e:
+                print(f"Error en {os.path.basename(archivo_versiones)}: {e}")
+                return None
+
+        self.registrar(clave, fuente=ruta)
+        if mapeo_materias is None:
+            def _registrar_fuente(indice):
+                indice['fuentes'][ruta] = {'firma': firma, 'hash': clave.hash}
+
+            self._actualizar_indice(_registrar_fuente)
+        return clave
+
+
+if __name__ == "__main__":
+    import sys
+
+    registro = RegistroClaves()
+    if len(sys.argv) == 3:
+        # Registra una clave con versiones: python registro_claves.py <clave.csv | id> <versiones.csv>
+        clave = (registro.clave_desde_csv(sys.argv[1]) if os.path.isfile(sys.argv[1])
+                 else registro.obtener(sys.argv[1]))
+        if clave is None:
+            sys.exit(1)
+        try:
+            clave = aplicar_versiones(clave, cargar_permutaciones_csv(sys.argv[2]))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Clave con versiones {sorted(clave.versiones)}: id {registro.registrar(clave, fuente=sys.argv[2])}")
+        sys.exit(0)
+
+    for nombre in sorted(os.listdir(RUTA_DATOS)):
+        if nombre.lower().endswith('.csv') and 'clave' in nombre.lower():
+            clave = registro.clave_desde_csv(os.path.join(RUTA_DATOS, nombre))
+            if clave is not None:
+                print(f"{nombre}: id {clave.id}")
+    print(registro.listar())
@@ -0,0 +1,233 @@
+# app/reglas_puntaje.py
+"""
+Reglas de puntaje por examen: peso de cada pregunta, penalización por
+respuesta incorrecta y preguntas anuladas (sin tocar la clave).
+
+Los puntajes de todos los alumnos salen de un solo producto matricial:
+los indicadores de acierto y error (alumnos x 2·preguntas) por una matriz
+de valores con una columna por materia y una para el total. Cambiar las
+reglas y volver a puntuar no requiere recalificar.
+"""
+
+import os
+import sys
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+from config import MAPEO_MATERIAS
+from data_loader import cargar_datos
+from matrices import (obtener_matriz_estado, obtener_cache, ancho_examen,
+                      ESTADO_ACIERTO, ESTADO_ERROR, ESTADO_NO_CALIFICADA)
+from rankings import asignar_rankings
+
+# Cachés que dependen de las calificaciones (no solo de los estados) y se descartan al volver a puntuar
+_CACHES_DE_PUNTAJE = ('perfiles_error',)
+
+
+class ReglasPuntaje:
+    """
+    Reglas de un examen (posición j = pregunta j + 1).
+
+    Atributos:
+        pesos: Puntos por acierto
+        penalizaciones: Puntos que se restan por respuesta incorrecta (o inválida)
+        anuladas: Preguntas que no cuentan ni para el puntaje ni para el máximo
+    Las preguntas fuera de los vectores valen 1 punto, sin penalización.
+    """
+
+    def __init__(self, pesos: Iterable[float], penalizaciones: Optional[Iterable[float]] = None,
+                 anuladas: Optional[Iterable[bool]] = None, nombre: str = ''):
+        self.pesos = np.asarray(list(pesos), dtype=np.float64)
+        total = len(self.pesos)
+        self.penalizaciones = (np.zeros(total) if penalizaciones is None
+                               else np.asarray(list(penalizaciones), dtype=np.float64))
+        self.anuladas = (np.zeros(total, dtype=bool) if anuladas is None
+                         else np.asarray(list(anuladas), dtype=bool))
+        if len(self.penalizaciones) != total or len(self.anuladas) != total:
+            raise ValueError("Los vectores de pesos, penalizaciones y anuladas deben tener el mismo largo")
+        if (self.pesos < 0).any() or (self.penalizaciones < 0).any():
+            raise ValueError("Los pesos y las penalizaciones no pueden ser negativos")
+        self.nombre = nombre
+
+    @classmethod
+    def uniformes(cls, total_preguntas: int, nombre: str = '') -> 'ReglasPuntaje':
+        """Un punto por acierto, sin penalización ni anuladas (la calificación de siempre)."""
+        return cls(np.ones(total_preguntas), nombre=nombre)
+
+    @property
+    def total_preguntas(self) -> int:
+        return len(self.pesos)
+
+    @property
+    def es_uniforme(self) -> bool:
+        return bool((self.pesos == 1).all() and not self.penalizaciones.any() and not self.anuladas.any())
+
+    def con_anuladas(self, preguntas: Iterable[int]) -> 'ReglasPuntaje':
+        """Nuevas reglas con estas preguntas (1-based) anuladas además de las actuales."""
+        preguntas = [p for p in preguntas if p > 0]
+        total = max([self.total_preguntas] + preguntas)
+        pesos, penalizaciones, anuladas = self.vectores(total)
+        anuladas[np.array(preguntas, dtype=np.int64) - 1] = True
+        return ReglasPuntaje(pesos, penalizaciones, anuladas, self.nombre)
+
+    def vectores(self, total_preguntas: int):
+        """(pesos, penalizaciones, anuladas) recortados o completados a total_preguntas."""
+        largo = min(total_preguntas, self.total_preguntas)
+        pesos = np.ones(total_preguntas)
+        penalizaciones = np.zeros(total_preguntas)
+        anuladas = np.zeros(total_preguntas, dtype=bool)
+        pesos[:largo] = self.pesos[:largo]
+        penalizaciones[:largo] = self.penalizaciones[:largo]
+        anuladas[:largo] = self.anuladas[:largo]
+        return pesos, penalizaciones, anuladas
+
+
+def _columna_flexible(columnas: List[str], nombres: List[str]) -> Optional[str]:
+    normalizadas = {str(c).strip().lower(): c for c in columnas}
+    return next((normalizadas[n] for n in nombres if n in normalizadas), None)
+
+
+def cargar_reglas_csv(ruta: str) -> Optional[ReglasPuntaje]:
+    """
+    Lee las reglas de un CSV con una fila por pregunta:
+    Pregunta, Peso, Penalizacion, Anulada (si/no, 1/0). Solo Pregunta es obligatoria;
+    las preguntas que no aparecen quedan con los valores por defecto.
+    """
+    df = cargar_datos(ruta)
+    if df is None:
+        return None
+
+    columnas = list(df.columns)
+    col_pregunta = _columna_flexible(columnas, ['pregunta', 'numero', 'número', 'p'])
+    if col_pregunta is None:
+        print(f"Error: el archivo de reglas {ruta} no tiene columna 'Pregunta'")
+        return None
+    col_peso = _columna_flexible(columnas, ['peso', 'puntos', 'valor'])
+    col_penalizacion = _columna_flexible(columnas, ['penalizacion', 'penalización', 'castigo'])
+    col_anulada = _columna_flexible(columnas, ['anulada', 'anular', 'anulado'])
+
+    preguntas = df[col_pregunta].astype(str).str.extract(r'(\d+)')[0].astype(float)
+    validas = preguntas.notna().values
+    preguntas = preguntas[validas].astype(int).values
+    if len(preguntas) == 0:
+        print(f"Error: el archivo de reglas {ruta} no tiene preguntas")
+        return None
+
+    reglas = ReglasPuntaje.uniformes(int(preguntas.max()),
+                                     nombre=os.path.splitext(os.path.basename(ruta))[0])
+    indices = preguntas - 1
+    if col_peso is not None:
+        reglas.pesos[indices] = df[col_peso][validas].astype(float).fillna(1).values
+    if col_penalizacion is not None:
+        reglas.penalizaciones[indices] = df[col_penalizacion][validas].astype(float).fillna(0).abs().values
+    if col_anulada is not None:
+        texto = df[col_anulada][validas].astype(str).str.strip().str.lower()
+        reglas.anuladas[indices] = texto.isin(['1', '1.0', 'si', 'sí', 'true', 'x', 'anulada']).values
+
+    # Se valida con el constructor (pesos negativos, etc.)
+    return ReglasPuntaje(reglas.pesos, reglas.penalizaciones, reglas.anuladas, reglas.nombre)
+
+
+def calcular_puntajes(estado: np.ndarray, reglas: ReglasPuntaje,
+                      mapeo_materias: Optional[Dict[str, range]] = None) -> Dict[str, Any]:
+    """
+    Puntajes de todos los alumnos con las reglas dadas.
+
+    Returns:
+        {'materias': nombres, 'puntajes': alumnos x (materias + total),
+         'maximos': puntaje máximo de cada columna}
+    """
+    if mapeo_materias is None:
+        mapeo_materias = MAPEO_MATERIAS
+
+    num_preguntas = estado.shape[1]
+    pesos, penalizaciones, anuladas = reglas.vectores(num_preguntas)
+    cuenta = (estado != ESTADO_NO_CALIFICADA).any(axis=0) & ~anuladas
+
+    # Pertenencia pregunta -> columna (materias y, al final, el total)
+    pertenencia = np.zeros((num_preguntas, len(mapeo_materias) + 1))
+    for indice, rango in enumerate(mapeo_materias.values()):
+        preguntas = np.array([p - 1 for p in rango if 0 < p <= num_preguntas], dtype=np.int64)
+        pertenencia[preguntas, indice] = 1
+    pertenencia[:, -1] = 1
+    pertenencia[~cuenta] = 0
+
+    valores = np.vstack([pesos[:, None] * pertenencia, -penalizaciones[:, None] * pertenencia])
+    indicadores = np.concatenate([estado == ESTADO_ACIERTO, estado == ESTADO_ERROR], axis=1)
+
+    return {
+        'materias': list(mapeo_materias.keys()),
+        'puntajes': indicadores.astype(np.float64) @ valores,
+        'maximos': pesos @ pertenencia,
+    }
+
+
+def _escalar(puntaje: float, maximo: float, escala: float) -> float:
+    """Puntaje llevado a la escala (las penalizaciones no bajan la calificación de cero)."""
+    return round(max(puntaje, 0) / maximo * escala, 2) if maximo > 0 else 0
+
+
+def aplicar_reglas(resultados: List[Dict[str, Any]], reglas: ReglasPuntaje,
+                   mapeo_materias: Optional[Dict[str, range]] = None) -> None:
+    """
+    Vuelve a puntuar los resultados con otras reglas, sin recalificar.
+    Actualiza puntaje, puntaje_maximo, porcentaje y calificación (global y por
+    materia) y los rankings; los conteos de aciertos/errores no cambian.
+    """
+    if not resultados:
+        return
+
+    estado = obtener_matriz_estado(resultados, ancho_examen(resultados))
+    calculo = calcular_puntajes(estado, reglas, mapeo_materias)
+    puntajes = calculo['puntajes'].tolist()
+    # Los rankings usan el puntaje redondeado para que los empates no dependan del orden de las sumas
+    redondeada = calculo['puntajes'].round(2)
+    redondeados = redondeada.tolist()
+    maximos = calculo['maximos'].tolist()
+    materias = [(columna, materia) for columna, materia in enumerate(calculo['materias'])
+                if materia in resultados[0]['calificaciones']]
+
+    for resultado, fila, fila_redondeada in zip(resultados, puntajes, redondeados):
+        for columna, materia in materias:
+            datos = resultado['calificaciones'][materia]
+            datos['puntaje'] = fila_redondeada[columna]
+            datos['puntaje_maximo'] = round(maximos[columna], 2)
+            datos['porcentaje'] = _escalar(fila[columna], maximos[columna], 100)
+            datos['calificacion'] = _escalar(fila[columna], maximos[columna], 10)
+
+        resultado['puntaje'] = fila_redondeada[-1]
+        resultado['puntaje_maximo'] = round(maximos[-1], 2)
+        resultado['porcentaje_global'] = _escalar(fila[-1], maximos[-1], 100)
+        resultado['calificacion_global'] = _escalar(fila[-1], maximos[-1], 10)
+        resultado['reglas'] = reglas.nombre
+
+    cache = obtener_cache(resultados)
+    if cache is not None:
+        for llave in _CACHES_DE_PUNTAJE:
+            cache.pop(llave, None)
+
+    asignar_rankings(resultados, redondeada[:, -1],
+                     {materia: redondeada[:, columna] for columna, materia in materias})
+
+
+if __name__ == "__main__":
+    # Registra reglas para una clave: python reglas_puntaje.py clave.csv reglas.csv
+    from registro_claves import RegistroClaves
+
+    if len(sys.argv) != 3:
+        print("Uso: python reglas_puntaje.py <clave.csv | id de clave> <reglas.csv>")
+        sys.exit(1)
+
+    registro = RegistroClaves()
+    clave = (registro.clave_desde_csv(sys.argv[1]) if os.path.isfile(sys.argv[1])
+             else registro.obtener(sys.argv[1]))
+    reglas = cargar_reglas_csv(sys.argv[2])
+    if clave is None or reglas is None:
+        sys.exit(1)
+
+    registro.guardar_reglas(clave, reglas)
+    print(f"Reglas '{reglas.nombre}' guardadas para la clave {clave.id}: "
+          f"{int(reglas.anuladas.sum())} anuladas, "
+          f"{int((reglas.pesos != 1).sum())} con peso distinto de 1, "
+          f"{int((reglas.penalizaciones > 0).sum())} con penalización")
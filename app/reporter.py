@@ -147,6 +147,12 @@ def exportar_a_csv(resultados: List[Dict[str, Any]], ruta_salida: str):
             fila[f'{materia}_Aciertos'] = detalle['aciertos']
             fila[f'{materia}_Total'] = detalle['total']
 
+        # Puntajes equiparados contra otro simulacro (ver equiparacion.equiparar_resultados)
+        if 'equiparacion' in reporte:
+            fila['Z'] = reporte['equiparacion']['z']
+            fila['T'] = reporte['equiparacion']['t']
+            fila['Porcentaje_Equiparado'] = reporte['equiparacion']['porcentaje_equiparado']
+
         datos_exportar.append(fila)
 
     try:
@@ -0,0 +1,336 @@
+# app/servidor.py
+"""
+Servicio HTTP local para calificar desde el navegador.
+El profesor sube el CSV de respuestas y recibe el reporte consolidado
+en Excel, sin instalar Python.
+
+- El bucle de eventos (asyncio) solo atiende conexiones; la calificación
+  y el Excel se generan en un pool de procesos.
+- Cada proceso carga las claves compiladas (registro_claves) al iniciar y
+  las conserva en memoria; un CSV de clave solo se recompila si cambia.
+  También se puede pedir una clave registrada por id (?clave=<id>).
+- GET /estado expone los límites de concurrencia y la profundidad de la cola.
+
+Uso:
+    python servidor.py [puerto]
+"""
+
+import asyncio
+import html
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from config import RUTA_DATOS, MAPEO_MATERIAS, COLUMNA_NOMBRE, COLUMNA_EMAIL, COLUMNA_GRUPO
+from data_loader import cargar_datos
+from registro_claves import RegistroClaves, ClaveCompilada
+
+HOST = '127.0.0.1'
+PUERTO = 8765
+
+MAX_PROCESOS = 2  # Calificaciones simultáneas
+MAX_EN_COLA = 8  # Solicitudes esperando un proceso; más allá se responde 503
+MAX_TAMANIO_CSV = 20 * 1024 * 1024
+TAMANIO_BLOQUE = 64 * 1024
+
+CLAVE_POR_DEFECTO = 'clave_respuestas.csv'
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_ESTADOS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                 413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error',
+                 503: 'Service Unavailable'}
+
+PAGINA_INICIO = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Calificador Lobatchewsky</title></head>
+<body style="font-family: sans-serif; max-width: 640px; margin: 40px auto;">
+<h2>Calificador de simulacros</h2>
+<p>Clave: <select id="clave">{opciones}</select></p>
+<p>Respuestas (CSV de Google Forms): <input type="file" id="archivo" accept=".csv"></p>
+<button onclick="enviar()">Calificar</button>
+<p id="estado"></p>
+<script>
+async function enviar() {{
+  const archivo = document.getElementById('archivo').files[0];
+  const estado = document.getElementById('estado');
+  if (!archivo) {{ estado.textContent = 'Selecciona un archivo'; return; }}
+  estado.textContent = 'Calificando...';
+  const clave = encodeURIComponent(document.getElementById('clave').value);
+  const r = await fetch('/calificar?clave=' + clave, {{method: 'POST', body: archivo}});
+  if (!r.ok) {{ estado.textContent = 'Error: ' + await r.text(); return; }}
+  const enlace = document.createElement('a');
+  enlace.href = URL.createObjectURL(await r.blob());
+  enlace.download = archivo.name.replace(/\\.csv$/i, '') + '_reporte.xlsx';
+  enlace.click();
+  estado.textContent = 'Listo (' + r.headers.get('X-Alumnos') + ' alumnos)';
+}}
+</script>
+</body></html>
+"""
+
+
+# ---------------------------------------------------------------------------
+# Trabajo en los procesos del pool
+# ---------------------------------------------------------------------------
+
+# Registro de claves de este proceso (conserva las claves compiladas en memoria)
+_REGISTRO: Optional[RegistroClaves] = None
+
+
+def _obtener_clave(referencia: str) -> Optional[ClaveCompilada]:
+    """Clave compilada por ruta de CSV o por id/hash del registro."""
+    global _REGISTRO
+    if _REGISTRO is None:
+        _REGISTRO = RegistroClaves()
+    if os.path.isfile(referencia):
+        return _REGISTRO.clave_desde_csv(referencia)
+    return _REGISTRO.obtener(referencia)
+
+
+def _inicializar_proceso(carpeta_claves: str):
+    """Precarga módulos y claves para que la primera solicitud no pague el arranque."""
+    import grader  # noqa: F401
+    import excel_consolidado  # noqa: F401
+
+    for nombre in listar_claves(carpeta_claves):
+        _obtener_clave(os.path.join(carpeta_claves, nombre))
+
+
+def calificar_csv(contenido: bytes, referencia_clave: str) -> Dict[str, Any]:
+    """
+    Califica un CSV recibido y genera el reporte consolidado en un archivo temporal.
+    referencia_clave es la ruta del CSV de clave o el id de una clave registrada.
+
+    Returns:
+        {'ruta': xlsx temporal, 'alumnos': n, 'segundos': t} o {'error': mensaje}
+    """
+    from grader import procesar_calificaciones_google_forms
+    from excel_consolidado import generar_reporte_consolidado
+
+    inicio = time.perf_counter()
+    clave = _obtener_clave(referencia_clave)
+    if clave is None:
+        return {'error': 'No se pudo cargar la clave'}
+
+    with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as temporal:
+        temporal.write(contenido)
+    try:
+        respuestas_df = cargar_datos(temporal.name)
+    finally:
+        os.remove(temporal.name)
+    if respuestas_df is None:
+        return {'error': 'No se pudo leer el CSV'}
+
+    resultados = procesar_calificaciones_google_forms(
+        clave, respuestas_df, MAPEO_MATERIAS, COLUMNA_NOMBRE, COLUMNA_EMAIL, COLUMNA_GRUPO,
+        reglas=_REGISTRO.obtener_reglas(clave))
+    if not resultados:
+        return {'error': 'No se procesaron calificaciones'}
+
+    descriptor, ruta_xlsx = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descriptor)
+    generar_reporte_consolidado(resultados, ruta_xlsx)
+    if os.path.getsize(ruta_xlsx) == 0:
+        os.remove(ruta_xlsx)
+        return {'error': 'No se pudo generar el reporte'}
+
+    return {'ruta': ruta_xlsx, 'alumnos': len(resultados), 'segundos': time.perf_counter() - inicio}
+
+
+def listar_claves(carpeta: str) -> list:
+    """Archivos de clave disponibles (CSV con 'clave' en el nombre)."""
+    return sorted(n for n in os.listdir(carpeta) if n.lower().endswith('.csv') and 'clave' in n.lower())
+
+
+# ---------------------------------------------------------------------------
+# Servidor
+# ---------------------------------------------------------------------------
+
+class ServidorCalificacion:
+    """Servidor HTTP mínimo sobre asyncio (una solicitud por conexión)."""
+
+    def __init__(self, carpeta_claves: str = RUTA_DATOS, max_procesos: int = MAX_PROCESOS,
+                 max_en_cola: int = MAX_EN_COLA):
+        self.carpeta_claves = os.path.abspath(carpeta_claves)
+        self.max_procesos = max_procesos
+        self.max_en_cola = max_en_cola
+
+        self._registro = RegistroClaves()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cupos: Optional[asyncio.Semaphore] = None
+        self._inicio = time.time()
+        self.metricas = {'en_cola': 0, 'en_proceso': 0, 'max_en_cola_observado': 0,
+                         'atendidas': 0, 'rechazadas': 0, 'errores': 0, 'segundos_total': 0.0}
+
+    # -- respuestas --------------------------------------------------------
+
+    async def _responder(self, writer: asyncio.StreamWriter, codigo: int, cuerpo: bytes = b'',
+                         tipo: str = 'text/plain; charset=utf-8', extra: Optional[Dict[str, str]] = None):
+        encabezados = {'Content-Type': tipo, 'Content-Length': str(len(cuerpo)), 'Connection': 'close'}
+        encabezados.update(extra or {})
+        writer.write(self._linea_estado(codigo, encabezados) + cuerpo)
+        await writer.drain()
+
+    def _linea_estado(self, codigo: int, encabezados: Dict[str, str]) -> bytes:
+        lineas = [f"HTTP/1.1 {codigo} {_ESTADOS_HTTP.get(codigo, '')}"]
+        lineas += [f"{nombre}: {valor}" for nombre, valor in encabezados.items()]
+        return ('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1')
+
+    async def _enviar_archivo(self, writer: asyncio.StreamWriter, ruta: str, extra: Dict[str, str]):
+        """Envía el archivo por bloques, sin cargarlo completo en memoria."""
+        encabezados = {'Content-Type': TIPO_XLSX, 'Content-Length': str(os.path.getsize(ruta)),
+                       'Content-Disposition': 'attachment; filename="reporte_consolidado.xlsx"',
+                       'Connection': 'close'}
+        encabezados.update(extra)
+        writer.write(self._linea_estado(200, encabezados))
+        with open(ruta, 'rb') as archivo:
+            while True:
+                bloque = archivo.read(TAMANIO_BLOQUE)
+                if not bloque:
+                    break
+                writer.write(bloque)
+                await writer.drain()
+
+    # -- rutas -------------------------------------------------------------
+
+    def estado(self) -> Dict[str, Any]:
+        atendidas = self.metricas['atendidas']
+        return {
+            'max_procesos': self.max_procesos,
+            'max_en_cola': self.max_en_cola,
+            **self.metricas,
+            'segundos_promedio': round(self.metricas['segundos_total'] / atendidas, 3) if atendidas else None,
+            'claves': listar_claves(self.carpeta_claves),
+            'activo_desde': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._inicio)),
+        }
+
+    async def _calificar(self, writer: asyncio.StreamWriter, parametros: Dict[str, list], cuerpo: bytes):
+        nombre_clave = os.path.basename(parametros.get('clave', [CLAVE_POR_DEFECTO])[0])
+        if nombre_clave in listar_claves(self.carpeta_claves):
+            referencia_clave = os.path.join(self.carpeta_claves, nombre_clave)
+        elif self._registro.resolver_hash(nombre_clave) is not None:
+            referencia_clave = self._registro.resolver_hash(nombre_clave)
+        else:
+            await self._responder(writer, 404, f"Clave no encontrada: {nombre_clave}".encode())
+            return
+        if not cuerpo:
+            await self._responder(writer, 400, b"Falta el CSV de respuestas")
+            return
+
+        # Cola acotada: si ya hay demasiadas solicitudes esperando, se rechaza
+        if self.metricas['en_cola'] >= self.max_en_cola:
+            self.metricas['rechazadas'] += 1
+            await self._responder(writer, 503, b"Servidor ocupado, intenta de nuevo", extra={'Retry-After': '5'})
+            return
+
+        self.metricas['en_cola'] += 1
+        self.metricas['max_en_cola_observado'] = max(self.metricas['max_en_cola_observado'],
+                                                     self.metricas['en_cola'])
+        esperando = True
+        try:
+            async with self._cupos:
+                self.metricas['en_cola'] -= 1
+                esperando = False
+                self.metricas['en_proceso'] += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    resultado = await loop.run_in_executor(self._pool, calificar_csv, cuerpo, referencia_clave)
+                finally:
+                    self.metricas['en_proceso'] -= 1
+        finally:
+            if esperando:
+                self.metricas['en_cola'] -= 1
+
+        if 'error' in resultado:
+            self.metricas['errores'] += 1
+            await self._responder(writer, 422, resultado['error'].encode())
+            return
+
+        try:
+            self.metricas['atendidas'] += 1
+            self.metricas['segundos_total'] += resultado['segundos']
+            await self._enviar_archivo(writer, resultado['ruta'], {'X-Alumnos': str(resultado['alumnos'])})
+        finally:
+            os.remove(resultado['ruta'])
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                cabecera = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+
+            lineas = cabecera.decode('latin-1').split('\r\n')
+            metodo, objetivo, _ = (lineas[0].split(' ', 2) + ['', ''])[:3]
+            encabezados = {}
+            for linea in lineas[1:]:
+                if ':' in linea:
+                    nombre, valor = linea.split(':', 1)
+                    encabezados[nombre.strip().lower()] = valor.strip()
+
+            url = urlsplit(objetivo)
+            parametros = parse_qs(url.query)
+
+            try:
+                largo = int(encabezados.get('content-length', '0') or 0)
+            except ValueError:
+                largo = -1
+            if largo < 0:
+                await self._responder(writer, 400, b"Content-Length invalido")
+                return
+            if largo > MAX_TAMANIO_CSV:
+                await self._responder(writer, 413, b"Archivo demasiado grande")
+                return
+            cuerpo = await reader.readexactly(largo) if largo else b''
+
+            if metodo == 'GET' and url.path == '/':
+                opciones = ''.join(f'<option>{html.escape(n)}</option>' for n in listar_claves(self.carpeta_claves))
+                await self._responder(writer, 200, PAGINA_INICIO.format(opciones=opciones).encode(),
+                                      tipo='text/html; charset=utf-8')
+            elif metodo == 'GET' and url.path == '/estado':
+                await self._responder(writer, 200, json.dumps(self.estado(), ensure_ascii=False).encode(),
+                                      tipo='application/json; charset=utf-8')
+            elif url.path == '/calificar':
+                if metodo != 'POST':
+                    await self._responder(writer, 405, b"Usa POST con el CSV en el cuerpo")
+                else:
+                    await self._calificar(writer, parametros, cuerpo)
+            else:
+                await self._responder(writer, 404, b"No encontrado")
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            self.metricas['errores'] += 1
+            print(f"Error atendiendo solicitud: {e}")
+            try:
+                await self._responder(writer, 500, str(e).encode())
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def iniciar(self, host: str = HOST, puerto: int = PUERTO):
+        self._cupos = asyncio.Semaphore(self.max_procesos)
+        self._pool = ProcessPoolExecutor(max_workers=self.max_procesos, initializer=_inicializar_proceso,
+                                         initargs=(self.carpeta_claves,))
+        servidor = await asyncio.start_server(self._atender, host, puerto)
+        print(f"Servidor de calificación en http://{host}:{puerto} "
+              f"({self.max_procesos} procesos, cola máxima {self.max_en_cola})")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            self._pool.shutdown()
+
+
+if __name__ == "__main__":
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else PUERTO
+    try:
+        asyncio.run(ServidorCalificacion().iniciar(puerto=puerto))
+    except KeyboardInterrupt:
+        print("\nServidor detenido")
@@ -0,0 +1,183 @@
+# app/similitud.py
+"""
+Detección de posibles copias: compara los patrones de respuesta de cada
+par de alumnos (del mismo grupo o de toda la generación).
+
+Para cada par se cuentan las respuestas incorrectas idénticas (misma opción
+equivocada en la misma pregunta) y se comparan contra las esperadas si los
+alumnos respondieran de forma independiente, según la frecuencia de cada
+opción en toda la generación. Los conteos salen de productos de matrices
+one-hot por bloques, sin recorrer los pares uno por uno.
+"""
+
+import math
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from matrices import tiene_respuestas, obtener_cache, OPCIONES, MASCARA_NO_CALIFICADA
+
+# Alumnos por bloque de filas en los productos de matrices
+TAMANIO_BLOQUE = 1024
+
+# Nivel de significancia para toda la familia de pares (se corrige por el número de pares)
+ALFA_FAMILIA = 0.01
+
+# Z mínima para considerar un par candidato antes de calcular su valor p
+Z_CANDIDATO = 3.0
+
+# Errores idénticos mínimos para reportar un par (evita falsos positivos con pocos errores)
+MINIMO_ERRORES_IDENTICOS = 5
+
+COLUMNAS_REPORTE = ['Alumno_1', 'Email_1', 'Grupo_1', 'Alumno_2', 'Email_2', 'Grupo_2',
+                    'Errores_Identicos', 'Esperados', 'Z', 'Valor_p', 'Errores_1', 'Errores_2',
+                    'Coincidencias', 'Ambos_Respondieron', 'Indice_Similitud']
+
+
+def _matrices_one_hot(respuestas: np.ndarray, mascaras: np.ndarray):
+    """
+    Matrices alumno x (pregunta, opción) de las preguntas calificadas:
+    opción elegida (A-E) y opción incorrecta elegida, más la matriz de errores
+    alumno x pregunta. Las opciones aceptadas salen de las máscaras de la clave.
+    """
+    calificadas = np.flatnonzero(mascaras != MASCARA_NO_CALIFICADA)
+    respuestas = respuestas[:, calificadas]
+    aceptadas = (mascaras[calificadas, None] >> np.arange(len(OPCIONES), dtype=np.uint8) & 1).astype(bool)
+    num_alumnos, num_preguntas = respuestas.shape
+
+    eligio = np.zeros((num_alumnos, num_preguntas * len(OPCIONES)), dtype=np.float32)
+    valida = respuestas < len(OPCIONES)
+    filas, columnas = np.nonzero(valida)
+    eligio[filas, columnas * len(OPCIONES) + respuestas[filas, columnas]] = 1
+
+    opcion = np.minimum(respuestas, len(OPCIONES) - 1)
+    error = valida & ~aceptadas[np.arange(num_preguntas), opcion]
+    eligio_mal = eligio.copy()
+    eligio_mal[:, aceptadas.ravel()] = 0
+
+    return eligio, eligio_mal, error.astype(np.float32), valida.astype(np.float32)
+
+
+def _probabilidad_misma_incorrecta(eligio_mal: np.ndarray, num_preguntas: int) -> np.ndarray:
+    """
+    Por pregunta, probabilidad de que dos alumnos que fallan elijan la misma
+    opción incorrecta: suma de p_o^2 / (suma de p_o)^2 sobre las opciones incorrectas.
+    """
+    frecuencias = eligio_mal.sum(axis=0).reshape(num_preguntas, len(OPCIONES)).astype(np.float64)
+    total = frecuencias.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probabilidad = (frecuencias ** 2).sum(axis=1) / total ** 2
+    return np.nan_to_num(probabilidad).astype(np.float32)
+
+
+def _pares_en_conjunto(indices: np.ndarray, eligio, eligio_mal, error, valida,
+                       probabilidad: np.ndarray, umbral_p: float) -> List[tuple]:
+    """Pares significativos dentro de un conjunto de alumnos, por bloques del triángulo superior."""
+    eligio, eligio_mal = eligio[indices], eligio_mal[indices]
+    error, valida = error[indices], valida[indices]
+    error_p = error * probabilidad
+    error_v = error * (probabilidad * (1 - probabilidad))
+
+    pares = []
+    for inicio in range(0, len(indices), TAMANIO_BLOQUE):
+        fin = min(inicio + TAMANIO_BLOQUE, len(indices))
+        identicos = eligio_mal[inicio:fin] @ eligio_mal[inicio:].T
+        esperados = error_p[inicio:fin] @ error[inicio:].T
+        varianza = error_v[inicio:fin] @ error[inicio:].T
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (identicos - esperados) / np.sqrt(varianza)
+        # Solo el triángulo superior (j > i) y con suficientes errores idénticos
+        z[np.tril_indices(fin - inicio, 0, z.shape[1])] = 0
+        candidatos = (identicos >= MINIMO_ERRORES_IDENTICOS) & (varianza > 0) & (z >= Z_CANDIDATO)
+
+        for fila, columna in zip(*np.nonzero(candidatos)):
+            valor_p = 0.5 * math.erfc(float(z[fila, columna]) / math.sqrt(2))
+            if valor_p >= umbral_p:
+                continue
+            local_i, local_j = inicio + fila, inicio + columna
+            coincidencias = float(eligio[local_i] @ eligio[local_j])
+            ambos = float(valida[local_i] @ valida[local_j])
+            i, j = indices[local_i], indices[local_j]
+            pares.append((i, j, int(identicos[fila, columna]), float(esperados[fila, columna]),
+                          float(z[fila, columna]), valor_p, coincidencias, ambos))
+    return pares
+
+
+def calcular_pares_similares(resultados: List[Dict[str, Any]], por_grupo: bool = True) -> pd.DataFrame:
+    """
+    Pares de alumnos con más respuestas incorrectas idénticas de las esperadas.
+
+    Args:
+        resultados: Resultados del calificador (deben conservar las respuestas codificadas)
+        por_grupo: True compara solo dentro de cada grupo; False, toda la generación
+
+    Returns:
+        DataFrame con COLUMNAS_REPORTE, ordenado de mayor a menor Z.
+        El índice de similitud es la fracción de respuestas idénticas
+        entre las preguntas que ambos respondieron.
+    """
+    if not resultados or not tiene_respuestas(resultados):
+        if resultados:
+            print("La detección de copias necesita las respuestas codificadas del calificador")
+        return pd.DataFrame(columns=COLUMNAS_REPORTE)
+
+    respuestas = resultados.matriz_respuestas
+    eligio, eligio_mal, error, valida = _matrices_one_hot(respuestas, resultados.mascaras)
+    probabilidad = _probabilidad_misma_incorrecta(eligio_mal, error.shape[1])
+
+    if por_grupo:
+        grupos = np.array([str(r.get('grupo', '')) for r in resultados], dtype=object)
+        _, grupo_idx = np.unique(grupos, return_inverse=True)
+        conjuntos = [np.flatnonzero(grupo_idx == g) for g in range(grupo_idx.max() + 1)]
+    else:
+        conjuntos = [np.arange(len(resultados))]
+
+    # Corrección de Bonferroni por el número total de pares comparados
+    num_pares = sum(len(c) * (len(c) - 1) // 2 for c in conjuntos)
+    if num_pares == 0:
+        return pd.DataFrame(columns=COLUMNAS_REPORTE)
+    umbral_p = ALFA_FAMILIA / num_pares
+
+    pares = []
+    for indices in conjuntos:
+        if len(indices) > 1:
+            pares.extend(_pares_en_conjunto(indices, eligio, eligio_mal, error, valida,
+                                            probabilidad, umbral_p))
+
+    errores = error.sum(axis=1)
+    filas = []
+    for i, j, identicos, esperados, z, valor_p, coincidencias, ambos in pares:
+        a, b = resultados[i], resultados[j]
+        filas.append((a['nombre'], a.get('email', ''), a.get('grupo', ''),
+                      b['nombre'], b.get('email', ''), b.get('grupo', ''),
+                      identicos, round(esperados, 2), round(z, 2), valor_p,
+                      int(errores[i]), int(errores[j]), int(coincidencias), int(ambos),
+                      round(coincidencias / ambos, 3) if ambos else 0.0))
+
+    reporte = pd.DataFrame(filas, columns=COLUMNAS_REPORTE)
+    return reporte.sort_values('Z', ascending=False, ignore_index=True)
+
+
+def obtener_pares_similares(resultados: List[Dict[str, Any]], por_grupo: bool = True) -> pd.DataFrame:
+    """calcular_pares_similares reutilizando la caché de los resultados."""
+    cache = obtener_cache(resultados)
+    if cache is None:
+        return calcular_pares_similares(resultados, por_grupo)
+
+    llave = ('pares_similares', por_grupo)
+    if llave not in cache:
+        cache[llave] = calcular_pares_similares(resultados, por_grupo)
+    return cache[llave]
+
+
+def generar_reporte_similitud_csv(resultados: List[Dict[str, Any]], ruta_salida: str,
+                                  por_grupo: bool = True):
+    """Exporta a CSV los pares con similitud significativa."""
+    try:
+        reporte = obtener_pares_similares(resultados, por_grupo)
+        reporte.to_csv(ruta_salida, index=False, encoding='utf-8-sig')
+        print(f"Reporte de posibles copias exportado: {ruta_salida} ({len(reporte)} pares)")
+    except Exception as e:
+        print(f"Error al generar reporte de similitud: {e}")
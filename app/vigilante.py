@@ -0,0 +1,421 @@
+# app/vigilante.py
+"""
+Vigilante de carpeta: califica automáticamente los CSV de respuestas que
+se descargan en la carpeta de datos.
+
+Detecta archivos nuevos o modificados (inotify en Linux, sondeo periódico
+en otros sistemas), espera a que el archivo deje de cambiar antes de
+leerlo, busca la clave que le corresponde y regenera solo los reportes
+que están desactualizados. Varios archivos se procesan en paralelo.
+
+Uso:
+    python vigilante.py [carpeta] [--sondeo] [--procesos N]
+"""
+
+import contextlib
+import ctypes
+import ctypes.util
+import io
+import os
+import re
+import select
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Dict, Any, Optional, Tuple
+
+import pandas as pd
+
+from config import (RUTA_DATOS, RUTA_EXPORTACION_DEFAULT, MAPEO_MATERIAS, COLUMNA_NOMBRE,
+                    COLUMNA_EMAIL, COLUMNA_GRUPO, COLUMNA_TIMESTAMP)
+from data_loader import cargar_datos, extraer_columnas_respuestas, ENCODINGS_CSV
+from registro_claves import RegistroClaves
+
+# Segundos sin cambios antes de considerar que un archivo terminó de escribirse
+ESPERA_ESTABLE = 2.0
+
+# Intervalo del sondeo cuando no hay inotify
+INTERVALO_SONDEO = 1.0
+
+MAX_PROCESOS = 2
+
+CLAVE_POR_DEFECTO = 'clave_respuestas.csv'
+
+# Eventos de inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_MASCARA_INOTIFY = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENTO_INOTIFY = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+# ---------------------------------------------------------------------------
+# Fuentes de eventos
+# ---------------------------------------------------------------------------
+
+class FuenteInotify:
+    """Eventos de archivos de una carpeta usando inotify (vía ctypes)."""
+
+    def __init__(self, carpeta: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        if libc.inotify_add_watch(self._fd, os.fsencode(carpeta), _MASCARA_INOTIFY) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, os.strerror(errno))
+
+    def esperar(self, timeout: float) -> List[str]:
+        """Espera hasta timeout segundos y devuelve los nombres de archivo con cambios."""
+        listos, _, _ = select.select([self._fd], [], [], timeout)
+        if not listos:
+            return []
+
+        try:
+            datos = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        nombres = []
+        posicion = 0
+        while posicion + _EVENTO_INOTIFY.size <= len(datos):
+            _, _, _, largo = _EVENTO_INOTIFY.unpack_from(datos, posicion)
+            inicio = posicion + _EVENTO_INOTIFY.size
+            nombre = datos[inicio:inicio + largo].rstrip(b'\0')
+            if nombre:
+                nombres.append(os.fsdecode(nombre))
+            posicion = inicio + largo
+        return nombres
+
+    def cerrar(self):
+        os.close(self._fd)
+
+
+class FuenteSondeo:
+    """Misma interfaz que FuenteInotify, comparando tamaño y fecha periódicamente."""
+
+    def __init__(self, carpeta: str, intervalo: float = INTERVALO_SONDEO):
+        self.carpeta = carpeta
+        self.intervalo = intervalo
+        self._firmas = self._escanear()
+
+    def _escanear(self) -> Dict[str, Tuple[int, int]]:
+        firmas = {}
+        with os.scandir(self.carpeta) as entradas:
+            for entrada in entradas:
+                if entrada.is_file():
+                    info = entrada.stat()
+                    firmas[entrada.name] = (info.st_size, info.st_mtime_ns)
+        return firmas
+
+    def esperar(self, timeout: float) -> List[str]:
+        time.sleep(min(timeout, self.intervalo))
+        firmas = self._escanear()
+        cambios = [nombre for nombre, firma in firmas.items() if self._firmas.get(nombre) != firma]
+        self._firmas = firmas
+        return cambios
+
+    def cerrar(self):
+        pass
+
+
+def crear_fuente(carpeta: str, forzar_sondeo: bool = False):
+    """Usa inotify si está disponible; si no, el sondeo periódico."""
+    if not forzar_sondeo and sys.platform.startswith('linux'):
+        try:
+            return FuenteInotify(carpeta)
+        except (OSError, AttributeError) as e:
+            print(f"inotify no disponible ({e}); se usara sondeo")
+    return FuenteSondeo(carpeta)
+
+
+# ---------------------------------------------------------------------------
+# Clasificación de archivos y reportes desactualizados
+# ---------------------------------------------------------------------------
+
+def leer_encabezado(ruta: str) -> Optional[pd.DataFrame]:
+    """Lee solo la fila de encabezados de un CSV (None si no se puede)."""
+    for encoding in ENCODINGS_CSV:
+        try:
+            return pd.read_csv(ruta, nrows=0, encoding=encoding)
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+        except Exception:
+            return None
+    return None
+
+
+def contar_preguntas(encabezado: pd.DataFrame) -> int:
+    """Número de columnas de respuesta del encabezado (sin imprimir el detalle)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return len(extraer_columnas_respuestas(encabezado))
+
+
+def es_clave(nombre_archivo: str) -> bool:
+    return nombre_archivo.lower().endswith('.csv') and 'clave' in nombre_archivo.lower()
+
+
+def es_archivo_respuestas(ruta: str) -> bool:
+    """CSV exportado de Google Forms (no una clave ni un reporte generado)."""
+    nombre = os.path.basename(ruta)
+    if not nombre.lower().endswith('.csv') or es_clave(nombre):
+        return False
+
+    encabezado = leer_encabezado(ruta)
+    if encabezado is None:
+        return False
+    columnas = {str(c).strip() for c in encabezado.columns}
+    if COLUMNA_EMAIL not in columnas and COLUMNA_TIMESTAMP not in columnas:
+        return False
+    return contar_preguntas(encabezado) > 0
+
+
+def buscar_clave(ruta_respuestas: str) -> Optional[str]:
+    """
+    Clave que corresponde a un archivo de respuestas:
+    1. 'clave_<nombre>.csv' o '<nombre>_clave.csv' en la misma carpeta
+    2. Una clave con el mismo número de preguntas
+    3. 'clave_respuestas.csv'
+    """
+    carpeta = os.path.dirname(ruta_respuestas)
+    base = os.path.splitext(os.path.basename(ruta_respuestas))[0]
+    for candidato in (f'clave_{base}.csv', f'{base}_clave.csv'):
+        ruta = os.path.join(carpeta, candidato)
+        if os.path.exists(ruta):
+            return ruta
+
+    claves = sorted(n for n in os.listdir(carpeta) if es_clave(n))
+    encabezado = leer_encabezado(ruta_respuestas)
+    if encabezado is not None:
+        num_preguntas = contar_preguntas(encabezado)
+        for nombre in claves:
+            encabezado_clave = leer_encabezado(os.path.join(carpeta, nombre))
+            if encabezado_clave is not None and contar_preguntas(encabezado_clave) == num_preguntas:
+                return os.path.join(carpeta, nombre)
+
+    ruta = os.path.join(carpeta, CLAVE_POR_DEFECTO)
+    return ruta if os.path.exists(ruta) else None
+
+
+def carpeta_reportes(ruta_respuestas: str, carpeta_salida: str) -> str:
+    """Carpeta de reportes de un archivo de respuestas (un nombre seguro por archivo)."""
+    base = os.path.splitext(os.path.basename(ruta_respuestas))[0]
+    return os.path.join(carpeta_salida, re.sub(r'[^\w\-]+', '_', base).strip('_') or 'examen')
+
+
+def _salidas():
+    """Reportes que genera el vigilante: (archivo, función generadora)."""
+    from excel_consolidado import generar_reporte_consolidado
+    from analisis_errores import (generar_reporte_errores_csv, generar_reporte_errores_por_materia,
+                                  generar_analisis_preguntas_dificiles, generar_matriz_errores_excel)
+    from similitud import generar_reporte_similitud_csv
+    from duplicados import generar_reporte_duplicados_csv
+    return [
+        ('reporte_consolidado.xlsx', generar_reporte_consolidado),
+        ('errores_matriz.csv', generar_reporte_errores_csv),
+        ('errores_por_materia.csv', generar_reporte_errores_por_materia),
+        ('preguntas_dificiles.csv', generar_analisis_preguntas_dificiles),
+        ('posibles_copias.csv', generar_reporte_similitud_csv),
+        ('envios_duplicados.csv', generar_reporte_duplicados_csv),
+        ('matriz_visual.xlsx', generar_matriz_errores_excel),
+    ]
+
+
+def salidas_desactualizadas(ruta_respuestas: str, ruta_clave: str, carpeta: str) -> List[str]:
+    """Reportes que no existen o son más viejos que las respuestas o la clave."""
+    referencia = max(os.path.getmtime(ruta_respuestas), os.path.getmtime(ruta_clave))
+    pendientes = []
+    for archivo, _ in _salidas():
+        ruta = os.path.join(carpeta, archivo)
+        if not os.path.exists(ruta) or os.path.getmtime(ruta) < referencia:
+            pendientes.append(archivo)
+    return pendientes
+
+
+def procesar_archivo(ruta_respuestas: str, ruta_clave: str, carpeta_salida: str) -> Dict[str, Any]:
+    """
+    Califica un archivo y regenera sus reportes desactualizados
+    (se ejecuta en un proceso del pool).
+    """
+    from grader import procesar_calificaciones_google_forms
+    from analisis_errores import _ejecutar_exportacion
+
+    inicio = time.perf_counter()
+    carpeta = carpeta_reportes(ruta_respuestas, carpeta_salida)
+    resumen = {'archivo': ruta_respuestas, 'clave': ruta_clave, 'regenerados': [], 'error': None}
+
+    pendientes = salidas_desactualizadas(ruta_respuestas, ruta_clave, carpeta)
+    if not pendientes:
+        resumen['segundos'] = time.perf_counter() - inicio
+        return resumen
+
+    registro = RegistroClaves()
+    clave = registro.clave_desde_csv(ruta_clave)
+    respuestas_df = cargar_datos(ruta_respuestas)
+    if clave is None or respuestas_df is None:
+        resumen['error'] = "No se pudieron cargar los archivos"
+        return resumen
+
+    resultados = procesar_calificaciones_google_forms(
+        clave, respuestas_df, MAPEO_MATERIAS, COLUMNA_NOMBRE, COLUMNA_EMAIL, COLUMNA_GRUPO,
+        reglas=registro.obtener_reglas(clave))
+    if not resultados:
+        resumen['error'] = "No se procesaron calificaciones"
+        return resumen
+
+    if not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+
+    for archivo, funcion in _salidas():
+        if archivo not in pendientes:
+            continue
+        try:
+            _ejecutar_exportacion(funcion, resultados, os.path.join(carpeta, archivo))
+            resumen['regenerados'].append(archivo)
+        except Exception as e:
+            resumen['error'] = f"{archivo}: {e}"
+
+    resumen['segundos'] = time.perf_counter() - inicio
+    return resumen
+
+
+# ---------------------------------------------------------------------------
+# Vigilante
+# ---------------------------------------------------------------------------
+
+class VigilanteCarpeta:
+    """Bucle principal: junta eventos, espera a que se estabilicen y reparte el trabajo."""
+
+    def __init__(self, carpeta: str = RUTA_DATOS, carpeta_salida: Optional[str] = None,
+                 max_procesos: int = MAX_PROCESOS, espera_estable: float = ESPERA_ESTABLE,
+                 forzar_sondeo: bool = False):
+        if carpeta_salida is None:
+            # Misma subcarpeta que la exportación por defecto ('resultados')
+            carpeta_salida = os.path.join(carpeta, os.path.basename(RUTA_EXPORTACION_DEFAULT))
+        self.carpeta = os.path.abspath(carpeta)
+        self.carpeta_salida = os.path.abspath(carpeta_salida)
+        self.max_procesos = max_procesos
+        self.espera_estable = espera_estable
+        self.forzar_sondeo = forzar_sondeo
+
+        # ruta -> (momento del último cambio, (tamaño, mtime))
+        self._pendientes: Dict[str, Tuple[float, Tuple[int, int]]] = {}
+        self._en_proceso: Dict[str, Future] = {}
+
+    def _firma(self, ruta: str) -> Optional[Tuple[int, int]]:
+        try:
+            info = os.stat(ruta)
+        except OSError:
+            return None
+        return info.st_size, info.st_mtime_ns
+
+    def _encolar(self, nombre: str):
+        """Registra un cambio; si es una clave, se revisan todos los archivos de respuestas."""
+        if not nombre.lower().endswith('.csv'):
+            return
+
+        if es_clave(nombre):
+            nombres = [n for n in os.listdir(self.carpeta) if n.lower().endswith('.csv') and not es_clave(n)]
+        else:
+            nombres = [nombre]
+
+        ahora = time.monotonic()
+        for n in nombres:
+            ruta = os.path.join(self.carpeta, n)
+            firma = self._firma(ruta)
+            if firma is not None:
+                self._pendientes[ruta] = (ahora, firma)
+
+    def _listos(self) -> List[str]:
+        """Archivos sin cambios durante espera_estable segundos (y que no se estén procesando)."""
+        ahora = time.monotonic()
+        listos = []
+        for ruta, (momento, firma) in list(self._pendientes.items()):
+            if ruta in self._en_proceso or ahora - momento < self.espera_estable:
+                continue
+            actual = self._firma(ruta)
+            if actual is None:
+                del self._pendientes[ruta]
+            elif actual != firma or time.time() - actual[1] / 1e9 < self.espera_estable:
+                self._pendientes[ruta] = (ahora, actual)  # Se sigue escribiendo
+            else:
+                del self._pendientes[ruta]
+                listos.append(ruta)
+        return listos
+
+    def _enviar(self, pool: ProcessPoolExecutor, ruta: str):
+        if not es_archivo_respuestas(ruta):
+            return
+
+        ruta_clave = buscar_clave(ruta)
+        if ruta_clave is None:
+            print(f"[vigilante] Sin clave para {os.path.basename(ruta)}")
+            return
+
+        carpeta = carpeta_reportes(ruta, self.carpeta_salida)
+        if not salidas_desactualizadas(ruta, ruta_clave, carpeta):
+            return
+
+        print(f"[vigilante] Calificando {os.path.basename(ruta)} con {os.path.basename(ruta_clave)}")
+        self._en_proceso[ruta] = pool.submit(procesar_archivo, ruta, ruta_clave, self.carpeta_salida)
+
+    def _recoger_terminados(self):
+        for ruta, futuro in list(self._en_proceso.items()):
+            if not futuro.done():
+                continue
+            del self._en_proceso[ruta]
+            try:
+                resumen = futuro.result()
+            except Exception as e:
+                print(f"[vigilante] Error con {os.path.basename(ruta)}: {e}")
+                continue
+
+            nombre = os.path.basename(ruta)
+            if resumen['error']:
+                print(f"[vigilante] {nombre}: {resumen['error']}")
+            if resumen['regenerados']:
+                print(f"[vigilante] {nombre}: {len(resumen['regenerados'])} reportes "
+                      f"regenerados en {resumen['segundos']:.1f}s")
+
+    def ejecutar(self, duracion: Optional[float] = None):
+        """Vigila la carpeta hasta Ctrl+C (o durante 'duracion' segundos)."""
+        fuente = crear_fuente(self.carpeta, self.forzar_sondeo)
+        print(f"[vigilante] Vigilando {self.carpeta} ({type(fuente).__name__}); "
+              f"reportes en {self.carpeta_salida}")
+
+        # Al iniciar se revisan los archivos existentes (solo se rehace lo desactualizado)
+        for nombre in os.listdir(self.carpeta):
+            if nombre.lower().endswith('.csv') and not es_clave(nombre):
+                self._encolar(nombre)
+        self._pendientes = {ruta: (0.0, firma) for ruta, (_, firma) in self._pendientes.items()}
+
+        fin = None if duracion is None else time.monotonic() + duracion
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_procesos) as pool:
+                while fin is None or time.monotonic() < fin or self._en_proceso:
+                    for nombre in fuente.esperar(timeout=0.5):
+                        self._encolar(nombre)
+                    for ruta in self._listos():
+                        self._enviar(pool, ruta)
+                    self._recoger_terminados()
+        except KeyboardInterrupt:
+            print("\n[vigilante] Detenido")
+        finally:
+            fuente.cerrar()
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    forzar_sondeo = '--sondeo' in argumentos
+    procesos = MAX_PROCESOS
+    if '--procesos' in argumentos:
+        procesos = int(argumentos[argumentos.index('--procesos') + 1])
+    carpetas = [a for a in argumentos if not a.startswith('--') and not a.isdigit()]
+
+    VigilanteCarpeta(carpetas[0] if carpetas else RUTA_DATOS, max_procesos=procesos,
+                     forzar_sondeo=forzar_sondeo).ejecutar()
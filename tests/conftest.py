@@ -0,0 +1,7 @@
+# tests/conftest.py
+"""Los módulos de app/ se importan entre sí sin paquete (from matrices import ...)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
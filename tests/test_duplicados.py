@@ -0,0 +1,42 @@
+# tests/test_duplicados.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from duplicados import seleccionar_envios, POLITICA_ULTIMO, POLITICA_MEJOR, POLITICA_MARCAR
+
+CLAVES = np.array(['ana', 'beto', 'ana', 'ana', 'carla'], dtype=object)
+MARCAS = pd.Series(pd.to_datetime(['2025-08-01 10:00', '2025-08-01 10:05', '2025-08-01 12:00',
+                                   '2025-08-01 11:00', '2025-08-01 10:10']))
+PUNTAJES = np.array([90, 50, 70, 70, 60])
+
+
+def test_ultimo_por_marca_temporal():
+    conservar, envios = seleccionar_envios(CLAVES, POLITICA_ULTIMO, MARCAS)
+    np.testing.assert_array_equal(conservar, [False, True, True, False, True])
+    np.testing.assert_array_equal(envios, [3, 1, 3, 3, 1])
+
+
+def test_ultimo_sin_marcas_usa_el_orden_del_archivo():
+    conservar, _ = seleccionar_envios(CLAVES, POLITICA_ULTIMO)
+    np.testing.assert_array_equal(conservar, [False, True, False, True, True])
+
+
+def test_mejor_desempata_por_el_mas_reciente():
+    conservar, _ = seleccionar_envios(CLAVES, POLITICA_MEJOR, MARCAS, PUNTAJES)
+    np.testing.assert_array_equal(conservar, [True, True, False, False, True])
+
+    empate = np.array([70, 50, 90, 90, 60])
+    conservar, _ = seleccionar_envios(CLAVES, POLITICA_MEJOR, MARCAS, empate)
+    np.testing.assert_array_equal(conservar, [False, True, True, False, True])
+
+
+def test_marcar_conserva_todos():
+    conservar, envios = seleccionar_envios(CLAVES, POLITICA_MARCAR, MARCAS)
+    assert conservar.all()
+    np.testing.assert_array_equal(envios, [3, 1, 3, 3, 1])
+
+
+def test_politica_desconocida():
+    with pytest.raises(ValueError):
+        seleccionar_envios(CLAVES, 'primero')
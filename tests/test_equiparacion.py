@@ -0,0 +1,43 @@
+# tests/test_equiparacion.py
+import numpy as np
+import pytest
+
+from equiparacion import DistribucionPuntajes, equiparar, METODO_LINEAL
+
+PUNTOS = [0, 25, 30, 50, 70, 75, 100]
+
+
+def _generacion(desplazamiento=0.0):
+    rng = np.random.default_rng(1)
+    return np.clip(rng.normal(50, 7, 500).round(), 30, 70) + desplazamiento
+
+
+def test_equiparar_consigo_misma_es_identidad():
+    distribucion = DistribucionPuntajes(_generacion())
+    np.testing.assert_allclose(equiparar(PUNTOS, distribucion, distribucion), PUNTOS, atol=1e-6)
+
+
+def test_colas_vacias_siguen_al_desplazamiento():
+    origen = DistribucionPuntajes(_generacion())
+    destino = DistribucionPuntajes(_generacion(10))
+    equiparados = equiparar(PUNTOS, origen, destino)
+
+    assert equiparados[0] == 0 and equiparados[-1] == 100
+    np.testing.assert_allclose(equiparados[2:5], [40, 60, 80], atol=0.5)
+    # Fuera del rango observado ya no se equiparan a sí mismos
+    assert 25 < equiparados[1] < 40
+    assert 80 < equiparados[5] < 100
+    assert (np.diff(equiparar(np.linspace(0, 100, 1001), origen, destino)) >= 0).all()
+
+
+def test_lineal_iguala_media_y_desviacion():
+    origen = DistribucionPuntajes(_generacion())
+    destino = DistribucionPuntajes(_generacion(10))
+    equiparados = equiparar(_generacion(), origen, destino, METODO_LINEAL)
+    assert equiparados.mean() == pytest.approx(destino.media)
+
+
+def test_metodo_desconocido():
+    distribucion = DistribucionPuntajes(_generacion())
+    with pytest.raises(ValueError):
+        equiparar(PUNTOS, distribucion, distribucion, 'otro')
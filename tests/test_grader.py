@@ -0,0 +1,59 @@
+# tests/test_grader.py
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from grader import procesar_calificaciones_google_forms
+from registro_claves import compilar_clave_df
+
+MAPEO = {'Uno': range(1, 5)}
+
+
+def _calificar(clave, respuestas):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return procesar_calificaciones_google_forms(clave, respuestas, MAPEO, 'Nombre completo',
+                                                    politica_duplicados=None)
+
+
+def _clave_parcial():
+    # Solo las preguntas 1 y 2 tienen respuesta en la clave
+    clave_df = pd.DataFrame([{'Nombre': 'Clave', '1.': 'A', '2.': 'B', '3.': '', '4.': ''}])
+    return compilar_clave_df(clave_df, 'parcial', MAPEO)
+
+
+def test_clave_parcial_con_version_revuelta():
+    # En la versión B la pregunta j se muestra en la posición de permutacion[j]:
+    # las preguntas calificadas quedan en columnas que la clave no tiene
+    clave = _clave_parcial().con_version('B', [3, 4, 1, 2])
+    respuestas = pd.DataFrame([
+        {'Nombre completo': 'Canonica', 'Versión': 'A', '1.': 'A', '2.': 'B', '3.': 'C', '4.': 'D'},
+        {'Nombre completo': 'Revuelta', 'Versión': 'B', '1.': 'C', '2.': 'D', '3.': 'A', '4.': 'B'},
+    ])
+    resultados = _calificar(clave, respuestas)
+
+    assert [r['total_aciertos'] for r in resultados] == [2, 2]
+    assert [r['total_preguntas'] for r in resultados] == [2, 2]
+    assert [r['estadisticas']['aciertos'] for r in resultados] == [[1, 2], [1, 2]]
+
+
+def test_version_mas_larga_que_el_examen():
+    clave = _clave_parcial().con_version('B', [5, 4, 3, 2, 1])
+    respuestas = pd.DataFrame([
+        {'Nombre completo': 'Revuelta', 'Versión': 'B', '1.': 'C', '2.': 'D', '3.': 'A', '4.': 'B'},
+    ])
+    with pytest.raises(ValueError, match='versión B'):
+        _calificar(clave, respuestas)
+
+
+def test_clave_con_varias_respuestas_requiere_separador():
+    clave_df = pd.DataFrame([{'Nombre': 'Clave', '1.': 'B/D', '2.': 'B, D', '3.': 'BD', '4.': 'A/A'}])
+    respuestas = pd.DataFrame([
+        {'Nombre completo': 'Uno', '1.': 'D', '2.': 'B', '3.': 'B', '4.': 'A'},
+    ])
+    resultado = _calificar(clave_df, respuestas)[0]
+
+    # 'BD' y 'A/A' son errores de captura: se ignoran en lugar de aceptar varias opciones
+    assert resultado['total_preguntas'] == 2
+    assert resultado['estadisticas']['aciertos'] == [1, 2]
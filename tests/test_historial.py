@@ -0,0 +1,38 @@
+# tests/test_historial.py
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from grader import procesar_calificaciones_google_forms
+from historial import conectar, guardar_examen, estados_examen
+
+PREGUNTAS = 110
+MAPEO = {'Todo': range(1, PREGUNTAS + 1)}
+
+
+def test_estados_guardados_conservan_el_ancho_del_examen(tmp_path):
+    rng = np.random.default_rng(5)
+    columnas = [f'{p}.' for p in range(1, PREGUNTAS + 1)]
+    clave_df = pd.DataFrame([dict(zip(columnas, rng.choice(list('ABCDE'), PREGUNTAS)))])
+    respuestas = pd.DataFrame(rng.choice(list('ABCDE') + [''], size=(6, PREGUNTAS)), columns=columnas)
+    respuestas.insert(0, 'Nombre completo', [f'Alumno {i}' for i in range(6)])
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultados = procesar_calificaciones_google_forms(clave_df, respuestas, MAPEO, 'Nombre completo',
+                                                          politica_duplicados=None)
+
+    conexion = conectar(str(tmp_path / 'historial.db'))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            guardar_examen(resultados, 'Simulacro 1', conexion)
+        estados = estados_examen('Simulacro 1', conexion)
+    finally:
+        conexion.close()
+
+    # 110 preguntas ocupan 14 bytes por plano, pero el ancho no se redondea a 112
+    assert estados.total_preguntas == PREGUNTAS
+    assert estados.a_matriz().shape == (6, PREGUNTAS)
+    totales = estados.totales()
+    assert totales['aciertos'].tolist() == [r['total_aciertos'] for r in resultados]
+    assert totales['errores'].tolist() == [len(r['estadisticas']['errores']) for r in resultados]
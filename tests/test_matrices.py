@@ -0,0 +1,44 @@
+# tests/test_matrices.py
+import numpy as np
+
+from matrices import (EstadosEmpaquetados, contar_bits, ESTADO_ACIERTO, ESTADO_ERROR,
+                      ESTADO_SIN_RESPONDER, ESTADO_NO_CALIFICADA)
+
+
+def _estados(alumnos=40, preguntas=110):
+    return np.random.default_rng(3).integers(0, 4, size=(alumnos, preguntas), dtype=np.uint8)
+
+
+def test_contar_bits():
+    bits = np.array([[0, 1, 255], [128, 7, 0]], dtype=np.uint8)
+    np.testing.assert_array_equal(contar_bits(bits), [[0, 1, 8], [1, 3, 0]])
+
+
+def test_totales_empaquetados_coinciden_con_la_matriz():
+    estado = _estados()
+    empaquetados = EstadosEmpaquetados.desde_matriz(estado)
+    totales = empaquetados.totales()
+
+    # El relleno del último byte (110 -> 112) no cuenta en ningún total
+    assert empaquetados.bajo.shape == (40, 14)
+    np.testing.assert_array_equal(totales['aciertos'], (estado == ESTADO_ACIERTO).sum(axis=1))
+    np.testing.assert_array_equal(totales['errores'], (estado == ESTADO_ERROR).sum(axis=1))
+    np.testing.assert_array_equal(totales['sin_responder'], (estado == ESTADO_SIN_RESPONDER).sum(axis=1))
+    np.testing.assert_array_equal(empaquetados.a_matriz(), estado)
+
+
+def test_conteos_por_materia():
+    estado = _estados()
+    empaquetados = EstadosEmpaquetados.desde_matriz(estado)
+    materias = {'Uno': list(range(1, 51)), 'Dos': list(range(51, 111)) + [200]}
+    conteos = empaquetados.conteos_por_materia(materias, ESTADO_ERROR)
+    np.testing.assert_array_equal(conteos['Uno'], (estado[:, :50] == ESTADO_ERROR).sum(axis=1))
+    np.testing.assert_array_equal(conteos['Dos'], (estado[:, 50:] == ESTADO_ERROR).sum(axis=1))
+
+
+def test_ida_y_vuelta_por_bytes():
+    estado = _estados(5, 13)
+    estado[0] = ESTADO_NO_CALIFICADA
+    empaquetados = EstadosEmpaquetados.desde_matriz(estado)
+    filas = [empaquetados.fila_bytes(i) for i in range(len(empaquetados))]
+    np.testing.assert_array_equal(EstadosEmpaquetados.desde_bytes(filas, 13).a_matriz(), estado)
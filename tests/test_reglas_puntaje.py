@@ -0,0 +1,50 @@
+# tests/test_reglas_puntaje.py
+import numpy as np
+import pandas as pd
+
+from matrices import ESTADO_ACIERTO as A, ESTADO_ERROR as E, ESTADO_SIN_RESPONDER as S, ESTADO_NO_CALIFICADA as N
+from reglas_puntaje import ReglasPuntaje, calcular_puntajes
+from registro_claves import RegistroClaves, compilar_clave_df
+
+MAPEO = {'Uno': range(1, 3), 'Dos': range(3, 5)}
+
+
+def test_uniformes_cuentan_aciertos():
+    estado = np.array([[A, A, E, S],
+                       [E, S, A, A]], dtype=np.uint8)
+    salida = calcular_puntajes(estado, ReglasPuntaje.uniformes(4), MAPEO)
+    assert salida['materias'] == ['Uno', 'Dos']
+    np.testing.assert_array_equal(salida['puntajes'], [[2, 0, 2], [0, 2, 2]])
+    np.testing.assert_array_equal(salida['maximos'], [2, 2, 4])
+
+
+def test_penalizaciones_restan_solo_en_errores():
+    estado = np.array([[A, E, E, S]], dtype=np.uint8)
+    reglas = ReglasPuntaje([2, 1, 1, 1], penalizaciones=[0.5, 0.25, 0.25, 0.25])
+    salida = calcular_puntajes(estado, reglas, MAPEO)
+    np.testing.assert_allclose(salida['puntajes'], [[2 - 0.25, -0.25, 1.5]])
+    np.testing.assert_array_equal(salida['maximos'], [3, 2, 5])
+
+
+def test_anuladas_y_no_calificadas_no_cuentan():
+    estado = np.array([[A, E, A, N],
+                       [E, E, A, N]], dtype=np.uint8)
+    reglas = ReglasPuntaje([1, 1, 1, 1], penalizaciones=[1, 1, 1, 1]).con_anuladas([2])
+    salida = calcular_puntajes(estado, reglas, MAPEO)
+    # La 2 está anulada y la 4 no tiene clave: ni puntaje ni máximo
+    np.testing.assert_array_equal(salida['puntajes'], [[1, 1, 2], [-1, 1, 0]])
+    np.testing.assert_array_equal(salida['maximos'], [1, 1, 2])
+
+
+def test_reglas_guardadas_por_otro_registro(tmp_path):
+    clave = compilar_clave_df(pd.DataFrame([{'1.': 'A', '2.': 'B', '3.': 'C', '4.': 'D'}]), 'clave', MAPEO)
+    servidor = RegistroClaves(str(tmp_path))
+    servidor.registrar(clave)
+    assert servidor.obtener_reglas(clave) is None
+
+    # Otro proceso anula una pregunta mientras el primer registro sigue abierto
+    RegistroClaves(str(tmp_path)).guardar_reglas(clave, ReglasPuntaje.uniformes(4).con_anuladas([3]))
+
+    reglas = servidor.obtener_reglas(clave)
+    assert reglas is not None
+    np.testing.assert_array_equal(reglas.anuladas, [False, False, True, False])